@@ -1,4 +1,4 @@
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, Response, send_from_directory, jsonify
 from .config import Config, configure_logging
 
 def create_app():
@@ -10,9 +10,13 @@ def create_app():
     app.logger.info("Planner Pro Generator V3 Starting...")
     
     # Register API Blueprint
-    from .routes import api_bp
+    from .routes import api_bp, service
     app.register_blueprint(api_bp, url_prefix='/api')
 
+    # Fetch customers now, not on the first user request
+    if Config.WARM_CUSTOMERS_ON_BOOT:
+        service.customer_cache.warm()
+
     @app.route('/')
     def index():
         return send_from_directory(Config.PUBLIC_DIR, 'index.html')
@@ -26,11 +30,61 @@ def create_app():
     def healthz():
         return jsonify({"status": "ok", "version": "2.5.1"}), 200
 
+    # Ready once a customer snapshot with addresses is loaded (warmed at boot)
     @app.route('/readyz')
     def readyz():
-        return jsonify({"status": "ready", "version": "2.5.1"}), 200
+        snapshot = service.customer_cache.peek()
+        if snapshot is None:
+            return jsonify({"status": "warming", "version": "2.5.1"}), 503
+        ready = len(snapshot) > 0 and snapshot.source != "empty"
+        if not ready:
+            # Out of rotation nothing else calls get(), which schedules the
+            # retry (every CUSTOMERS_RETRY_SECONDS); without it we stay out
+            service.customer_cache.get()
+        return jsonify({
+            "status": "ready" if ready else "degraded",
+            "version": "2.5.1",
+            "customers": len(snapshot),
+            "source": snapshot.source,
+        }), 200 if ready else 503
+
+    # Prometheus scrape endpoint (phase histograms, output and cache counters)
+    @app.route('/metrics')
+    def metrics():
+        from .metrics import registry
+        from .routes import admission, inflight, result_cache
+        cache = result_cache.stats()
+        flight = inflight.stats()
+        gate = admission.stats()
+        body = registry.render(
+            gauges={
+                "plannerpro_customer_cache_age_seconds": ("Age of the customer snapshot", service.customer_cache.age()),
+                "plannerpro_result_cache_bytes": ("Bytes held by the result cache", cache["bytes"]),
+                "plannerpro_inflight_requests": ("Seeded generations running right now", flight["in_flight"]),
+                # Autoscaling signals: admitted work and the line behind it
+                "plannerpro_admission_in_flight_requests": ("Admitted generations running", gate["in_flight"]),
+                "plannerpro_admission_in_flight_cells": ("Cost of admitted generations (cells)", gate["in_flight_cells"]),
+                "plannerpro_admission_budget_cells": ("Cells allowed in flight (0 = unlimited)", gate["budget_cells"]),
+                "plannerpro_admission_queue_depth": ("Requests waiting for budget", gate["queued"]),
+                "plannerpro_admission_queued_cells": ("Cost of waiting requests (cells)", gate["queued_cells"]),
+            },
+            counters={
+                "plannerpro_result_cache_hits_total": ("Result cache hits", cache["hits"]),
+                "plannerpro_result_cache_misses_total": ("Result cache misses", cache["misses"]),
+                "plannerpro_coalesced_requests_total": ("Requests served by an identical in-flight one", flight["coalesced"]),
+                "plannerpro_admission_rejected_total": ("Requests turned away with 429", gate["rejected"]),
+                "plannerpro_admission_too_large_total": ("Requests refused with 413", gate["too_large"]),
+            },
+        )
+        return Response(body, mimetype='text/plain; version=0.0.4')
 
     return app
 
-# Expose app globally for Render auto-detect (gunicorn app:app)
-app = create_app()
+# Expose app globally for Render auto-detect (gunicorn app:app).
+# Built on first access so importing the package (tests, scripts, pool
+# workers) does not pay for the routes, services and the customer warm-up.
+def __getattr__(name):
+    if name == "app":
+        instance = globals()["app"] = create_app()
+        return instance
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
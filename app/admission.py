@@ -0,0 +1,147 @@
+import math
+import threading
+import time
+from collections import deque
+
+from .config import Config
+
+# Admission control for generation requests.
+#
+# Every request is priced before any work is done: the cells it will write,
+# rows x columns (see GenerationService.estimate_cost). A process runs at most
+# `budget` cells worth of requests at once; the rest wait in a FIFO queue of
+# at most `max_queue` requests and get Overloaded (429) when the queue is
+# full or their wait runs out. A single request over `max_cost` is refused
+# outright with RequestTooLarge (413). A request bigger than the budget
+# (but under the ceiling) still runs, on its own.
+#
+# Streamed responses are generated chunk by chunk while they are sent, so
+# their memory does not grow with their size: they are weighed at
+# `stream_weight` of their cells (see weigh), buffered files at all of them.
+
+
+class RequestTooLarge(Exception):
+    def __init__(self, cost, limit):
+        super().__init__(f"Request too large: {cost} cells (limit {limit})")
+        self.cost = cost
+        self.limit = limit
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Generation capacity exhausted")
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    # Queue entry; compared by identity, so equal costs stay distinct
+    __slots__ = ('cost',)
+
+    def __init__(self, cost):
+        self.cost = cost
+
+
+class Ticket:
+    """Admitted cost. Given back by release() or leaving a with block (once)."""
+    def __init__(self, gate, cost):
+        self._gate = gate
+        self.cost = cost
+
+    def release(self):
+        gate, self._gate = self._gate, None
+        if gate is not None:
+            gate._release(self.cost)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AdmissionControl:
+    def __init__(self, budget=None, max_cost=None, max_queue=None, wait=None, retry_after=None,
+                 stream_weight=None):
+        self.budget = Config.ADMISSION_BUDGET_CELLS if budget is None else budget
+        self.max_cost = Config.ADMISSION_MAX_REQUEST_CELLS if max_cost is None else max_cost
+        self.max_queue = Config.ADMISSION_MAX_QUEUE if max_queue is None else max_queue
+        self.wait = Config.ADMISSION_QUEUE_SECONDS if wait is None else wait
+        self.retry_after = Config.ADMISSION_RETRY_AFTER_SECONDS if retry_after is None else retry_after
+        self.stream_weight = Config.ADMISSION_STREAM_WEIGHT if stream_weight is None else stream_weight
+        self._cond = threading.Condition()
+        # Waiting requests, head first
+        self._queue = deque()
+        self.in_flight = 0
+        self.in_flight_cost = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.too_large = 0
+
+    def _fits(self, cost):
+        # budget 0 means unlimited; an oversized request runs when alone
+        return not self.budget or self.in_flight_cost + cost <= self.budget or self.in_flight == 0
+
+    def _take(self, cost):
+        self.in_flight += 1
+        self.in_flight_cost += cost
+        self.admitted += 1
+        return Ticket(self, cost)
+
+    def _release(self, cost):
+        with self._cond:
+            self.in_flight -= 1
+            self.in_flight_cost -= cost
+            self._cond.notify_all()
+
+    def weigh(self, cells, streamed):
+        """Cost of a request writing `cells`, streamed or buffered."""
+        return math.ceil(cells * self.stream_weight) if streamed else cells
+
+    def check(self, cost):
+        """Raises RequestTooLarge when `cost` is over the per-request ceiling."""
+        if self.max_cost and cost > self.max_cost:
+            with self._cond:
+                self.too_large += 1
+            raise RequestTooLarge(cost, self.max_cost)
+
+    def admit(self, cost):
+        """
+        Ticket for `cost` cells, waiting in line if the budget is in use.
+        Raises RequestTooLarge or Overloaded.
+        """
+        self.check(cost)
+        with self._cond:
+            if not self._queue and self._fits(cost):
+                return self._take(cost)
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded(self.retry_after)
+
+            waiter = _Waiter(cost)
+            self._queue.append(waiter)
+            deadline = time.monotonic() + self.wait
+            try:
+                while not (self._queue[0] is waiter and self._fits(cost)):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise Overloaded(self.retry_after)
+                    self._cond.wait(remaining)
+            finally:
+                self._queue.remove(waiter)
+                # Whoever is next in line may fit now
+                self._cond.notify_all()
+            return self._take(cost)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "in_flight_cells": self.in_flight_cost,
+                "queued": len(self._queue),
+                "queued_cells": sum(waiter.cost for waiter in self._queue),
+                "budget_cells": self.budget,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "too_large": self.too_large,
+            }
@@ -0,0 +1,53 @@
+import hashlib
+import zipfile
+
+from .xlsx import CHUNK_SIZE, _ChunkSink, _zinfo
+
+# Streamed zip archives of generated files (scenario bundles, batches).
+#
+# Entries are written one after another into a non-seekable sink and drained
+# to the caller as they grow, so only the entry being written is in memory.
+# Files that are already zip containers (.xlsx) are stored, not deflated again.
+
+BUNDLE_MIMETYPE = 'application/zip'
+
+
+class Measured:
+    """Wraps a chunk iterable, recording its size and sha256 as it is consumed."""
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.size = 0
+        self._digest = hashlib.sha256()
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            self.size += len(chunk)
+            self._digest.update(chunk)
+            yield chunk
+
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
+
+
+def iter_zip(entries):
+    """
+    Generator of zip bytes chunks. `entries` yields (name, chunks) pairs and
+    is consumed lazily, so later entries (e.g. a manifest) can depend on what
+    was written before them.
+    """
+    sink = _ChunkSink()
+    zf = zipfile.ZipFile(sink, 'w')
+    for name, chunks in entries:
+        compress = zipfile.ZIP_STORED if name.endswith('.xlsx') else zipfile.ZIP_DEFLATED
+        with zf.open(_zinfo(name, compress), 'w', force_zip64=True) as part:
+            for chunk in chunks:
+                part.write(chunk)
+                if sink.size >= CHUNK_SIZE:
+                    yield sink.drain()
+        if sink.size:
+            yield sink.drain()
+    zf.close()
+    tail = sink.drain()
+    if tail:
+        yield tail
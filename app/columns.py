@@ -0,0 +1,80 @@
+class ColumnPlan:
+    """
+    Column layout compiled once per request and shared by the order and fleet
+    generators.
+
+    Rows come in groups (an order and its items, or a vehicle group and its
+    vehicles) and groups come in chunks. Each chunk carries precomputed column
+    buffers (plain lists) keyed by name:
+      - constant columns are rendered once into the row template,
+      - per-group columns read buffer[g] once per group,
+      - per-row columns read buffer[r] for every row,
+      - tag columns are per-row buffers appended by position; the sampler
+        draws them from `tag_columns`.
+
+    iter_rows() yields the SAME list object for every row; consumers must
+    serialize (or copy) it before pulling the next one. Both XLSX backends do.
+    """
+    def __init__(self):
+        self.headers = []
+        self.tag_columns = []
+        self._constants = []
+        self._group_cols = []
+        self._row_cols = []
+
+    def _add(self, header):
+        self.headers.append(header)
+        return len(self.headers) - 1
+
+    def constant(self, header, value=""):
+        self._constants.append((self._add(header), value))
+        return self
+
+    def per_group(self, header, buffer):
+        self._group_cols.append((self._add(header), buffer))
+        return self
+
+    def per_row(self, header, buffer):
+        self._row_cols.append((self._add(header), buffer))
+        return self
+
+    def tags(self, tags):
+        """
+        Appends dynamic tag columns: [{"header": ..., "values": [...]}, ...]
+        Non-empty ones become per-row buffers named "tag:<n>".
+        """
+        for t in tags:
+            values = list(t['values'] or [])
+            if values:
+                name = f"tag:{len(self.tag_columns)}"
+                self.tag_columns.append((name, values))
+                self.per_row(t['header'], name)
+            else:
+                self.constant(t['header'], "")
+        return self
+
+    def blank_row(self):
+        row = [""] * len(self.headers)
+        for idx, value in self._constants:
+            row[idx] = value
+        return row
+
+    def iter_rows(self, chunks):
+        """
+        `chunks` yields (group_sizes, buffers) pairs; group g produces
+        group_sizes[g] rows.
+        """
+        row = self.blank_row()
+        for sizes, buffers in chunks:
+            # Buffers are resolved once per chunk, rows only index lists
+            group_cols = [(idx, buffers[name]) for idx, name in self._group_cols]
+            row_cols = [(idx, buffers[name]) for idx, name in self._row_cols]
+            r = 0
+            for g, size in enumerate(sizes):
+                for idx, buf in group_cols:
+                    row[idx] = buf[g]
+                for _ in range(size):
+                    for idx, buf in row_cols:
+                        row[idx] = buf[r]
+                    r += 1
+                    yield row
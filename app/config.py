@@ -1,6 +1,46 @@
 import os
 import logging
+import math
 import sys
+import tempfile
+
+
+def _cgroup_cpu_limit(root='/sys/fs/cgroup'):
+    # CFS quota as a number of cores (docker --cpus, k8s limits.cpu), or None.
+    # Read from the cgroup mounted at `root`, which inside a container is
+    # the container's own; v2 (cpu.max) first, then v1 (cpu.cfs_quota_us).
+    try:
+        with open(os.path.join(root, 'cpu.max')) as f:
+            quota, period = f.read().split()[:2]
+    except (OSError, ValueError):
+        try:
+            with open(os.path.join(root, 'cpu', 'cpu.cfs_quota_us')) as f:
+                quota = f.read().strip()
+            with open(os.path.join(root, 'cpu', 'cpu.cfs_period_us')) as f:
+                period = f.read().strip()
+        except OSError:
+            return None
+    try:
+        quota, period = int(quota), int(period)
+    except ValueError:
+        # "max": no quota
+        return None
+    if quota <= 0 or period <= 0:
+        return None
+    return max(1, math.ceil(quota / period))
+
+
+def _available_cores():
+    # Cores we may run on (sched_getaffinity: CPU pinning, taskset; not on
+    # macOS), capped by the CFS quota, which affinity does not reflect: a
+    # --cpus=2 container on a 32-core host still sees 32 cores there
+    if hasattr(os, 'sched_getaffinity'):
+        cores = len(os.sched_getaffinity(0)) or 1
+    else:
+        cores = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    return min(cores, limit) if limit else cores
+
 
 class Config:
     # 1. Base Paths
@@ -27,11 +67,81 @@ class Config:
         'https://docs.google.com/spreadsheets/d/1i71QcFcWq6QeWYloVCujokPZWRhXGi0y-1Cjt6DsGX4/export?format=csv'
     )
     
+    # Customer cache: serve for TTL, then revalidate in the background
+    CUSTOMERS_TTL_SECONDS = int(os.environ.get('CUSTOMERS_TTL_SECONDS', 3600))
+    CUSTOMERS_RETRY_SECONDS = int(os.environ.get('CUSTOMERS_RETRY_SECONDS', 60))
+    SHEET_TIMEOUT_SECONDS = float(os.environ.get('SHEET_TIMEOUT_SECONDS', 10))
+    # Huge sheets: read at most SHEET_MAX_ROWS rows, and/or keep a uniform
+    # random sample of SHEET_SAMPLE_ROWS of them (0 = no limit / no sampling)
+    SHEET_MAX_ROWS = int(os.environ.get('SHEET_MAX_ROWS', 0))
+    SHEET_SAMPLE_ROWS = int(os.environ.get('SHEET_SAMPLE_ROWS', 0))
+    # Last good sheet load, memory-mapped on cold start ('' disables it)
+    CUSTOMERS_SNAPSHOT_FILE = os.environ.get('CUSTOMERS_SNAPSHOT_FILE', os.path.join(DATA_DIR, 'clientes.snapshot'))
+    # How often the snapshot/JSON files are checked for changes (0 disables)
+    CUSTOMERS_WATCH_SECONDS = float(os.environ.get('CUSTOMERS_WATCH_SECONDS', 5))
+    # Cold start: how long a process waits for another one already fetching the sheet
+    SHEET_LEASE_WAIT_SECONDS = float(os.environ.get('SHEET_LEASE_WAIT_SECONDS', 30))
+    # Load customers in the background as soon as the app is created
+    WARM_CUSTOMERS_ON_BOOT = os.environ.get('WARM_CUSTOMERS_ON_BOOT', 'true').lower() == 'true'
+    
     # 4. App Settings
     PORT = int(os.environ.get('PORT', 3000))
     DEBUG = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
 
+    # 5. Output
+    # Workbook writer: "native" (streaming SpreadsheetML), "native-sst"
+    # (shared strings table) or "openpyxl" (reference implementation)
+    XLSX_BACKEND = os.environ.get('XLSX_BACKEND', 'native')
+
+    # 6. Parallel generation
+    # Large order requests are split into shards rendered by a process pool.
+    # A request may ask for fewer workers with "workers", never more than the max.
+    # Default: the cores this process may run on (affinity and cgroup CPU quota).
+    # Set it explicitly where neither is visible (nested cgroups, other OSes).
+    GENERATION_MAX_WORKERS = int(os.environ.get('GENERATION_MAX_WORKERS', _available_cores()))
+    GENERATION_WORKERS = int(os.environ.get('GENERATION_WORKERS', GENERATION_MAX_WORKERS))
+    SHARD_MIN_ORDERS = int(os.environ.get('SHARD_MIN_ORDERS', 50000))
+    PROCESS_START_METHOD = os.environ.get('PROCESS_START_METHOD', 'spawn')
+    # OFFLOAD: requests with at least this many rows are rendered in the pool,
+    # even with a single worker, so request threads only move bytes and stay
+    # free for other requests and health checks. Off by default on a single
+    # core, where the pool would just compete with the web process for it.
+    OFFLOAD_GENERATION = os.environ.get('OFFLOAD_GENERATION', str(_available_cores() > 1)).lower() == 'true'
+    OFFLOAD_MIN_ROWS = int(os.environ.get('OFFLOAD_MIN_ROWS', 5000))
+    # Scenario fleets this large are rendered in the pool while orders stream
+    SCENARIO_OFFLOAD_MIN_ROWS = int(os.environ.get('SCENARIO_OFFLOAD_MIN_ROWS', 20000))
+    # Files per /api/batch request
+    BATCH_MAX_SCENARIOS = int(os.environ.get('BATCH_MAX_SCENARIOS', 500))
+
+    # 7. Background jobs (/api/jobs)
+    JOBS_DIR = os.environ.get('JOBS_DIR', os.path.join(tempfile.gettempdir(), 'plannerpro-jobs'))
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 20))
+    JOB_TTL_SECONDS = int(os.environ.get('JOB_TTL_SECONDS', 3600))
+
+    # 8. Result cache (seeded requests only, 0 disables it)
+    RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'plannerpro-results'))
+    RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    # Identical seeded requests wait this long for the one already running
+    SINGLEFLIGHT_WAIT_SECONDS = float(os.environ.get('SINGLEFLIGHT_WAIT_SECONDS', 120))
+    # Buffered (non-streamed) workbooks past this size spill to a temp file
+    OUTPUT_SPOOL_BYTES = int(os.environ.get('OUTPUT_SPOOL_BYTES', 32 * 1024 * 1024))
+    OUTPUT_SPOOL_DIR = os.environ.get('OUTPUT_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'plannerpro-output'))
+
+    # 9. Admission control (cost = cells written: rows x columns)
+    # Cells generated at once per process (0 = unlimited); later requests queue
+    ADMISSION_BUDGET_CELLS = int(os.environ.get('ADMISSION_BUDGET_CELLS', 80_000_000))
+    # Bigger single requests get a 413 (0 = no ceiling)
+    ADMISSION_MAX_REQUEST_CELLS = int(os.environ.get('ADMISSION_MAX_REQUEST_CELLS', 40_000_000))
+    # Streamed output (CSV/TSV, ?stream=1, jobs) only holds a chunk at a time:
+    # it counts this fraction of its cells against the budget and the ceiling
+    ADMISSION_STREAM_WEIGHT = float(os.environ.get('ADMISSION_STREAM_WEIGHT', 0.1))
+    # Requests waiting for budget, and how long each waits, before a 429
+    ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 16))
+    ADMISSION_QUEUE_SECONDS = float(os.environ.get('ADMISSION_QUEUE_SECONDS', 30))
+    ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get('ADMISSION_RETRY_AFTER_SECONDS', 10))
+
 def configure_logging(app):
     """
     Configure JSON-friendly logging for Cloud Run.
@@ -0,0 +1,420 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import uuid
+from array import array
+from itertools import accumulate, islice
+
+# Columnar customer storage.
+#
+# A snapshot used to be a tuple of dicts: seven string keys and seven string
+# values per customer, roughly 1 KB each. Here every column is one flat
+# buffer instead:
+#   - country, city, name: interned (each distinct value stored once) plus
+#     one uint32 code per row
+#   - address, id: one contiguous utf-8 blob per column plus uint32
+#     offsets (so up to 4 GB of text per column)
+#   - lat, long: the same, only when some row has coordinates. Kept as the
+#     text they came as, so they are written out exactly as given
+# which is ~60-80 bytes per customer. Rows are read through CustomerRecord
+# views (dict-like .get) or, on the generation hot path, column by column
+# for a list of row ids.
+#
+# Buffers are never written after build(), so pickling is cheap (a few big
+# bytes objects) and fork-based workers share the pages copy-on-write.
+#
+# A store can also be saved as a binary snapshot file (write_store) and
+# memory-mapped back (open_store): a JSON header with the interned tables and
+# section offsets, then each column buffer as-is, 8-byte aligned. Opening one
+# copies nothing, the columns are memoryviews over the mapping.
+
+INTERNED = ('country', 'city', 'name')
+TEXT = ('address', 'id')
+COORDS = ('lat', 'long')
+FIELDS = TEXT[:1] + INTERNED[:2] + COORDS + INTERNED[2:] + TEXT[1:]
+
+# Snapshot file layout: MAGIC, <format version, header length>, JSON header
+MAGIC = b"PPCSTORE"
+# 2: coordinates as text
+FORMAT_VERSION = 2
+_PREAMBLE = struct.Struct('<II')
+
+
+def _coord_text(value):
+    # Numbers from JSON print as Python does; sheet strings stay as they are
+    return b'' if value is None else str(value).encode('utf-8')
+
+
+class CustomerRecord:
+    """Read-only view of one row; behaves like the old record dict for reads."""
+    __slots__ = ('_store', 'row')
+
+    def __init__(self, store, row):
+        self._store = store
+        self.row = row
+
+    def get(self, key, default=None):
+        value = self._store.value(key, self.row)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self._store.value(key, self.row)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self._store.value(key, self.row) is not None
+
+    def keys(self):
+        return [key for key in FIELDS if key in self]
+
+    def to_dict(self):
+        return {key: self[key] for key in self.keys()}
+
+    def __eq__(self, other):
+        if isinstance(other, CustomerRecord):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"CustomerRecord({self.to_dict()!r})"
+
+
+class CustomerStoreBuilder:
+    """
+    Accumulates rows (append / add) and freezes them into a CustomerStore.
+    Rows are buffered as tuples and moved into the columns FLUSH_ROWS at a
+    time, which keeps the per-row cost close to building a dict.
+    """
+    FLUSH_ROWS = 8192
+
+    def __init__(self):
+        # value -> code per interned column, codes per row
+        self._interned = {key: {} for key in INTERNED}
+        self._codes = {key: array('I') for key in INTERNED}
+        self._blobs = {key: bytearray() for key in TEXT + COORDS}
+        self._offsets = {key: array('I', [0]) for key in TEXT + COORDS}
+        self._has_coords = False
+        self._pending = []
+        self._count = 0
+
+    def __len__(self):
+        return self._count + len(self._pending)
+
+    def append(self, address, country, city, lat=None, long=None, name=None, id=''):
+        """Adds one customer. Missing country/city/name are kept as missing."""
+        self._pending.append((address, id, country, city, name, lat, long))
+        if len(self._pending) >= self.FLUSH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        columns = dict(zip(TEXT + INTERNED + COORDS, zip(*self._pending)))
+        self._count += len(self._pending)
+        self._pending = []
+
+        for key in TEXT + COORDS:
+            if key in COORDS:
+                encoded = list(map(_coord_text, columns[key]))
+                self._has_coords = self._has_coords or any(encoded)
+            else:
+                encoded = [str(v).encode('utf-8') if v else b'' for v in columns[key]]
+            offsets = self._offsets[key]
+            offsets.extend(islice(accumulate(map(len, encoded), initial=offsets[-1]), 1, None))
+            self._blobs[key] += b''.join(encoded)
+
+        for key in INTERNED:
+            table = self._interned[key]
+            self._codes[key].extend([table.setdefault(v, len(table)) for v in columns[key]])
+
+    def add(self, record):
+        """Adds one record dict (keys as in the customers JSON file)."""
+        get = record.get
+        self.append(get('address'), get('country'), get('city'),
+                    get('lat'), get('long'), get('name'), get('id'))
+
+    def build(self):
+        self._flush()
+        store = CustomerStore.__new__(CustomerStore)
+        store.size = self._count
+        for key in INTERNED:
+            values = [None] * len(self._interned[key])
+            for value, code in self._interned[key].items():
+                values[code] = value
+            setattr(store, key + '_values', tuple(values))
+            setattr(store, key + '_codes', self._codes[key])
+        for key in TEXT + COORDS:
+            present = key in TEXT or self._has_coords
+            setattr(store, key + '_blob', bytes(self._blobs[key]) if present else None)
+            setattr(store, key + '_offsets', self._offsets[key] if present else None)
+        return store
+
+
+class CustomerStore:
+    """
+    Immutable columnar customer table (see the module comment). Indexing
+    and iteration give CustomerRecord views.
+    """
+    @classmethod
+    def from_records(cls, records):
+        builder = CustomerStoreBuilder()
+        for record in records:
+            builder.add(record)
+        return builder.build()
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self.size
+        if not 0 <= row < self.size:
+            raise IndexError(row)
+        return CustomerRecord(self, row)
+
+    def __iter__(self):
+        for row in range(self.size):
+            yield CustomerRecord(self, row)
+
+    # SINGLE VALUES (record views)
+
+    def value(self, key, row):
+        """Column `key` of `row`; None when the row has no value for it."""
+        if key in TEXT:
+            return self._texts(key, (row,))[0]
+        if key in INTERNED:
+            return getattr(self, key + '_values')[getattr(self, key + '_codes')[row]]
+        if key in COORDS:
+            return self.coords(key, (row,))[0] or None
+        return None
+
+    # COLUMNS FOR A BATCH OF ROWS (generation hot path)
+
+    def _texts(self, key, rows):
+        blob = getattr(self, key + '_blob')
+        offsets = getattr(self, key + '_offsets')
+        return [str(blob[offsets[r]:offsets[r + 1]], 'utf-8') for r in rows]
+
+    def addresses(self, rows):
+        return self._texts('address', rows)
+
+    def customer_ids(self, rows):
+        return self._texts('id', rows)
+
+    def coords(self, key, rows):
+        """lat or long for `rows`, as given ('' where missing)."""
+        if getattr(self, key + '_blob') is None:
+            return [''] * len(rows)
+        return self._texts(key, rows)
+
+    def countries(self, rows):
+        codes, values = self.country_codes, self.country_values
+        return [values[codes[r]] for r in rows]
+
+    def take(self, rows):
+        """
+        New store holding just `rows`, in that order (what a pool worker
+        needs for a range of orders). Interned tables keep only used values.
+        """
+        store = CustomerStore.__new__(CustomerStore)
+        store.size = len(rows)
+        for key in INTERNED:
+            codes, values = getattr(self, key + '_codes'), getattr(self, key + '_values')
+            used = {}
+            setattr(store, key + '_codes', array('I', [used.setdefault(codes[r], len(used)) for r in rows]))
+            setattr(store, key + '_values', tuple(values[code] for code in used))
+        for key in TEXT + COORDS:
+            blob, offsets = getattr(self, key + '_blob'), getattr(self, key + '_offsets')
+            if blob is None:
+                setattr(store, key + '_blob', None)
+                setattr(store, key + '_offsets', None)
+                continue
+            pieces = [blob[offsets[r]:offsets[r + 1]] for r in rows]
+            setattr(store, key + '_blob', b''.join(pieces))
+            setattr(store, key + '_offsets', array('I', accumulate(map(len, pieces), initial=0)))
+        return store
+
+    def groups(self):
+        """
+        {(country code, city code): row ids in row order}. Built on first use
+        (or read from the snapshot file); the country/city index starts here.
+        """
+        groups = getattr(self, '_groups', None)
+        if groups is None:
+            groups = {}
+            for row, key in enumerate(zip(self.country_codes, self.city_codes)):
+                ids = groups.get(key)
+                if ids is None:
+                    ids = groups[key] = array('I')
+                ids.append(row)
+            self._groups = groups
+        return groups
+
+    # WHOLE-STORE
+
+    def __getstate__(self):
+        # Memory-mapped columns are memoryviews, which do not pickle; row
+        # groups are only needed for the index, so workers do not get them
+        state = dict(self.__dict__)
+        state.pop('_groups', None)
+        for key, value in state.items():
+            if isinstance(value, memoryview):
+                if value.format == 'B':
+                    state[key] = bytes(value)
+                else:
+                    state[key] = array(value.format)
+                    state[key].frombytes(value.cast('B'))
+        return state
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the column buffers."""
+        total = 0
+        for key in INTERNED:
+            codes = getattr(self, key + '_codes')
+            total += len(codes) * codes.itemsize
+            total += sum(len(v.encode('utf-8')) for v in getattr(self, key + '_values') if v)
+        for key in self._text_columns():
+            offsets = getattr(self, key + '_offsets')
+            total += len(getattr(self, key + '_blob')) + len(offsets) * offsets.itemsize
+        return total
+
+    def _text_columns(self):
+        # Coordinates only when the store has any
+        return [key for key in TEXT + COORDS if getattr(self, key + '_blob') is not None]
+
+    def digest(self):
+        """Content hash over every column buffer."""
+        h = hashlib.sha256()
+        for key in INTERNED:
+            h.update(repr(getattr(self, key + '_values')).encode('utf-8'))
+            h.update(getattr(self, key + '_codes').tobytes())
+        for key in TEXT + COORDS:
+            blob = getattr(self, key + '_blob')
+            if blob is None:
+                h.update(b'-')
+                continue
+            h.update(blob)
+            h.update(getattr(self, key + '_offsets').tobytes())
+        return h.hexdigest()
+
+
+def _sections(store):
+    for key in INTERNED:
+        yield key + '_codes', getattr(store, key + '_codes')
+    for key in store._text_columns():
+        yield key + '_blob', getattr(store, key + '_blob')
+        yield key + '_offsets', getattr(store, key + '_offsets')
+
+
+def _padding(position):
+    return -position % 8
+
+
+def write_store(path, store, meta=None):
+    """
+    Saves `store` (plus a JSON-serializable `meta` dict) as a snapshot file.
+    Written under a temporary name and renamed, so readers only ever see a
+    complete file.
+    """
+    groups = store.groups()
+    group_rows = array('I')
+    for ids in groups.values():
+        group_rows.extend(ids)
+    sections = list(_sections(store)) + [('group_rows', group_rows)]
+    layout = {}
+    header = {
+        "byteorder": sys.byteorder,
+        "size": store.size,
+        "digest": store.digest(),
+        "values": {key: list(getattr(store, key + '_values')) for key in INTERNED},
+        "groups": [[country, city, len(ids)] for (country, city), ids in groups.items()],
+        "sections": layout,
+        "meta": meta or {},
+    }
+    # Offsets depend on the header length, which depends on the offsets:
+    # lay sections out after a guessed data start until the header fits
+    data_start = 0
+    while True:
+        position = data_start
+        for name, buffer in sections:
+            view = memoryview(buffer)
+            layout[name] = [position, view.nbytes, view.format]
+            position += view.nbytes + _padding(view.nbytes)
+        encoded = json.dumps(header).encode('utf-8')
+        needed = len(MAGIC) + _PREAMBLE.size + len(encoded)
+        needed += _padding(needed)
+        if needed <= data_start:
+            break
+        data_start = needed
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(_PREAMBLE.pack(FORMAT_VERSION, len(encoded)))
+            f.write(encoded)
+            f.write(b'\0' * (data_start - f.tell()))
+            for name, buffer in sections:
+                f.write(buffer)
+                f.write(b'\0' * _padding(layout[name][1]))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def open_store(path):
+    """
+    Memory-maps a snapshot file. Returns (store, header), header being the
+    dict written by write_store (its "meta" and "digest" included). Raises
+    ValueError for files that are not snapshots, truncated, or from an
+    incompatible format or byte order.
+    """
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapping)
+    start = len(MAGIC) + _PREAMBLE.size
+    if len(view) < start or bytes(view[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a customer snapshot")
+    version, header_size = _PREAMBLE.unpack(view[len(MAGIC):start])
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported snapshot format {version}")
+    header = json.loads(str(view[start:start + header_size], 'utf-8'))
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"{path}: written on a {header['byteorder']}-endian machine")
+
+    store = CustomerStore.__new__(CustomerStore)
+    store.size = header["size"]
+    for key in INTERNED:
+        setattr(store, key + '_values', tuple(header["values"][key]))
+    for key in COORDS:
+        setattr(store, key + '_blob', None)
+        setattr(store, key + '_offsets', None)
+    for name, (offset, size, typecode) in header["sections"].items():
+        if offset + size > len(view):
+            raise ValueError(f"{path} is truncated")
+        section = view[offset:offset + size]
+        setattr(store, name, section if typecode == 'B' else section.cast(typecode))
+
+    # Row groups are small next to the data: copied out so they pickle as is
+    group_rows = store.__dict__.pop('group_rows')
+    store._groups = {}
+    position = 0
+    for country, city, count in header["groups"]:
+        ids = array('I')
+        ids.frombytes(group_rows[position:position + count].cast('B'))
+        store._groups[(country, city)] = ids
+        position += count
+    return store, header
@@ -0,0 +1,612 @@
+import csv
+import io
+import json
+import logging
+import os
+import random
+import threading
+import time
+import unicodedata
+from array import array
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process refresh coordination
+    fcntl = None
+
+from .config import Config
+from .customer_store import CustomerStore, CustomerStoreBuilder, open_store, write_store
+from .metrics import phase
+
+# Customer data cache.
+#
+# The addresses sheet is fetched once, then served from an in-memory snapshot
+# for CUSTOMERS_TTL_SECONDS. After that the stale snapshot keeps being served
+# while a background thread revalidates it with a conditional GET
+# (ETag / Last-Modified), so an unchanged sheet costs a 304 and nothing else.
+# New snapshots replace the old one with a single reference swap: requests
+# already holding a snapshot are never blocked or mutated.
+#
+# Every good sheet load is also saved as a binary snapshot file
+# (CUSTOMERS_SNAPSHOT_FILE). A cold start maps that file instead of waiting
+# on the sheet, so the service is ready at once and works offline; the sheet
+# is revalidated in the background right after. A watcher thread swaps in
+# the snapshot file (or the local JSON file) whenever it changes on disk.
+#
+# With several server processes, the snapshot file is also how they share
+# customers: loaded data is always served from the mapped file (page cache,
+# one copy for every process), and a lock next to it (_RefreshLease) lets
+# only one process fetch the sheet while the others pick up its file.
+
+def _get_logger():
+    # Refreshes run on a background thread, outside any app context
+    try:
+        from flask import current_app
+        return current_app.logger
+    except Exception:
+        return logging.getLogger(__name__)
+
+
+def fold(text):
+    """
+    Normalized lookup key: lowercase, trimmed, accents removed
+    ("Valparaíso " -> "valparaiso").
+    """
+    decomposed = unicodedata.normalize('NFKD', str(text).lower().strip())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+class CustomerIndex:
+    """
+    folded country -> folded city -> row ids (compact unsigned int arrays).
+    Built once per snapshot so request filtering never scans every record.
+    """
+    def __init__(self, store):
+        # Fold each distinct country/city once, then merge the store's row
+        # groups (spellings that fold the same share one list, in row order)
+        countries = [fold(v or '') for v in store.country_values]
+        cities = [fold(v or '') for v in store.city_values]
+        by_country = {}
+        for (country, city), ids in store.groups().items():
+            country_cities = by_country.setdefault(countries[country], {})
+            merged = country_cities.get(cities[city])
+            country_cities[cities[city]] = ids if merged is None else array('I', sorted(merged + ids))
+        self._by_country = by_country
+
+    def select(self, country_filter, city_filter):
+        """
+        Row ids matching the request filters, or None for "everything".
+
+        Same semantics as the old linear scan: filters are substring matches,
+        and a filter containing "otro" matches anything. Cost is the number
+        of distinct countries/cities plus the number of matches.
+        """
+        target_country = fold(country_filter or '')
+        target_city = fold(city_filter or '')
+        any_country = not target_country or "otro" in target_country
+        any_city = not target_city or "otro" in target_city
+        if any_country and any_city:
+            return None
+
+        parts = []
+        for country, cities in self._by_country.items():
+            if not any_country and target_country not in country:
+                continue
+            for city, ids in cities.items():
+                if any_city or target_city in city:
+                    parts.append(ids)
+
+        if len(parts) == 1:
+            return parts[0]
+        selected = array('I')
+        for ids in parts:
+            selected.extend(ids)
+        return selected
+
+
+class CustomerSnapshot:
+    """
+    Immutable set of customer records plus where/when they came from, and
+    the country/city index over them. `records` is a CustomerStore (plain
+    record dicts are converted).
+    """
+    def __init__(self, records, source, etag=None, last_modified=None, loaded_at=None, index=None, version=None):
+        if not isinstance(records, CustomerStore):
+            records = CustomerStore.from_records(records)
+        self.records = records
+        self.source = source
+        self.etag = etag
+        self.last_modified = last_modified
+        self.loaded_at = loaded_at if loaded_at is not None else time.time()
+        self.index = index if index is not None else CustomerIndex(self.records)
+        self._version = version
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def version(self):
+        """
+        Content hash of the records (computed on first use). Output caches
+        key on it, so any data change invalidates them.
+        """
+        if self._version is None:
+            self._version = self.records.digest()[:16]
+        return self._version
+
+    def select_ids(self, country_filter, city_filter):
+        """
+        Row ids matching the filters, or None for every record. Falls back to
+        everything when no record matches (same as before the index existed).
+        """
+        ids = self.index.select(country_filter, city_filter)
+        return ids if ids else None
+
+    def select(self, country_filter, city_filter):
+        """Record views matching the filters (prefer select_ids)."""
+        ids = self.select_ids(country_filter, city_filter)
+        if ids is None:
+            return list(self.records)
+        records = self.records
+        return [records[i] for i in ids]
+
+    def revalidated(self):
+        """Same data, fresh timestamp (sheet answered 304 Not Modified)."""
+        return CustomerSnapshot(self.records, self.source, self.etag, self.last_modified,
+                                index=self.index, version=self._version)
+
+
+class _NotModified(Exception):
+    pass
+
+
+# Fixed seed: the same sheet always yields the same sample
+SAMPLE_SEED = "sheet-sample"
+
+
+def _sheet_customer(row):
+    """Normalized (address, country, city) of a sheet row, or None to skip it."""
+    if len(row) < 3: return None
+    # Basic normalization
+    addr = row[0].strip()
+    country = row[1].strip()
+    city = row[2].strip()
+
+    # Simple heuristc to skip header
+    if "direccion" in addr.lower() and "pais" in country.lower():
+        return None
+
+    # Senior QA: Ensure critical data isn't empty
+    if not addr or not country:
+        return None
+    return addr, country, city
+
+
+def _append_sheet_customer(customers, customer):
+    addr, country, city = customer
+    customers.append(
+        addr, country, city,
+        # Sheet doesn't have lat/long
+        name="Cliente Sheet", # Generic name
+        id=f"S-{random.randint(1000,9999)}",
+    )
+
+
+def parse_sheet_rows(rows, max_rows=None, sample_rows=None):
+    """
+    Sheet CSV rows -> CustomerStore, one row at a time.
+    Data structure: Col A=Address, Col B=Country, Col C=City
+
+    Reading stops after `max_rows` valid rows; with `sample_rows` only a
+    uniform random sample of that many is kept (reservoir sampling, in
+    sheet order). Both default to the Config settings, 0 disables them.
+    """
+    max_rows = Config.SHEET_MAX_ROWS if max_rows is None else max_rows
+    sample_rows = Config.SHEET_SAMPLE_ROWS if sample_rows is None else sample_rows
+
+    customers = CustomerStoreBuilder()
+    reservoir = []
+    rng = random.Random(SAMPLE_SEED)
+    seen = 0
+    for row in rows:
+        customer = _sheet_customer(row)
+        if customer is None:
+            continue
+        if max_rows and seen >= max_rows:
+            _get_logger().warning(f"Sheet has more than {max_rows} rows, only the first {max_rows} are loaded.")
+            break
+        seen += 1
+        if not sample_rows:
+            _append_sheet_customer(customers, customer)
+        elif len(reservoir) < sample_rows:
+            reservoir.append((seen, customer))
+        else:
+            slot = rng.randrange(seen)
+            if slot < sample_rows:
+                reservoir[slot] = (seen, customer)
+
+    if sample_rows:
+        reservoir.sort(key=lambda item: item[0])
+        for _, customer in reservoir:
+            _append_sheet_customer(customers, customer)
+        if seen > sample_rows:
+            _get_logger().info(f"Sampled {sample_rows} of {seen} sheet rows.")
+    return customers.build()
+
+
+def fetch_sheet(url, previous=None):
+    """
+    Downloads and parses the addresses sheet. With a previous snapshot the
+    request is conditional; raises _NotModified on 304.
+
+    The body is streamed: decoded incrementally straight into the CSV reader
+    and the customer store, so the raw download, the decoded text and the
+    row lists never exist as whole copies.
+    """
+    headers = {}
+    if previous is not None:
+        if previous.etag:
+            headers['If-None-Match'] = previous.etag
+        if previous.last_modified:
+            headers['If-Modified-Since'] = previous.last_modified
+
+    # Imported here: requests is slow to import and only needed for the sheet
+    import requests
+
+    # Add timeout for production standards
+    response = requests.get(url, headers=headers, timeout=Config.SHEET_TIMEOUT_SECONDS, stream=True)
+    try:
+        if response.status_code == 304:
+            raise _NotModified()
+        response.raise_for_status()
+
+        # gzip/deflate transfer encodings are undone by urllib3 while reading;
+        # auto_close off so the text wrapper can see EOF instead of a closed file
+        response.raw.decode_content = True
+        response.raw.auto_close = False
+        text = io.TextIOWrapper(response.raw, encoding='utf-8', newline='')
+        customers = parse_sheet_rows(csv.reader(text, delimiter=','))
+    finally:
+        response.close()
+    if not len(customers):
+        return None
+    return CustomerSnapshot(
+        customers, "sheet",
+        etag=response.headers.get('ETag'),
+        last_modified=response.headers.get('Last-Modified'),
+    )
+
+
+def load_local_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return CustomerSnapshot(json.load(f), "file")
+
+
+def save_snapshot_file(snapshot, path):
+    """Writes `snapshot` (data and where it came from) as a binary snapshot file."""
+    write_store(path, snapshot.records, {
+        "source": snapshot.source,
+        "etag": snapshot.etag,
+        "last_modified": snapshot.last_modified,
+        "loaded_at": snapshot.loaded_at,
+    })
+
+
+def load_snapshot_file(path):
+    """Memory-maps a file written by save_snapshot_file back into a snapshot."""
+    store, header = open_store(path)
+    meta = header["meta"]
+    # The file is touched whenever the sheet answers 304, so its mtime is
+    # when the data was last validated. Same float as CustomerCache compares
+    # against (st_mtime can round differently from st_mtime_ns / 1e9)
+    validated = max(meta.get("loaded_at") or 0, os.stat(path).st_mtime_ns / 1e9)
+    return CustomerSnapshot(
+        store, meta.get("source", "sheet"),
+        etag=meta.get("etag"),
+        last_modified=meta.get("last_modified"),
+        loaded_at=validated,
+        version=header["digest"][:16],
+    )
+
+
+class _RefreshLease:
+    """
+    Cross-process lock (flock on "<snapshot file>.lock") held while fetching
+    the sheet. Without a snapshot file or fcntl every process is its own leader.
+    """
+    def __init__(self, snapshot_file):
+        self.path = snapshot_file + '.lock' if snapshot_file and fcntl else None
+        self._fd = None
+
+    def acquire(self, wait=0.0):
+        """True once held; False if still busy after `wait` seconds."""
+        if self.path is None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.time() + wait
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._fd = fd
+                return True
+            except BlockingIOError:
+                if time.time() >= deadline:
+                    os.close(fd)
+                    return False
+                time.sleep(0.05)
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+def _file_state(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class CustomerCache:
+    """
+    TTL cache over the sheet (with the local JSON file as fallback).
+
+    get() never blocks once a snapshot exists: stale data is returned and a
+    single background refresh is started.
+    """
+    def __init__(self, sheet_url=None, local_file=None, ttl=None, snapshot_file=None, watch_interval=None):
+        self.sheet_url = Config.ADDRESSES_SHEET_URL if sheet_url is None else sheet_url
+        self.local_file = Config.CUSTOMERS_FILE if local_file is None else local_file
+        self.ttl = Config.CUSTOMERS_TTL_SECONDS if ttl is None else ttl
+        self.snapshot_file = Config.CUSTOMERS_SNAPSHOT_FILE if snapshot_file is None else snapshot_file
+        self.watch_interval = Config.CUSTOMERS_WATCH_SECONDS if watch_interval is None else watch_interval
+        self._snapshot = None
+        self._static = False
+        self._next_check = 0.0
+        self._load_lock = threading.Lock()
+        self._refreshing = False
+        # path -> (mtime, size, inode) last seen by the watcher
+        self._file_states = {}
+        self._watching = False
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self._load_blocking()
+        if not self._static and time.time() >= self._next_check:
+            self._refresh_in_background()
+        return snapshot
+
+    def peek(self):
+        """Current snapshot (may be None), without triggering any load."""
+        return self._snapshot
+
+    def warm(self):
+        """Loads the first snapshot on a background thread (app boot)."""
+        if self._snapshot is None:
+            threading.Thread(target=self._load_blocking, name="customer-warm", daemon=True).start()
+
+    def set_static(self, records):
+        """Pins a fixed dataset (tests, scripts). Disables refreshes."""
+        self._static = True
+        self._swap(CustomerSnapshot(records, "static"))
+
+    def age(self):
+        snapshot = self._snapshot
+        return None if snapshot is None else time.time() - snapshot.loaded_at
+
+    def _swap(self, snapshot):
+        # One reference assignment; readers see either the old or the new one
+        self._snapshot = snapshot
+        delay = self.ttl if len(snapshot) else Config.CUSTOMERS_RETRY_SECONDS
+        # Data loaded from an old snapshot file is revalidated early
+        self._next_check = min(time.time(), snapshot.loaded_at) + delay
+
+    def _load_blocking(self):
+        # Cold start: the first caller loads, concurrent callers wait for it
+        snapshot = self.preload()
+        self._start_watcher()
+        return snapshot
+
+    # PRE-FORK SERVERS (see gunicorn.conf.py)
+
+    def preload(self):
+        """Loads the first snapshot now, without starting any thread."""
+        with self._load_lock:
+            if self._snapshot is None:
+                self._swap(self._load(None))
+            return self._snapshot
+
+    def preload_snapshot_file(self):
+        """
+        In the pre-fork master: maps the snapshot file if there is one, for
+        the workers to inherit. Never fetches the sheet (that would hold up
+        every worker's boot); returns the snapshot or None.
+        """
+        with self._load_lock:
+            if self._snapshot is None:
+                snapshot = self._load_snapshot_file()
+                if snapshot:
+                    self._swap(snapshot)
+            return self._snapshot
+
+    def after_fork(self):
+        """
+        In a forked worker: fresh locks and watcher (threads do not survive
+        fork), or the background warm-up if the master had nothing to map.
+        """
+        self._load_lock = threading.Lock()
+        self._refreshing = False
+        self._watching = False
+        if self._snapshot is not None:
+            self._start_watcher()
+        else:
+            self.warm()
+
+    # FILE WATCHER
+
+    def _start_watcher(self):
+        if self._watching or self._static or self.watch_interval <= 0:
+            return
+        self._watching = True
+        for path in (self.snapshot_file, self.local_file):
+            if path:
+                self._file_states[path] = _file_state(path)
+        threading.Thread(target=self._watch, name="customer-watch", daemon=True).start()
+
+    def _watch(self):
+        while not self._static:
+            time.sleep(self.watch_interval)
+            try:
+                self.check_files()
+            except Exception as e:
+                _get_logger().error(f"Error reloading changed customer file: {e}")
+
+    def _changed(self, path):
+        if not path:
+            return False
+        state = _file_state(path)
+        changed = state is not None and state != self._file_states.get(path)
+        self._file_states[path] = state
+        return changed
+
+    def check_files(self):
+        """
+        Swaps in the snapshot file or the local JSON file if it changed since
+        the last check (called by the watcher thread).
+        """
+        if self._static:
+            return
+        current = self._snapshot
+        if self._changed(self.snapshot_file):
+            snapshot = load_snapshot_file(self.snapshot_file)
+            if len(snapshot) and (current is None or snapshot.version != current.version):
+                self._swap(snapshot)
+                _get_logger().info(f"Snapshot file changed, loaded {len(snapshot)} addresses.")
+        if self._changed(self.local_file) and (current is None or current.source in ("file", "empty")):
+            snapshot = load_local_file(self.local_file)
+            self._swap(snapshot)
+            _get_logger().info(f"Local JSON changed, loaded {len(snapshot)} addresses.")
+
+    def _refresh_in_background(self):
+        with self._load_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name="customer-refresh", daemon=True).start()
+
+    def refresh(self):
+        """Revalidates the snapshot now (runs on the refresh thread)."""
+        try:
+            snapshot = self._load(self._snapshot)
+            if self._static:
+                return
+            self._swap(snapshot)
+        except Exception as e:
+            _get_logger().error(f"Customer refresh failed, serving stale data: {e}")
+            self._next_check = time.time() + Config.CUSTOMERS_RETRY_SECONDS
+        finally:
+            self._refreshing = False
+
+    def _load_snapshot_file(self):
+        if not self.snapshot_file or not os.path.exists(self.snapshot_file):
+            return None
+        try:
+            with phase("snapshot_load"):
+                snapshot = load_snapshot_file(self.snapshot_file)
+        except Exception as e:
+            _get_logger().error(f"Ignoring unreadable snapshot file {self.snapshot_file}: {e}")
+            return None
+        if not len(snapshot):
+            return None
+        _get_logger().info(f"Loaded {len(snapshot)} addresses from snapshot file.")
+        return snapshot
+
+    def _save_snapshot_file(self, snapshot):
+        """
+        Saves a sheet load and returns it mapped back from the file, so this
+        process shares its pages with every other process mapping it.
+        """
+        if not self.snapshot_file:
+            return snapshot
+        try:
+            save_snapshot_file(snapshot, self.snapshot_file)
+            # Our own write is not a change for the watcher
+            self._file_states[self.snapshot_file] = _file_state(self.snapshot_file)
+            return load_snapshot_file(self.snapshot_file)
+        except Exception as e:
+            _get_logger().error(f"Could not save snapshot file {self.snapshot_file}: {e}")
+            return snapshot
+
+    def _touch_snapshot_file(self):
+        # Sheet answered 304: tell the other processes the file is current
+        try:
+            os.utime(self.snapshot_file)
+            self._file_states[self.snapshot_file] = _file_state(self.snapshot_file)
+        except (OSError, TypeError):
+            pass
+
+    def _shared_snapshot_file(self, previous):
+        """
+        The snapshot file if another process validated it after `previous`
+        was loaded and within the TTL, else None.
+        """
+        state = _file_state(self.snapshot_file) if self.snapshot_file else None
+        if state is None:
+            return None
+        validated = state[0] / 1e9  # as in load_snapshot_file
+        if time.time() - validated >= self.ttl:
+            return None
+        if previous is not None and validated <= previous.loaded_at:
+            return None
+        return self._load_snapshot_file()
+
+    def _load(self, previous):
+        # 0. Cold start: last good sheet load, mapped from the snapshot file
+        #    (the TTL check revalidates it against the sheet right after)
+        if previous is None and self.sheet_url:
+            snapshot = self._load_snapshot_file()
+            if snapshot:
+                return snapshot
+
+        # 1. Try Google Sheet, one process at a time
+        if self.sheet_url:
+            lease = _RefreshLease(self.snapshot_file)
+            wait = Config.SHEET_LEASE_WAIT_SECONDS if previous is None else 0
+            if not lease.acquire(wait) and previous is not None:
+                # Another process is refreshing; its result arrives through
+                # the snapshot file (watcher), keep serving ours until then
+                return previous.revalidated()
+            try:
+                snapshot = self._shared_snapshot_file(previous)
+                if snapshot:
+                    return snapshot
+                with phase("sheet_fetch"):
+                    snapshot = fetch_sheet(self.sheet_url, previous if previous and previous.source == "sheet" else None)
+                if snapshot:
+                    _get_logger().info(f"Loaded {len(snapshot)} addresses from Google Sheet.")
+                    return self._save_snapshot_file(snapshot)
+            except _NotModified:
+                _get_logger().info("Google Sheet not modified, keeping cached addresses.")
+                self._touch_snapshot_file()
+                return previous.revalidated()
+            except Exception as e:
+                _get_logger().error(f"Error fetching/parsing Google Sheet: {e}")
+                if previous is not None and previous.source == "sheet":
+                    # Stale sheet data beats the fallback file; retry later
+                    raise
+            finally:
+                lease.release()
+
+        # 2. Fallback to Local JSON
+        try:
+            snapshot = load_local_file(self.local_file)
+            _get_logger().info("Loaded addresses from local JSON.")
+            return snapshot
+        except Exception as e:
+            _get_logger().error(f"Error loading customers from JSON: {e}")
+            return CustomerSnapshot([], "empty")
@@ -0,0 +1,51 @@
+import csv
+import io
+import itertools
+from collections import namedtuple
+
+# Plain-text output (CSV / TSV).
+#
+# Rows go through csv.writer into a small text buffer that is encoded and
+# handed to the caller every ROWS_PER_WRITE rows, so there is no workbook and
+# memory stays constant whatever the row count. Quoting is the csv module's
+# minimal quoting: fields with the delimiter, quotes or newlines are quoted.
+
+DelimitedFormat = namedtuple('DelimitedFormat', 'delimiter mimetype extension')
+
+FORMATS = {
+    "csv": DelimitedFormat(",", "text/csv", "csv"),
+    "tsv": DelimitedFormat("\t", "text/tab-separated-values", "tsv"),
+}
+
+# Lets Excel detect UTF-8 when the file is opened with a double click
+UTF8_BOM = b'\xef\xbb\xbf'
+
+# Rows written to the text buffer before it is encoded and yielded
+ROWS_PER_WRITE = 2000
+
+
+def get_format(name):
+    """DelimitedFormat for "csv"/"tsv" (case-insensitive)."""
+    fmt = FORMATS.get(str(name).lower())
+    if fmt is None:
+        raise ValueError(f"Unknown output format: {name}")
+    return fmt
+
+
+def iter_delimited(rows, delimiter=",", bom=False):
+    """
+    Generator of utf-8 bytes chunks for `rows` (header included). Rows are
+    consumed lazily and may be the same reused list (see ColumnPlan).
+    """
+    if bom:
+        yield UTF8_BOM
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=delimiter, lineterminator='\r\n')
+    rows = iter(rows)
+    while True:
+        writer.writerows(itertools.islice(rows, ROWS_PER_WRITE))
+        if not buf.tell():
+            return
+        yield buf.getvalue().encode('utf-8')
+        buf.seek(0)
+        buf.truncate()
@@ -0,0 +1,205 @@
+import atexit
+import itertools
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from .config import Config
+from .delimited import iter_delimited
+from .xlsx import encode_rows, iter_xlsx
+
+# Process pool shared by everything that wants to run generation work on
+# more than one core. Created on first use and torn down at exit.
+#
+# When a child dies (OOM kill, segfault) the executor is broken for good:
+# every later submit raises BrokenProcessPool. It is then replaced by a new
+# one, and the tasks it lost are run once more (see map_ordered).
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool._broken:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=Config.GENERATION_MAX_WORKERS,
+                mp_context=multiprocessing.get_context(Config.PROCESS_START_METHOD),
+            )
+        return _pool
+
+
+def shutdown_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+atexit.register(shutdown_process_pool)
+
+
+def _replace_pool(broken):
+    # Another thread may have replaced it already
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+    return get_process_pool()
+
+
+def submit(fn, *args):
+    pool = get_process_pool()
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        return _replace_pool(pool).submit(fn, *args)
+
+
+def map_ordered(fn, args_list, window):
+    """
+    Runs fn(*args) in the pool and yields results in submission order,
+    keeping at most `window` tasks in flight so finished-but-unconsumed
+    results cannot pile up in memory. Tasks lost to a broken pool are run
+    again, once, in a new one.
+    """
+    pool = get_process_pool()
+    pending = deque()  # [args, future], oldest first
+    args_iter = iter(args_list)
+    exhausted = retried = False
+    try:
+        while True:
+            try:
+                while not exhausted and len(pending) < window:
+                    args = next(args_iter, None)
+                    if args is None:
+                        exhausted = True
+                    else:
+                        pending.append([args, None])
+                        pending[-1][1] = pool.submit(fn, *args)
+                if not pending:
+                    return
+                result = pending[0][1].result()
+            except BrokenProcessPool:
+                if retried:
+                    raise
+                retried = True
+                pool = _replace_pool(pool)
+                for task in pending:
+                    task[1] = pool.submit(fn, *task[0])
+                continue
+            pending.popleft()
+            yield result
+    finally:
+        for _, future in pending:
+            if future is not None:
+                future.cancel()
+
+
+def map_unordered(fn, args_list, window):
+    """
+    Like map_ordered, but yields (index, result) as soon as each task
+    finishes. Still at most `window` tasks in flight.
+    """
+    pool = get_process_pool()
+    pending = {}  # index -> [args, future]
+    tasks = enumerate(args_list)
+    exhausted = retried = False
+    try:
+        while True:
+            try:
+                while not exhausted and len(pending) < window:
+                    task = next(tasks, None)
+                    if task is None:
+                        exhausted = True
+                    else:
+                        index, args = task
+                        pending[index] = [args, None]
+                        pending[index][1] = pool.submit(fn, *args)
+                if not pending:
+                    return
+                owners = {future: index for index, (_, future) in pending.items()}
+                done, _ = wait(owners, return_when=FIRST_COMPLETED)
+                finished = [(owners[future], future.result()) for future in done]
+            except BrokenProcessPool:
+                if retried:
+                    raise
+                retried = True
+                pool = _replace_pool(pool)
+                for task in pending.values():
+                    task[1] = pool.submit(fn, *task[0])
+                continue
+            for index, result in finished:
+                del pending[index]
+                yield index, result
+    finally:
+        for _, future in pending.values():
+            if future is not None:
+                future.cancel()
+
+
+def render_order_shard(job, c0, c1):
+    """Worker: <row> XML bytes for chunks [c0, c1) of an OrderJob."""
+    return encode_rows(job.rows(c0, c1), job.first_row(c0))
+
+
+def render_job_rows(job):
+    """Worker: <row> XML bytes for every row of a job (header excluded)."""
+    return encode_rows(job.rows(), 2)
+
+
+def render_job_file(job, title, fmt=None, bom=False):
+    """Worker: a complete single-sheet file, .xlsx or CSV/TSV with `fmt`."""
+    rows = itertools.chain([job.plan.headers], job.rows())
+    if fmt is not None:
+        return b''.join(iter_delimited(rows, fmt.delimiter, bom))
+    return b''.join(iter_xlsx([(title, rows)]))
+
+
+def render_delimited_shard(job, c0, c1, delimiter):
+    """Worker: CSV/TSV bytes for chunks [c0, c1) of an OrderJob (no header, no BOM)."""
+    return b''.join(iter_delimited(job.rows(c0, c1), delimiter))
+
+
+def _run_shards(fn, job, workers, progress, *extra):
+    # A few shards per worker so a slow shard does not stall the rest.
+    # Each shard ships a trimmed job (only its customers), built as the
+    # shard is submitted.
+    per_shard = max(1, job.n_chunks // (workers * 4))
+    shards = [(c0, min(c0 + per_shard, job.n_chunks)) for c0 in range(0, job.n_chunks, per_shard)]
+    items = job.sampler.s.items_per_order
+    total = job.row_count
+    if progress is not None:
+        progress(0, total)
+    tasks = ((job.portable(c0, c1), c0, c1) + extra for c0, c1 in shards)
+    results = map_ordered(fn, tasks, window=workers * 2)
+    for (_, c1), fragment in zip(shards, results):
+        yield fragment
+        if progress is not None:
+            progress(min(c1 * job.chunk_orders, job.count) * items, total)
+
+
+def sharded_order_fragments(job, headers, workers, progress=None):
+    """
+    Encoded sheet body for `job`, rendered by up to `workers` processes and
+    concatenated in order. Same bytes as the single-process path.
+    `progress(rows_done, rows_total)` is reported once per shard.
+    """
+    yield encode_rows([headers], 1)
+    yield from _run_shards(render_order_shard, job, workers, progress)
+
+
+def sharded_delimited(job, fmt, bom, workers, progress=None):
+    """
+    CSV/TSV bytes for `job` rendered in the pool (see sharded_order_fragments).
+    Rows never span shards, so the bytes match iter_delimited over all rows.
+    """
+    yield from iter_delimited([job.plan.headers], fmt.delimiter, bom)
+    yield from _run_shards(render_delimited_shard, job, workers, progress, fmt.delimiter)
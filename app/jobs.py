@@ -0,0 +1,246 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import Config
+
+# Background generation jobs.
+#
+# POST /api/jobs validates the request and resolves customers in the request
+# thread (so bad input is still a 400), then hands the byte generator to a
+# small thread pool that writes it to JOBS_DIR. Clients poll the job for
+# progress and download the finished file. Finished jobs and their files are
+# dropped JOB_TTL_SECONDS after they finish.
+#
+# Each job's state is also kept in "<id>.json" next to its file, so a gunicorn
+# worker that did not run the job can still answer for it (JOBS_DIR must be
+# shared by the workers, as the default temp dir is). A job whose process died
+# before finishing reads as failed. Whatever is left in JOBS_DIR past the TTL
+# by any process (crashes included) is swept at startup and on every expire.
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.filename = None
+        self.mimetype = None
+        self.status = QUEUED
+        self.rows_written = 0
+        self.rows_total = None
+        self.error = None
+        self.path = None
+        self.created_at = time.time()
+        self.finished_at = None
+        # Process running it (see JobManager.get)
+        self.pid = os.getpid()
+
+    def progress(self, done, total):
+        self.rows_written = done
+        self.rows_total = total
+
+    def to_dict(self):
+        fraction = None
+        if self.rows_total:
+            fraction = round(self.rows_written / self.rows_total, 4)
+        elif self.status == DONE:
+            fraction = 1.0
+        return {
+            "id": self.id,
+            "type": self.kind,
+            "status": self.status,
+            "rows_written": self.rows_written,
+            "rows_total": self.rows_total,
+            "progress": fraction,
+            "filename": self.filename,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+    def to_state(self):
+        """Everything needed to rebuild the job in another process."""
+        return dict(self.to_dict(), path=self.path, mimetype=self.mimetype, pid=self.pid)
+
+    @classmethod
+    def from_state(cls, state):
+        job = cls(state["type"])
+        for name in ("id", "status", "rows_written", "rows_total", "filename", "error",
+                     "created_at", "finished_at", "path", "mimetype", "pid"):
+            setattr(job, name, state[name])
+        return job
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists, owned by someone else
+        return True
+    return True
+
+
+class JobManager:
+    """
+    Runs generation jobs on a bounded thread pool and keeps their files on
+    disk until they expire. `render(progress)` callables come from
+    GenerationService.render_orders / render_vehicles.
+    """
+    def __init__(self, directory=None, workers=None, ttl=None, max_pending=None):
+        self.directory = directory or Config.JOBS_DIR
+        self.workers = workers or Config.JOB_WORKERS
+        self.ttl = Config.JOB_TTL_SECONDS if ttl is None else ttl
+        self.max_pending = Config.JOB_MAX_PENDING if max_pending is None else max_pending
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        # Leftovers of earlier (possibly crashed) processes
+        self.sweep()
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        return self._pool
+
+    def submit(self, kind, render):
+        """
+        `render(progress)` returns (chunks, filename, mimetype) and must do
+        its validation eagerly; a ValueError there never creates a job.
+        """
+        self.expire()
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if j.status in (QUEUED, RUNNING))
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} jobs already pending")
+
+        job = Job(kind)
+        saved = [0.0]
+
+        def progress(done, total):
+            job.progress(done, total)
+            # Other workers see progress through the sidecar, about once a second
+            if time.monotonic() - saved[0] >= 1:
+                saved[0] = time.monotonic()
+                self._save(job)
+
+        chunks, job.filename, job.mimetype = render(progress)
+        with self._lock:
+            self._jobs[job.id] = job
+            pool = self._get_pool()
+        self._save(job)
+        pool.submit(self._run, job, chunks)
+        return job
+
+    def get(self, job_id):
+        """The job, run by this process or (from its sidecar) another one."""
+        self.expire()
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None or not job_id.isalnum():
+            return job
+        job = self._load(job_id)
+        if job is not None and job.status in (QUEUED, RUNNING) and not _alive(job.pid):
+            job.status = FAILED
+            job.error = "The process running the job exited"
+        return job
+
+    def _state_path(self, job_id):
+        return os.path.join(self.directory, job_id + ".json")
+
+    def _save(self, job):
+        # Written whole then renamed: readers never see half a file
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._state_path(job.id)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job.to_state(), f)
+        os.replace(tmp_path, path)
+
+    def _load(self, job_id):
+        try:
+            with open(self._state_path(job_id), 'r', encoding='utf-8') as f:
+                return Job.from_state(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _run(self, job, chunks):
+        job.status = RUNNING
+        self._save(job)
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, job.id)
+        tmp_path = path + ".part"
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            # Only complete files ever appear under the final name
+            os.replace(tmp_path, path)
+            job.path = path
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            job.finished_at = time.time()
+            self._save(job)
+
+    def expire(self):
+        """Drops finished jobs older than the TTL, with their files."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [j for j in self._jobs.values()
+                       if j.finished_at is not None and j.finished_at < cutoff]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            for path in (job.path, self._state_path(job.id)):
+                if path and os.path.exists(path):
+                    os.remove(path)
+        self.sweep()
+
+    def sweep(self):
+        """
+        Removes files in the directory untouched for the TTL, whichever
+        process left them, except those of jobs still queued or running in
+        a live process (a running job's file keeps being written anyway).
+        """
+        cutoff = time.time() - self.ttl
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if os.stat(path).st_mtime >= cutoff:
+                    continue
+            except OSError:
+                continue
+            job = self._load(name.split('.')[0])
+            if job is not None and job.status in (QUEUED, RUNNING) and _alive(job.pid):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
@@ -0,0 +1,155 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Phase timing and Prometheus metrics.
+#
+# Code wraps its steps in `with phase("name"):`. Every timing goes into a
+# process-wide histogram (served by /metrics) and, when the current thread is
+# handling an API request, into that request's RequestTimer, which becomes
+# its Server-Timing header. Background threads (cache refresh, jobs) only
+# feed the histograms.
+
+# Histogram buckets in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_current_timer = contextvars.ContextVar('request_timer', default=None)
+
+
+class RequestTimer:
+    """Phase durations of one request, in the order they first ran."""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def server_timing(self):
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def start_request():
+    """Starts timing the current request (see routes before_request)."""
+    timer = RequestTimer()
+    _current_timer.set(timer)
+    return timer
+
+
+def current_timer():
+    return _current_timer.get()
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._rows = {}
+        self._bytes = {}
+
+    def observe_phase(self, name, seconds):
+        with self._lock:
+            hist = self._phases.get(name)
+            if hist is None:
+                hist = self._phases[name] = _Histogram()
+            hist.observe(seconds)
+
+    def add_output(self, kind, rows, size):
+        with self._lock:
+            self._rows[kind] = self._rows.get(kind, 0) + rows
+            self._bytes[kind] = self._bytes.get(kind, 0) + size
+
+    def render(self, gauges=None, counters=None):
+        """
+        Prometheus text exposition. `gauges`/`counters` are extra
+        {name: (help, value)} samples computed by the caller at scrape time.
+        """
+        lines = [
+            "# HELP plannerpro_phase_seconds Time spent per generation phase",
+            "# TYPE plannerpro_phase_seconds histogram",
+        ]
+        with self._lock:
+            for name, hist in sorted(self._phases.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, hist.counts):
+                    cumulative += count
+                    lines.append(f'plannerpro_phase_seconds_bucket{{phase="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'plannerpro_phase_seconds_bucket{{phase="{name}",le="+Inf"}} {hist.total}')
+                lines.append(f'plannerpro_phase_seconds_sum{{phase="{name}"}} {hist.sum:.6f}')
+                lines.append(f'plannerpro_phase_seconds_count{{phase="{name}"}} {hist.total}')
+            for metric, help_text, values in (
+                ("plannerpro_rows_generated_total", "Rows written to generated files", self._rows),
+                ("plannerpro_bytes_written_total", "Bytes of generated files", self._bytes),
+            ):
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for kind, value in sorted(values.items()):
+                    lines.append(f'{metric}{{kind="{kind}"}} {value}')
+
+        for kind, samples in (("gauge", gauges or {}), ("counter", counters or {})):
+            for name, (help_text, value) in samples.items():
+                if value is None:
+                    continue
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def observe(name, seconds):
+    registry.observe_phase(name, seconds)
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+@contextmanager
+def phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def timed_chunks(chunks, kind, rows, name="write"):
+    """
+    Passes output chunks through, timing only the work done producing them
+    (not the time spent waiting on the client), then counts rows and bytes.
+    """
+    elapsed = 0.0
+    size = 0
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            elapsed += time.perf_counter() - start
+            break
+        elapsed += time.perf_counter() - start
+        size += len(chunk)
+        yield chunk
+    observe(name, elapsed)
+    registry.add_output(kind, rows, size)
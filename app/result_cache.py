@@ -0,0 +1,232 @@
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Windows: each process evicts on its own
+    fcntl = None
+
+from .config import Config
+
+# On-disk cache of generated files, addressed by the request's content hash
+# (GenerationService.result_key). Only seeded requests are cacheable since
+# only they are reproducible. Each entry is "<key>" (the file) plus
+# "<key>.meta" (download name and mimetype); the index is rebuilt from the
+# directory on startup. Least recently used entries are evicted once the
+# total size goes over RESULT_CACHE_MAX_BYTES.
+#
+# The directory is shared by every gunicorn worker. The bound is for all of
+# them: eviction rescans the directory (under a flock on "<dir>/.lock") and
+# a hit touches the file, so "least recently used" is by mtime across
+# processes. A file evicted while another worker is sending it is fine, that
+# worker holds it open (see open()); one evicted before it was opened is
+# simply a miss.
+
+
+class _DirectoryLock:
+    # flock on "<directory>/.lock" for the duration of a with block
+    def __init__(self, directory):
+        self.path = os.path.join(directory, '.lock') if fcntl else None
+        self._fd = None
+
+    def __enter__(self):
+        if self.path is not None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class CacheEntry:
+    def __init__(self, key, path, size, filename, mimetype):
+        self.key = key
+        self.path = path
+        self.size = size
+        self.filename = filename
+        self.mimetype = mimetype
+
+
+class ResultCache:
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or Config.RESULT_CACHE_DIR
+        self.max_bytes = Config.RESULT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._loaded = False
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _read_entry(self, key):
+        # (last used, CacheEntry) from the files on disk, or None
+        try:
+            with open(self._path(key + '.meta'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            stat = os.stat(self._path(key))
+        except (OSError, ValueError):
+            return None
+        return stat.st_mtime, CacheEntry(key, self._path(key), stat.st_size, meta['filename'], meta['mimetype'])
+
+    def _load_index(self):
+        # Every entry on disk (any process's), least recently used first
+        self._loaded = True
+        self._entries = OrderedDict()
+        self._size = 0
+        if not os.path.isdir(self.directory):
+            return
+        found = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.meta'):
+                item = self._read_entry(name[:-5])
+                if item is not None:
+                    found.append(item)
+        for _, entry in sorted(found, key=lambda item: item[0]):
+            self._entries[entry.key] = entry
+            self._size += entry.size
+
+    def get(self, key):
+        """CacheEntry for `key` (marked as recently used), or None."""
+        with self._lock:
+            if not self._loaded:
+                self._load_index()
+            entry = self._entries.get(key)
+            if entry is None:
+                # Maybe written by another worker since
+                item = self._read_entry(key)
+                if item is not None:
+                    entry = self._entries[key] = item[1]
+                    self._size += entry.size
+            try:
+                if entry is None:
+                    raise FileNotFoundError(key)
+                # Last use, as every process sees it
+                os.utime(entry.path)
+            except OSError:
+                if entry is not None:
+                    self._forget(entry)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def open(self, entry):
+        """
+        The entry's file opened for reading, or None if it was evicted. Opened
+        under the lock, so a concurrent put cannot delete it first; once open
+        it outlives any later eviction (the bytes stay until it is closed).
+        """
+        with self._lock:
+            if entry.key not in self._entries:
+                return None
+            try:
+                return open(entry.path, 'rb')
+            except FileNotFoundError:
+                self._forget(entry)
+                return None
+
+    def put(self, key, chunks, filename, mimetype):
+        """
+        Writes `chunks` under `key` and returns its CacheEntry. The file only
+        appears under its final name once complete.
+        """
+        writer = self._write(key, chunks, filename, mimetype)
+        while True:
+            try:
+                next(writer)
+            except StopIteration as done:
+                return done.value
+
+    def tee(self, key, chunks, filename, mimetype):
+        """
+        Yields `chunks` as they come while writing them under `key`, for
+        responses that stream. The entry is only added once the last chunk
+        went through: a client that disconnects early leaves nothing behind.
+        """
+        yield from self._write(key, chunks, filename, mimetype)
+
+    def _write(self, key, chunks, filename, mimetype):
+        # Generator: yields each chunk once written, returns the CacheEntry
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        size = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            with open(path + '.meta', 'w', encoding='utf-8') as f:
+                json.dump({"filename": filename, "mimetype": mimetype}, f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        entry = CacheEntry(key, path, size, filename, mimetype)
+        with self._lock:
+            if not self._loaded:
+                self._load_index()
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old.size
+            self._entries[key] = entry
+            self._size += size
+            self._evict(keep=key)
+        return entry
+
+    def _evict(self, keep):
+        # Against the whole directory, whoever wrote it: the index is rebuilt
+        # from disk first. Oldest first; the entry just written stays even
+        # if it alone is too big
+        with _DirectoryLock(self.directory):
+            self._load_index()
+            for key in list(self._entries):
+                if self._size <= self.max_bytes:
+                    break
+                if key != keep:
+                    self._drop(self._entries[key])
+                    self.evictions += 1
+
+    def _forget(self, entry):
+        # Gone from disk (evicted by another process): index only
+        known = self._entries.pop(entry.key, None)
+        if known is not None:
+            self._size -= known.size
+
+    def _drop(self, entry):
+        self._forget(entry)
+        for path in (entry.path, entry.path + '.meta'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
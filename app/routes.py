@@ -1,25 +1,217 @@
-from flask import Blueprint, request, send_file, jsonify, current_app
-from .services import GenerationService
+from flask import Blueprint, Response, request, send_file, jsonify, current_app, stream_with_context
+from .services import GenerationService, expand_batch
+from .admission import AdmissionControl, Overloaded, RequestTooLarge
+from .delimited import get_format
+from .jobs import DONE, JobManager, JobQueueFull
+from .metrics import current_timer, start_request
+from .config import Config
+from .result_cache import ResultCache
+from .singleflight import SingleFlight, SingleFlightTimeout
+from .xlsx import XLSX_MIMETYPE
 import datetime
+import os
 
 api_bp = Blueprint('api', __name__)
 service = GenerationService()
+jobs = JobManager()
+result_cache = ResultCache()
+inflight = SingleFlight()
+admission = AdmissionControl()
 
-@api_bp.route('/generate', methods=['POST'])
-def generate():
+@api_bp.before_request
+def _start_timer():
+    start_request()
+
+@api_bp.after_request
+def _server_timing(response):
+    # Streamed bodies are still being written here: their header only has
+    # the phases before the first byte (the write phase goes to /metrics)
+    timer = current_timer()
+    if timer is not None and timer.phases:
+        response.headers['Server-Timing'] = timer.server_timing()
+    return response
+
+def _option(data, name):
+    # Query string wins over the JSON body
+    value = request.args.get(name)
+    if value is None and isinstance(data, dict):
+        value = data.get(name)
+    return value
+
+def _flag(data, name):
+    return str(_option(data, name)).lower() in ('1', 'true', 'yes')
+
+def _wants_stream(data):
+    """
+    Streaming is opt-in via ?stream=1 or "stream": true in the JSON body.
+    """
+    return _flag(data, 'stream')
+
+def _delimited_format(data):
+    """
+    ?format=csv|tsv (or "format" in the body). None means the default .xlsx.
+    """
+    name = _option(data, 'format')
+    if not name or str(name).lower() == 'xlsx':
+        return None
+    return get_format(name)
+
+def _send_cached(entry, status):
+    """send_file of a cache entry, or None if it was evicted meanwhile."""
+    # Werkzeug only evaluates conditionals on GET/HEAD; these are POSTs
+    if request.if_none_match.contains(entry.key):
+        response = Response(status=304)
+        response.set_etag(entry.key)
+        return response
+    # Opened under the cache lock: a concurrent put evicting the entry can
+    # no longer delete the file between the lookup and send_file
+    file = result_cache.open(entry)
+    if file is None:
+        return None
+    response = send_file(
+        file,
+        mimetype=entry.mimetype,
+        as_attachment=True,
+        download_name=entry.filename,
+        etag=entry.key
+    )
+    response.content_length = os.fstat(file.fileno()).st_size
+    response.headers['X-Cache'] = status
+    return response
+
+def _cached_result(kind, payload, fmt, bom, cost, streamed=False):
+    """
+    Seeded requests are served from the on-disk result cache, generating
+    into it on a miss (admitted for `cost` cells, hits are free). Returns
+    None when the request is not cacheable.
+
+    Hits are always sent from disk. A `streamed` miss (CSV/TSV, ?stream=1)
+    still streams: the file is written to the cache as the response goes
+    out instead of before its first byte, and it is not coalesced (each
+    identical stream generates; the last one to finish replaces the entry).
+    """
+    if not result_cache.enabled:
+        return None
+    key = service.result_key(kind, payload, fmt, bom)
+    if key is None:
+        return None
+    entry = result_cache.get(key)
+    if entry is not None:
+        response = _send_cached(entry, 'HIT')
+        if response is not None:
+            return response
+
+    render = service.render_orders if kind == 'orders' else service.render_vehicles
+    if streamed:
+        def respond():
+            chunks, filename, mimetype = render(payload, fmt, bom)
+            response = _stream_response(result_cache.tee(key, chunks, filename, mimetype), filename, mimetype)
+            response.set_etag(key)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+
+        return _admitted(cost, respond)
+
+    def generate():
+        with admission.admit(cost):
+            chunks, filename, mimetype = render(payload, fmt, bom)
+            return result_cache.put(key, chunks, filename, mimetype)
+
+    # Identical requests arriving meanwhile wait for this one's file
+    try:
+        entry, shared = inflight.do(key, generate, timeout=Config.SINGLEFLIGHT_WAIT_SECONDS)
+    except SingleFlightTimeout:
+        current_app.logger.warning(f"Timed out waiting for identical request {key[:12]}")
+        return jsonify({'error': 'Identical request still generating, retry later'}), 503, {'Retry-After': '5'}
+    # None: evicted by other puts before it could be opened (a cache smaller
+    # than what is generating at once); the route then generates it uncached
+    return _send_cached(entry, 'COALESCED' if shared else 'MISS')
+
+def _admitted(cost, respond):
+    """
+    respond() under an admission ticket for `cost` cells. Streamed bodies
+    generate while they are sent, so their ticket is held until the
+    response is closed. Raises RequestTooLarge/Overloaded (see _rejected).
+    """
+    ticket = admission.admit(cost)
+    try:
+        response = respond()
+    except BaseException:
+        ticket.release()
+        raise
+    if response.direct_passthrough:
+        # send_file of a finished file: the work is done, and Werkzeug hands
+        # the file wrapper straight to the server (on-close callbacks never run)
+        ticket.release()
+    else:
+        response.call_on_close(ticket.release)
+    return response
+
+def _rejected(e):
+    # 413 for requests no amount of waiting would admit, 429 for a busy server
+    current_app.logger.warning(f"Admission: {e}")
+    if isinstance(e, RequestTooLarge):
+        return jsonify({'error': str(e), 'cells': e.cost, 'limit': e.limit}), 413
+    return jsonify({'error': 'Server busy, retry later'}), 429, {'Retry-After': str(e.retry_after)}
+
+def _send_output(output, filename):
+    """
+    send_file for a SpooledOutput workbook. Once spilled to disk it is sent
+    by path (the server can sendfile it) and unlinked right away: the file
+    send_file opened keeps the bytes until the response is done. Small
+    ones are sent from memory and closed with the response.
+    """
+    if output.path is None:
+        return send_file(output, mimetype=XLSX_MIMETYPE, as_attachment=True, download_name=filename)
     try:
-        data = request.json
-        current_app.logger.info(f"Generate Orders Request: {data}")
-        
-        # The service handles the heavy lifting
-        file_stream, filename = service.generate_excel(data)
-        
         return send_file(
-            file_stream,
-            mimetype='text/csv',
+            output.path,
+            mimetype=XLSX_MIMETYPE,
             as_attachment=True,
             download_name=filename
         )
+    finally:
+        output.close()
+
+def _stream_response(chunks, filename, mimetype=XLSX_MIMETYPE):
+    # No Content-Length: the WSGI server falls back to chunked transfer
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@api_bp.route('/generate', methods=['POST'])
+def generate():
+    try:
+        data = request.json
+        current_app.logger.info(f"Generate Orders Request: {data}")
+
+        fmt = _delimited_format(data)
+        # Priced from the payload before any work (see admission.py)
+        streamed = fmt is not None or _wants_stream(data)
+        cost = admission.weigh(service.estimate_cost('orders', data), streamed)
+        cached = _cached_result('orders', data, fmt, _flag(data, 'bom'), cost, streamed)
+        if cached is not None:
+            return cached
+
+        def respond():
+            # CSV/TSV always streams, there is no workbook to buffer
+            if fmt:
+                chunks, filename = service.stream_delimited(data, fmt, bom=_flag(data, 'bom'))
+                return _stream_response(chunks, filename, fmt.mimetype)
+
+            if _wants_stream(data):
+                chunks, filename = service.stream_excel(data)
+                return _stream_response(chunks, filename)
+
+            # The service handles the heavy lifting
+            file_stream, filename = service.generate_excel(data)
+            return _send_output(file_stream, filename)
+
+        return _admitted(cost, respond)
+    except (RequestTooLarge, Overloaded) as e:
+        return _rejected(e)
     except ValueError as ve:
         current_app.logger.warning(f"Business Logic Error: {ve}")
         return jsonify({"error": str(ve)}), 400
@@ -46,18 +238,171 @@ def generate_vehicles():
              # If client sent just list? Unlikely with JSON. 
              # Let's assume data is the dict. 
              payload = data
-        
-        output, filename = service.generate_vehicles_excel(payload)
-        
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
-        )
+
+        fmt = _delimited_format(data)
+        streamed = fmt is not None or _wants_stream(data)
+        cost = admission.weigh(service.estimate_cost('vehicles', payload), streamed)
+        cached = _cached_result('vehicles', payload, fmt, _flag(data, 'bom'), cost, streamed)
+        if cached is not None:
+            return cached
+
+        def respond():
+            if fmt:
+                chunks, filename = service.stream_vehicles_delimited(payload, fmt, bom=_flag(data, 'bom'))
+                return _stream_response(chunks, filename, fmt.mimetype)
+
+            if _wants_stream(data):
+                chunks, filename = service.stream_vehicles_excel(payload)
+                return _stream_response(chunks, filename)
+
+            output, filename = service.generate_vehicles_excel(payload)
+            return _send_output(output, filename)
+
+        return _admitted(cost, respond)
+    except (RequestTooLarge, Overloaded) as e:
+        return _rejected(e)
     except ValueError as e:
         current_app.logger.warning(f"Business Logic Error (Vehicles): {e}")
         return jsonify({'error': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error generating vehicles: {e}", exc_info=True)
         return jsonify({'error': 'Internal Server Error'}), 500
+
+@api_bp.route('/scenario', methods=['POST'])
+def scenario():
+    """
+    Orders + fleet in one response: {"orders": {...}, "vehicles": {"groups": [...]},
+    "bundle": "zip"|"workbook", "format": "csv"|"tsv"} (format only with zip).
+    """
+    try:
+        data = request.json or {}
+        orders = data.get('orders')
+        vehicles = data.get('vehicles')
+        current_app.logger.info(f"Scenario Request: {orders}")
+        if not isinstance(orders, dict):
+            return jsonify({'error': 'No orders payload provided'}), 400
+        if not isinstance(vehicles, dict) or not vehicles.get('groups'):
+            return jsonify({'error': 'No vehicle groups provided'}), 400
+
+        def respond():
+            chunks, filename, mimetype = service.render_scenario(
+                orders, vehicles,
+                bundle=str(_option(data, 'bundle') or 'zip').lower(),
+                fmt=_delimited_format(data),
+                bom=_flag(data, 'bom'),
+            )
+            return _stream_response(chunks, filename, mimetype)
+
+        # The orders stream; a big fleet is rendered whole in the pool
+        cost = admission.weigh(service.estimate_cost('orders', orders), True) + service.estimate_cost('vehicles', vehicles)
+        return _admitted(cost, respond)
+    except (RequestTooLarge, Overloaded) as e:
+        return _rejected(e)
+    except ValueError as ve:
+        current_app.logger.warning(f"Business Logic Error (Scenario): {ve}")
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Server Error (Scenario): {e}", exc_info=True)
+        return jsonify({"error": "Internal Server Error"}), 500
+
+@api_bp.route('/batch', methods=['POST'])
+def batch():
+    """
+    Many files in one streamed zip: {"type": "orders"|"vehicles", "base": {...},
+    "matrix": {"fecha_entrega": [...], "ct_origen": [...]}} or
+    {"base": {...}, "scenarios": [{...}, ...]}.
+    """
+    try:
+        data = request.json or {}
+        param_sets = expand_batch(data.get('base'), data.get('matrix'), data.get('scenarios'))
+        current_app.logger.info(f"Batch Request: {len(param_sets)} scenarios")
+        kind = data.get('type', 'orders')
+
+        def respond():
+            chunks, filename, mimetype = service.render_batch(
+                kind, param_sets,
+                fmt=_delimited_format(data),
+                bom=_flag(data, 'bom'),
+            )
+            return _stream_response(chunks, filename, mimetype)
+
+        cost = service.estimate_batch_cost(kind, param_sets)
+        return _admitted(cost, respond)
+    except (RequestTooLarge, Overloaded) as e:
+        return _rejected(e)
+    except ValueError as ve:
+        current_app.logger.warning(f"Business Logic Error (Batch): {ve}")
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Server Error (Batch): {e}", exc_info=True)
+        return jsonify({"error": "Internal Server Error"}), 500
+
+@api_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    stats = result_cache.stats()
+    stats['single_flight'] = inflight.stats()
+    return jsonify(stats), 200
+
+@api_bp.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Queues a generation in the background: {"type": "orders"|"vehicles",
+    "params": {...}}. Params are the same bodies /generate and
+    /generate-vehicles accept (including "format").
+    """
+    try:
+        data = request.json or {}
+        kind = data.get('type', 'orders')
+        params = data.get('params') or {}
+        fmt = _delimited_format(params)
+        bom = _flag(params, 'bom')
+        current_app.logger.info(f"Create Job Request: {kind}")
+
+        if kind == 'orders':
+            render = lambda progress: service.render_orders(params, fmt, bom, progress)
+        elif kind == 'vehicles':
+            if not params.get('groups'):
+                return jsonify({'error': 'No vehicle groups provided'}), 400
+            render = lambda progress: service.render_vehicles(params, fmt, bom, progress)
+        else:
+            return jsonify({'error': f'Unknown job type: {kind}'}), 400
+        # Jobs are bounded by their own queue, only the size ceiling applies
+        # (they write their file chunk by chunk, like a streamed response)
+        admission.check(admission.weigh(service.estimate_cost(kind, params), True))
+
+        job = jobs.submit(kind, render)
+        body = job.to_dict()
+        body['url'] = f"{request.script_root}/api/jobs/{job.id}"
+        return jsonify(body), 202, {'Location': body['url']}
+    except RequestTooLarge as e:
+        return _rejected(e)
+    except JobQueueFull as e:
+        current_app.logger.warning(f"Job queue full: {e}")
+        return jsonify({'error': 'Too many pending jobs, retry later'}), 503, {'Retry-After': '30'}
+    except ValueError as ve:
+        current_app.logger.warning(f"Business Logic Error (Jobs): {ve}")
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Server Error (Create Job): {e}", exc_info=True)
+        return jsonify({"error": "Internal Server Error"}), 500
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    return jsonify(job.to_dict()), 200
+
+@api_bp.route('/jobs/<job_id>/file', methods=['GET'])
+def job_file(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    if job.status != DONE:
+        return jsonify(job.to_dict()), 409
+    return send_file(
+        job.path,
+        mimetype=job.mimetype,
+        as_attachment=True,
+        download_name=job.filename
+    )
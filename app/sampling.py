@@ -0,0 +1,289 @@
+import copy
+import itertools
+import math
+import random
+
+# Batch sampling for the random order/fleet columns.
+#
+# Instead of calling random.uniform / randint / choice per order and item,
+# every random column of a chunk is drawn at once with Random.choices(k=...)
+# or a single list comprehension, then formatted in bulk with map().
+#
+# Each chunk draws from its own RNG stream derived from (seed, chunk index),
+# so any range of chunks can be generated independently (see OrderJob) and
+# the output for a seed does not depend on how the work was split.
+
+# Rows (order items) sampled per chunk; bounds the size of the column
+# buffers whatever items_por_orden is. A job's orders per chunk follow from
+# its params (OrderJob.chunk_orders), so the layout is fixed for a seed.
+CHUNK_ROWS = 4096
+
+# Bumped whenever the same seed starts producing different rows (it is part
+# of the result cache key). 2: chunks sized by rows instead of orders.
+STREAM_LAYOUT = 2
+
+LOCALE_DATA = {
+    "LATAM": {
+        "names": ["Juan", "Maria", "Carlos", "Ana", "Jose", "Luis", "Sofia", "Camila", "Pedro", "Diego"],
+        "surnames": ["Gonzalez", "Rodriguez", "Perez", "Fernandez", "Lopez", "Diaz", "Martinez", "Silva", "Rojas", "Soto"]
+    },
+    "US": {
+        "names": ["John", "Mary", "Michael", "Jennifer", "James", "Linda", "Robert", "Patricia", "David", "Elizabeth"],
+        "surnames": ["Smith", "Johnson", "Williams", "Jones", "Brown", "Davis", "Miller", "Wilson", "Moore", "Taylor"]
+    }
+}
+LATAM_COUNTRIES = ["chile", "argentina", "colombia", "mexico", "peru", "bolivia", "uruguay", "ecuador", "venezuela", "paraguay"]
+
+# Every "name surname" pair, so one draw replaces two random.choice calls
+NAME_POOLS = {
+    region: [f"{n} {s}" for n, s in itertools.product(data["names"], data["surnames"])]
+    for region, data in LOCALE_DATA.items()
+}
+NAME_POOL_SIZE = len(NAME_POOLS["US"])
+
+PHONE_RANGE = range(11111111, 100000000)
+
+
+def new_seed():
+    return random.getrandbits(64)
+
+
+def stream_rng(seed, *counter):
+    """
+    Independent Random for (seed, counter...). String seeds are hashed with
+    SHA-512 by Random.seed, so this is stable across processes and runs.
+    """
+    return random.Random("/".join(str(part) for part in (seed,) + counter))
+
+
+def region_for(country_input):
+    c = country_input.lower()
+    if any(x in c for x in LATAM_COUNTRIES):
+        return "LATAM"
+    return "US" # Default/Global
+
+
+def uniform_strs(rng, low, high, k):
+    """k uniform floats in [low, high] formatted with 4 decimals (dot separator)."""
+    span = high - low
+    rand = rng.random
+    return list(map("{:.4f}".format, [low + span * rand() for _ in range(k)]))
+
+
+class OrderSampler:
+    """
+    Draws every random order column for a range of orders at once.
+
+    `settings` is the resolved request (see GenerationService._build_orders);
+    `plan` supplies the tag columns to draw.
+    """
+    def __init__(self, settings, plan):
+        self.s = settings
+        self.tag_columns = plan.tag_columns
+        self._regions = {}
+
+    def _region(self, country):
+        region = self._regions.get(country)
+        if region is None:
+            region = self._regions[country] = region_for(country)
+        return region
+
+    def chunk(self, rng, start, stop, store, customers):
+        """
+        Buffers for orders [start, stop). `customers` holds one CustomerStore
+        row id per order. Returns (group_sizes, buffers) for ColumnPlan.iter_rows.
+        """
+        s = self.s
+        n = stop - start
+        items = s.items_per_order
+        n_rows = n * items
+        first_item = start * items + 1
+
+        # Region per distinct country, then one lookup per order
+        country_default = s.country_filter
+        pools = [NAME_POOLS[self._region(c if c is not None else country_default)]
+                 for c in store.country_values]
+        codes = store.country_codes
+        name_idx = rng.choices(range(NAME_POOL_SIZE), k=n)
+        contacts = [pools[codes[r]][k] for r, k in zip(customers, name_idx)]
+
+        buffers = {
+            "order_id": list(map("ORD-{:06d}".format, range(start + 1, stop + 1))),
+            "lat": store.coords('lat', customers),
+            "long": store.coords('long', customers),
+            "address": store.addresses(customers),
+            "customer_id": store.customer_ids(customers),
+            "contact": contacts,
+            "email": list(map("contacto{}@example.com".format, range(start, stop))),
+            "cap1": uniform_strs(rng, s.cap_min, s.cap_max, n),
+            "cap2": (uniform_strs(rng, s.cap2_min, s.cap2_max, n)
+                     if s.cap2_min is not None and s.cap2_max is not None else [""] * n),
+            "item_name": list(map("Item {}".format, range(first_item, first_item + n_rows))),
+            "sku": list(map("SKU-{}".format, range(first_item, first_item + n_rows))),
+            "phone": list(map("569{}".format, rng.choices(PHONE_RANGE, k=n_rows))),
+        }
+        for name, values in self.tag_columns:
+            buffers[name] = rng.choices(values, k=n_rows)
+
+        return [items] * n, buffers
+
+
+class CustomerWalk:
+    """
+    Order i -> customer row id in an immutable CustomerStore.
+
+    Walks the selected row ids (`ids`, or every row when None) from a
+    random offset with a random stride coprime to their count, so any m
+    consecutive orders visit m distinct customers in a seed-dependent order
+    without copying, shuffling or mutating anything shared.
+    """
+    def __init__(self, store, ids, rng):
+        self.store = store
+        self.ids = ids
+        self.size = m = len(store) if ids is None else len(ids)
+        self.offset = rng.randrange(m)
+        stride = 1
+        if m > 2:
+            stride = rng.randrange(1, m)
+            while math.gcd(stride, m) != 1:
+                stride = rng.randrange(1, m)
+        self.stride = stride
+
+    def batch(self, start, stop):
+        """Customer row ids for orders [start, stop)."""
+        m, step = self.size, self.stride
+        positions = range(self.offset + start * step, self.offset + stop * step, step)
+        if self.ids is None:
+            return [p % m for p in positions]
+        ids = self.ids
+        return [ids[p % m] for p in positions]
+
+    def window(self, first, last):
+        """The same walk restricted to orders [first, last), as a CustomerWindow."""
+        return CustomerWindow(self.store.take(self.batch(first, last)), first)
+
+
+class CustomerWindow:
+    """
+    Customers of orders [first, first + len(store)) only: row i of `store`
+    belongs to order first + i. Cut from a CustomerWalk so pool workers get
+    a few thousand customers instead of the whole snapshot.
+    """
+    def __init__(self, store, first):
+        self.store = store
+        self.first = first
+
+    def batch(self, start, stop):
+        return list(range(start - self.first, stop - self.first))
+
+
+class OrderJob:
+    """
+    Everything needed to generate any range of orders. Picklable, so shard
+    workers receive one of these and render chunks [c0, c1) on their own.
+
+    `customers` is the request's CustomerWalk (order i gets
+    customers.batch(i, i + 1)[0]), which keeps ORD-n, SKU-n and the RNG
+    streams independent of the chunk layout.
+    """
+    def __init__(self, plan, settings, seed, customers, count):
+        self.plan = plan
+        self.sampler = OrderSampler(settings, plan)
+        self.seed = seed
+        self.customers = customers
+        self.count = count
+        self.chunk_orders = max(1, CHUNK_ROWS // settings.items_per_order)
+
+    @property
+    def n_chunks(self):
+        return (self.count + self.chunk_orders - 1) // self.chunk_orders
+
+    @property
+    def row_count(self):
+        return self.count * self.sampler.s.items_per_order
+
+    def first_row(self, chunk):
+        """Sheet row number of the chunk's first item (row 1 is the header)."""
+        return chunk * self.chunk_orders * self.sampler.s.items_per_order + 2
+
+    def chunks(self, c0=0, c1=None):
+        if c1 is None:
+            c1 = self.n_chunks
+        for k in range(c0, c1):
+            start = k * self.chunk_orders
+            stop = min(start + self.chunk_orders, self.count)
+            batch = self.customers.batch(start, stop)
+            yield self.sampler.chunk(stream_rng(self.seed, "orders", k), start, stop,
+                                     self.customers.store, batch)
+
+    def rows(self, c0=0, c1=None):
+        return self.plan.iter_rows(self.chunks(c0, c1))
+
+    def portable(self, c0=0, c1=None):
+        """
+        Copy to send to a pool worker for chunks [c0, c1): carries only the
+        customers those orders use, when that is less than the whole store.
+        """
+        if c1 is None:
+            c1 = self.n_chunks
+        first, last = c0 * self.chunk_orders, min(c1 * self.chunk_orders, self.count)
+        if last - first >= len(self.customers.store):
+            return self
+        job = copy.copy(self)
+        job.customers = self.customers.window(first, last)
+        return job
+
+
+class FleetJob:
+    """
+    Fleet counterpart of OrderJob. Fleets are small, so they are a single
+    chunk; picklable so the whole fleet can be rendered in a worker.
+
+    `groups` is a list of (_VehicleGroup, plate sequence range).
+    """
+    def __init__(self, plan, seed, groups):
+        self.plan = plan
+        self.seed = seed
+        self.groups = groups
+
+    @property
+    def count(self):
+        return sum(len(seqs) for _, seqs in self.groups)
+
+    @property
+    def row_count(self):
+        return self.count
+
+    def chunks(self):
+        yield vehicle_chunk(stream_rng(self.seed, "fleet"), self.groups, self.plan)
+
+    def rows(self):
+        return self.plan.iter_rows(self.chunks())
+
+    def portable(self):
+        # Nothing to trim: a fleet carries no customer data
+        return self
+
+
+def vehicle_chunk(rng, groups, plan):
+    """
+    Buffers for the whole fleet: one group per vehicle group.
+    `groups` is a list of (_VehicleGroup, plate sequence range).
+    """
+    plates = []
+    for g, seqs in groups:
+        plates.extend([g.prefix + "{:02d}".format(seq) for seq in seqs])
+    n_rows = len(plates)
+
+    buffers = {
+        "origin": [g.origin for g, _ in groups],
+        "cap1": [g.cap1 for g, _ in groups],
+        "cap2": [g.cap2 for g, _ in groups],
+        "start_time": [g.start_time for g, _ in groups],
+        "end_time": [g.end_time for g, _ in groups],
+        "plate": plates,
+    }
+    for name, values in plan.tag_columns:
+        buffers[name] = rng.choices(values, k=n_rows)
+
+    return [len(seqs) for _, seqs in groups], buffers
@@ -1,22 +1,175 @@
-import os
-import io
-import csv
-import json
-import random
-import requests
+import hashlib
 import itertools
+import json
+import re
 from datetime import datetime
-from openpyxl import Workbook
+from collections import namedtuple
 from .config import Config
+from .columns import ColumnPlan
+from .customers import CustomerCache
+from .delimited import iter_delimited
+from .bundle import BUNDLE_MIMETYPE, Measured, iter_zip
+from .spool import SpooledOutput
+from .executor import (map_unordered, render_job_file, render_job_rows, sharded_delimited,
+                       sharded_order_fragments, submit)
+from .metrics import phase, registry, timed_chunks
+from .sampling import STREAM_LAYOUT, CustomerWalk, FleetJob, OrderJob, new_seed, stream_rng
+from .xlsx import XLSX_MIMETYPE, EncodedSheet, encode_rows, get_backend
+
+from flask import current_app, g, has_request_context
+
+# Resolved request values used by the samplers
+_OrderSettings = namedtuple('_OrderSettings', 'items_per_order cap_min cap_max cap2_min cap2_max country_filter')
+_VehicleGroup = namedtuple('_VehicleGroup', 'prefix origin cap1 cap2 start_time end_time')
+
+# Request keys that change how a file is delivered, not its bytes
+_TRANSPORT_KEYS = ('stream', 'format', 'bom', 'workers')
+
+_SLUG = re.compile(r'[^A-Za-z0-9]+')
+
+# Rows between progress callbacks
+PROGRESS_EVERY = 1000
+
+# Fixed columns of the order and fleet plans, before tag columns (used to
+# price requests before building them; kept in sync by the tests)
+ORDER_COLUMNS = 24
+FLEET_COLUMNS = 25
+
+def _with_extension(filename, extension):
+    return filename.rsplit('.', 1)[0] + '.' + extension
+
+def expand_batch(base=None, matrix=None, scenarios=None):
+    """
+    Parameter sets for a batch: each of `scenarios` merged over `base`, or
+    every combination of the `matrix` values ({"ct_origen": [...], ...}).
+    """
+    base = dict(base or {})
+    if scenarios:
+        if not all(isinstance(s, dict) for s in scenarios):
+            raise ValueError("Batch scenarios must be objects.")
+        sets = [dict(base, **s) for s in scenarios]
+    elif matrix:
+        keys = list(matrix)
+        values = [v if isinstance(v, list) else [v] for v in matrix.values()]
+        sets = [dict(base, **dict(zip(keys, combo))) for combo in itertools.product(*values)]
+    else:
+        raise ValueError("Batch needs a 'matrix' or a list of 'scenarios'.")
+    if len(sets) > Config.BATCH_MAX_SCENARIOS:
+        raise ValueError(f"Batch too large: {len(sets)} scenarios (max {Config.BATCH_MAX_SCENARIOS}).")
+    return sets
+
+def _batch_filename(index, params, filename, extension):
+    # 001_CD-Norte_2025-01-15_ordenes_100.xlsx
+    parts = [f"{index:03d}"]
+    for key in ('ct_origen', 'fecha_entrega'):
+        value = _SLUG.sub('-', str(params.get(key) or '')).strip('-')
+        if value:
+            parts.append(value)
+    parts.append(_with_extension(filename, extension))
+    return "_".join(parts)
+
+def _batch_window():
+    # Files of a batch rendered at once; the rest have not started yet
+    return max(1, Config.GENERATION_MAX_WORKERS) * 2
+
+
+def _pending_fragments(*parts):
+    """Yields bytes and the results of process pool futures, in order."""
+    for part in parts:
+        yield part if isinstance(part, bytes) else part.result()
+
+def _tracked(rows, progress, total):
+    """Passes rows through, reporting progress(rows_done, rows_total)."""
+    if progress is None:
+        return rows
+    def tracked():
+        done = 0
+        progress(done, total)
+        for row in rows:
+            yield row
+            done += 1
+            if done % PROGRESS_EVERY == 0:
+                progress(done, total)
+        progress(done, total)
+    return tracked()
+
+def _order_size(params):
+    """(orders, items per order) from an order request, with the usual defaults."""
+    try:
+        count = int(params.get('cantidad_ordenes', 40))
+    except (ValueError, TypeError):
+        count = 40
+    try:
+        items_per_order = int(params.get('items_por_orden') or 1)
+    except (ValueError, TypeError):
+        items_per_order = 1
+    if items_per_order < 1: items_per_order = 1
+    return count, items_per_order
 
-from flask import current_app
+def _tag_count(params):
+    tags = params.get('tags') if isinstance(params, dict) else None
+    return len(tags) if isinstance(tags, list) else 0
+
+def _fleet_groups(groups_list):
+    """
+    [(_VehicleGroup, plate numbers range)] for a fleet request's groups.
+    Negative counts are treated as 0.
+    """
+    prefix_map = { "Moto": "MOTO", "Auto": "AUTO", "Camion": "CAMI", "Bici": "BICI", "Otro": "OTRO" }
+    counters = {k: 0 for k in prefix_map.values()}
+
+    resolved = []
+    for group in groups_list:
+        v_type = group.get('type', 'Otro')
+        count = max(int(group.get('count', 0)), 0)
+        cap1 = group.get('capacity1', '')
+        cap2 = group.get('capacity2', '')
+
+        prefix = prefix_map.get(v_type, "OTRO")
+        if v_type not in prefix_map: 
+            prefix = v_type[:4].upper()
+            if prefix not in counters: counters[prefix] = 0
+
+        # Plate sequences continue per prefix across groups
+        first = counters[prefix] + 1
+        counters[prefix] += count
+        resolved.append((
+            _VehicleGroup(
+                prefix,
+                group.get('origin', ''),
+                str(cap1) if cap1 else "",
+                str(cap2) if cap2 else "",
+                group.get('start_time', ''),
+                group.get('end_time', ''),
+            ),
+            range(first, first + count)
+        ))
+    return resolved
+
+def _finished(chunks, progress, total):
+    """Passes chunks through, reporting progress only at start and end (pool work)."""
+    if progress is None:
+        return chunks
+    def reported():
+        progress(0, total)
+        yield from chunks
+        progress(total, total)
+    return reported()
 
 class GenerationService:
     def __init__(self):
-        # Load Resources on init
-        # Note: In a real production app, we might want to lazy load or cache these better,
-        # but for now, we'll log the init.
-        pass
+        # Customer data is loaded lazily and cached with a TTL (see customers.py)
+        self.customer_cache = CustomerCache()
+
+    @property
+    def customers(self):
+        snapshot = self.customer_cache.peek()
+        return [c.to_dict() for c in snapshot.records] if snapshot else []
+
+    @customers.setter
+    def customers(self, records):
+        # Injected data (tests, scripts) is pinned and never refreshed
+        self.customer_cache.set_static(records)
 
     def _get_logger(self):
         # specific helper to access current_app logger safely
@@ -28,132 +181,169 @@ class GenerationService:
             return logging.getLogger(__name__)
 
     def _load_customers(self):
-        if hasattr(self, 'customers') and self.customers:
-            return
-
-        # 1. Try Google Sheet
-        sheet_data = self._load_from_sheet()
-        if sheet_data:
-            self._get_logger().info("Loaded addresses from Google Sheet.")
-            self.customers = sheet_data
-            return
-
-        # 2. Fallback to Local JSON
-        try:
-            with open(Config.CUSTOMERS_FILE, 'r', encoding='utf-8') as f:
-                self.customers = json.load(f)
-                self._get_logger().info("Loaded addresses from local JSON.")
-        except Exception as e:
-            self._get_logger().error(f"Error loading customers from JSON: {e}")
-            self.customers = []
+        """
+        Current customer snapshot. Stale data is served while the cache
+        refreshes in the background; only a cold start blocks. Within a
+        request the first one is kept, so the result key and the file it
+        names come from the same data (and the phase is timed once).
+        """
+        if has_request_context() and 'customers' in g:
+            return g.customers
+        with phase("customers"):
+            snapshot = self.customer_cache.get()
+        if has_request_context():
+            g.customers = snapshot
+        return snapshot
 
     def _load_template_headers(self):
         # Deprecated: Headers are now strictly enforced by code
         pass
 
-    def _load_from_sheet(self):
-        url = Config.ADDRESSES_SHEET_URL
-        if not url:
-            return None
-        
-        try:
-            # Add timeout for production standards
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            # Parse CSV
-            # Data structure: Col A=Address, Col B=Country, Col C=City
-            decoded_content = response.content.decode('utf-8')
-            cr = csv.reader(decoded_content.splitlines(), delimiter=',')
-            
-            customers = []
-            rows = list(cr)
-            if not rows: return None
-            
-            for row in rows:
-                if len(row) < 3: continue
-                # Basic normalization
-                addr = row[0].strip()
-                country = row[1].strip()
-                city = row[2].strip()
-                
-                # Simple heuristc to skip header
-                if "direccion" in addr.lower() and "pais" in country.lower():
-                    continue
-
-                # Senior QA: Ensure critical data isn't empty
-                if not addr or not country:
-                     continue
-
-                customers.append({
-                    "address": addr,
-                    "country": country,
-                    "city": city,
-                    "lat": "", # Sheet doesn't have it
-                    "long": "",
-                    "name": "Cliente Sheet", # Generic name
-                    "id": f"S-{random.randint(1000,9999)}"
-                })
-            return customers
+    def generate_excel(self, params: dict):
+        job, filename = self._build_orders(params)
+        backend = get_backend()
+        sheet = self._order_sheet(job, backend, self._resolve_workers(params))
+        output = self._render_workbook(backend, [("Ordenes Generadas", sheet)])
+        registry.add_output("orders", job.row_count, output.size)
+        return output, filename
 
-        except Exception as e:
-            self._get_logger().error(f"Error fetching/parsing Google Sheet: {e}")
-            return None
+    def stream_excel(self, params: dict):
+        """
+        Streaming variant of generate_excel: returns a generator of .xlsx bytes
+        chunks. Validation and customer loading happen before the first chunk,
+        so ValueErrors still surface before the response starts.
+        """
+        chunks, filename, _ = self.render_orders(params)
+        return chunks, filename
 
-    def _get_localized_name(self, country_input):
-        # Database of names
-        LOCALE_DATA = {
-            "LATAM": {
-                "names": ["Juan", "Maria", "Carlos", "Ana", "Jose", "Luis", "Sofia", "Camila", "Pedro", "Diego"],
-                "surnames": ["Gonzalez", "Rodriguez", "Perez", "Fernandez", "Lopez", "Diaz", "Martinez", "Silva", "Rojas", "Soto"]
-            },
-            "US": {
-                "names": ["John", "Mary", "Michael", "Jennifer", "James", "Linda", "Robert", "Patricia", "David", "Elizabeth"],
-                "surnames": ["Smith", "Johnson", "Williams", "Jones", "Brown", "Davis", "Miller", "Wilson", "Moore", "Taylor"]
-            }
-        }
-        
-        # Determine Region
-        c = country_input.lower()
-        if any(x in c for x in ["chile", "argentina", "colombia", "mexico", "peru", "bolivia", "uruguay", "ecuador", "venezuela", "paraguay"]):
-            region = "LATAM"
-        else:
-            region = "US" # Default/Global
-            
-        data = LOCALE_DATA[region]
-        return f"{random.choice(data['names'])} {random.choice(data['surnames'])}"
+    def stream_delimited(self, params: dict, fmt, bom=False):
+        """
+        Orders as CSV/TSV (`fmt` from delimited.get_format). No workbook:
+        rows are written straight into the returned generator of bytes.
+        """
+        chunks, filename, _ = self.render_orders(params, fmt, bom)
+        return chunks, filename
 
-    def generate_excel(self, params: dict):
-        # ... (Previous Resource Loading)
-        self._load_customers()
-        
-        # HEADERS (Strict)
-        HEADERS = [
-            "N° DOCUMENTO", "LATITUD", "LONGITUD", "DIRECCION", "NOMBRE ITEM", "CANTIDAD", "CODIGO ITEM",
-            "FECHA MIN ENTREGA", "FECHA MAX ENTREGA", "MIN VENTANA HORARIA 1", "MAX VENTANA HORARIA 1",
-            "MIN VENTANA HORARIA 2", "MAX VENTANA HORARIA 2", "COSTO ITEM", "CAPACIDAD UNO", "CAPACIDAD DOS",
-            "SERVICE TIME", "IMPORTANCIA", "IDENTIFICADOR CONTACTO", "NOMBRE CONTACTO", "TELEFONO", "EMAIL CONTACTO",
-            "CT ORIGEN"
-        ]
-        
-        # APPEND DYNAMIC HEADERS
-        tags = params.get('tags', [])
-        tag_headers = [t['header'] for t in tags]
-        HEADERS.extend(tag_headers)
-        
-        # Finally append empty column for strictness if desired, or just end
-        HEADERS.append("")
+    def render_orders(self, params: dict, fmt=None, bom=False, progress=None):
+        """
+        (chunks, filename, mimetype) for an order request in any output
+        format: .xlsx when `fmt` is None, else CSV/TSV. `progress` is called
+        as progress(rows_done, rows_total) while the chunks are consumed.
+        """
+        job, filename = self._build_orders(params)
+        chunks = self._order_chunks(job, fmt, bom, self._resolve_workers(params), progress)
+        if fmt is not None:
+            return chunks, _with_extension(filename, fmt.extension), fmt.mimetype
+        return chunks, filename, XLSX_MIMETYPE
 
-        # Destructure params (Keep existing logic)
+    def _order_chunks(self, job, fmt=None, bom=False, workers=1, progress=None):
+        total = job.row_count
+        if fmt is not None:
+            if self._offloaded(job):
+                return timed_chunks(sharded_delimited(job, fmt, bom, workers, progress), "orders", total)
+            rows = itertools.chain([job.plan.headers], _tracked(job.rows(), progress, total))
+            return timed_chunks(iter_delimited(rows, fmt.delimiter, bom), "orders", total)
+        backend = self._streaming_backend()
+        sheet = self._order_sheet(job, backend, workers, progress)
+        return timed_chunks(backend.iter_bytes([("Ordenes Generadas", sheet)]), "orders", total)
+
+    def result_key(self, kind, params, fmt=None, bom=False):
+        """
+        Content address of the file a request produces, or None when it is
+        not reproducible (no seed). Covers everything the bytes depend on:
+        payload, output format, writer, customer snapshot and delivery date.
+        """
+        seed = params.get('seed') if isinstance(params, dict) else None
+        if seed is None or seed == "":
+            return None
+        parts = {
+            "kind": kind,
+            "payload": {k: v for k, v in params.items() if k not in _TRANSPORT_KEYS},
+            "format": fmt.extension if fmt is not None else self._streaming_backend().name,
+            "bom": bool(bom) and fmt is not None,
+            "layout": STREAM_LAYOUT,
+        }
+        if kind == 'orders':
+            parts["customers"] = self._load_customers().version
+            parts["date"] = params.get('fecha_entrega', datetime.now().strftime('%Y-%m-%d'))
+        canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _render_workbook(self, backend, sheets):
+        # WORKBOOK GENERATION (backend picked by Config.XLSX_BACKEND)
+        # Into memory, or a temp file once it is big (see spool.py)
+        output = SpooledOutput(suffix=".xlsx")
         try:
-            count = int(params.get('cantidad_ordenes', 40))
-        except (ValueError, TypeError):
-            count = 40
+            with phase("write"):
+                backend.write(output, sheets)
+            output.flush()
+        except BaseException:
+            output.close()
+            raise
+        output.seek(0)
+        return output
+
+    def _streaming_backend(self):
+        backend = get_backend()
+        if not backend.streaming:
+            # The reference backend can only save a finished workbook
+            backend = get_backend("native")
+        return backend
+
+    def _resolve_workers(self, params):
         try:
-            items_per_order = int(params.get('items_por_orden') or 1)
+            workers = int(params.get('workers') or Config.GENERATION_WORKERS)
         except (ValueError, TypeError):
-            items_per_order = 1
-        if items_per_order < 1: items_per_order = 1
+            workers = Config.GENERATION_WORKERS
+        return max(1, min(workers, Config.GENERATION_MAX_WORKERS))
+
+    def _offloaded(self, job):
+        """True when `job` is big enough to render in the process pool."""
+        return Config.OFFLOAD_GENERATION and job.row_count >= Config.OFFLOAD_MIN_ROWS
+
+    def _order_sheet(self, job, backend, workers, progress=None):
+        """
+        Sheet body for an OrderJob: plain rows, or pre-encoded fragments from
+        the process pool for large requests. Both give identical bytes.
+        """
+        sharded = workers > 1 and job.n_chunks > 1 and job.count >= Config.SHARD_MIN_ORDERS
+        if backend.shardable and (sharded or self._offloaded(job)):
+            return EncodedSheet(sharded_order_fragments(job, job.plan.headers, workers, progress))
+        total = job.row_count
+        return itertools.chain([job.plan.headers], _tracked(job.rows(), progress, total))
+
+    def estimate_cost(self, kind, params):
+        """
+        Cells (rows x columns) a request writes, from its params alone: no
+        customers are loaded and nothing is generated (see admission.py).
+        """
+        if not isinstance(params, dict):
+            params = {}
+        if kind == 'orders':
+            count, items_per_order = _order_size(params)
+            return max(count, 0) * items_per_order * (ORDER_COLUMNS + _tag_count(params))
+        if kind == 'vehicles':
+            # Same resolved ranges the FleetJob is built from
+            count = sum(len(plates) for _, plates in _fleet_groups(params.get('groups') or []))
+            return count * (FLEET_COLUMNS + _tag_count(params))
+        raise ValueError(f"Unknown request type: {kind}")
+
+    def estimate_batch_cost(self, kind, param_sets):
+        """
+        Cells a batch holds at once. Only a window of its files is rendered
+        at a time (see render_batch), so it costs its largest ones, not all.
+        """
+        costs = sorted((self.estimate_cost(kind, params) for params in param_sets), reverse=True)
+        return sum(costs[:_batch_window()])
+
+    def _build_orders(self, params: dict):
+        """
+        Resolves params and customers, returns (OrderJob, filename).
+        """
+        snapshot = self._load_customers()
+        
+        # Destructure params (Keep existing logic)
+        count, items_per_order = _order_size(params)
         try:
             cap_min = float(params.get('capacidad_min', 1))
             cap_max = float(params.get('capacidad_max', 10))
@@ -181,110 +371,226 @@ class GenerationService:
         except:
             formatted_date = delivery_date
 
-        # Filter customers (Keep existing logic)
-        filtered_customers = []
-        target_country = country_filter.lower().strip()
-        target_city = city_filter.lower().strip()
-        for c in self.customers:
-            c_country = c.get('country', '').lower().strip()
-            c_city = c.get('city', '').lower().strip()
-            if target_country and target_country not in c_country and "otro" not in target_country: continue
-            if target_city and "otro" not in target_city:
-                if target_city not in c_city: continue
-            filtered_customers.append(c)
-        if not filtered_customers: filtered_customers = self.customers
-        if not filtered_customers: raise ValueError("No customer data available.")
-        random.shuffle(filtered_customers)
-        customer_iterator = itertools.cycle(filtered_customers)
-
-        # WEBWORKBOOK GENERATION
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Ordenes Generadas"
-        
-        ws.append(HEADERS)
-
-        global_item_counter = 1
-
-        for i in range(count):
-            customer = next(customer_iterator)
-            contact_name = self._get_localized_name(customer.get('country', country_filter))
-            order_id = f"ORD-{str(i+1).zfill(6)}"
-            cap_val = random.uniform(cap_min, cap_max)
-            cap_str = f"{cap_val:.4f}"
-            cap2_str = ""
-            if cap2_min is not None and cap2_max is not None:
-                c2_val = random.uniform(float(cap2_min), float(cap2_max))
-                cap2_str = f"{c2_val:.4f}"
-
-            for j in range(items_per_order):
-                row_map = {}
-                row_map["N° DOCUMENTO"] = order_id
-                row_map["LATITUD"] = str(customer.get('lat', ''))
-                row_map["LONGITUD"] = str(customer.get('long', ''))
-                row_map["DIRECCION"] = customer.get('address', '')
-                row_map["NOMBRE ITEM"] = f"Item {global_item_counter}"
-                row_map["CANTIDAD"] = "1"
-                row_map["CODIGO ITEM"] = f"SKU-{global_item_counter}"
-                row_map["COSTO ITEM"] = "1500"
-                global_item_counter += 1
-                row_map["FECHA MIN ENTREGA"] = formatted_date
-                row_map["FECHA MAX ENTREGA"] = formatted_date
-                row_map["MIN VENTANA HORARIA 1"] = win1_start
-                row_map["MAX VENTANA HORARIA 1"] = win1_end
-                row_map["MIN VENTANA HORARIA 2"] = win2_start if win2_start else ""
-                row_map["MAX VENTANA HORARIA 2"] = win2_end if win2_end else ""
-                row_map["CAPACIDAD UNO"] = cap_str
-                row_map["CAPACIDAD DOS"] = cap2_str
-                row_map["SERVICE TIME"] = str(service_time) if service_time else "5"
-                row_map["IMPORTANCIA"] = "1"
-                row_map["IDENTIFICADOR CONTACTO"] = customer.get('id', '')
-                row_map["NOMBRE CONTACTO"] = contact_name
-                row_map["TELEFONO"] = f"569{random.randint(11111111,99999999)}"
-                row_map["EMAIL CONTACTO"] = f"contacto{i}@example.com"
-                row_map["CT ORIGEN"] = ct_origin
-                row_map["CT ORIGEN"] = ct_origin
-                
-                # DYNAMIC TAG VALUES
-                for t in tags:
-                    header = t['header']
-                    values = t['values']
-                    if values:
-                        row_map[header] = random.choice(values)
-                    else:
-                        row_map[header] = ""
-
-                row_map[""] = "" 
-
-                row_values = [row_map.get(h, "") for h in HEADERS]
-                ws.append(row_values)
-
-        # FORCE TEXT FORMAT
-        for row in ws.iter_rows():
-            for cell in row:
-                cell.number_format = '@'
-
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        return output, f"ordenes_{count}.xlsx"
+        # Filter customers (served from the snapshot's country/city index)
+        if not snapshot.records: raise ValueError("No customer data available.")
+        with phase("filter"):
+            customer_ids = snapshot.select_ids(country_filter, city_filter)
+        # SEED: same seed -> same file, however the work is split
+        seed = params.get('seed')
+        if seed is None or seed == "":
+            seed = new_seed()
+
+        # Customer order for this request: a seeded walk over the immutable
+        # snapshot, nothing shared is copied or shuffled
+        customer_order = CustomerWalk(snapshot.records, customer_ids, stream_rng(seed, "customers"))
+
+        settings = _OrderSettings(
+            items_per_order, cap_min, cap_max,
+            float(cap2_min) if cap2_min is not None else None,
+            float(cap2_max) if cap2_max is not None else None,
+            country_filter,
+        )
+
+        # COLUMN PLAN (Strict header order)
+        plan = ColumnPlan()
+        plan.per_group("N° DOCUMENTO", "order_id")
+        plan.per_group("LATITUD", "lat")
+        plan.per_group("LONGITUD", "long")
+        plan.per_group("DIRECCION", "address")
+        plan.per_row("NOMBRE ITEM", "item_name")
+        plan.constant("CANTIDAD", "1")
+        plan.per_row("CODIGO ITEM", "sku")
+        plan.constant("FECHA MIN ENTREGA", formatted_date)
+        plan.constant("FECHA MAX ENTREGA", formatted_date)
+        plan.constant("MIN VENTANA HORARIA 1", win1_start)
+        plan.constant("MAX VENTANA HORARIA 1", win1_end)
+        plan.constant("MIN VENTANA HORARIA 2", win2_start if win2_start else "")
+        plan.constant("MAX VENTANA HORARIA 2", win2_end if win2_end else "")
+        plan.constant("COSTO ITEM", "1500")
+        plan.per_group("CAPACIDAD UNO", "cap1")
+        plan.per_group("CAPACIDAD DOS", "cap2")
+        plan.constant("SERVICE TIME", str(service_time) if service_time else "5")
+        plan.constant("IMPORTANCIA", "1")
+        plan.per_group("IDENTIFICADOR CONTACTO", "customer_id")
+        plan.per_group("NOMBRE CONTACTO", "contact")
+        plan.per_row("TELEFONO", "phone")
+        plan.per_group("EMAIL CONTACTO", "email")
+        plan.constant("CT ORIGEN", ct_origin)
+        # DYNAMIC TAG COLUMNS
+        plan.tags(params.get('tags', []))
+        # Finally append empty column for strictness
+        plan.constant("", "")
+
+        # All random columns are drawn in bulk per chunk (see sampling.py)
+        job = OrderJob(plan, settings, seed, customer_order, count)
+        return job, f"ordenes_{count}.xlsx"
 
     def generate_vehicles_excel(self, vehicle_groups):
         """
         Generates a fleet Excel file (.xlsx) with Text Format.
         """
-        HEADERS = [
-            "PLACA", "ORIGEN", "DESTINO", "CAPACIDAD UNO", "CAPACIDAD DOS", 
-            "HORA INICIO JORNADA", "HORA FIN JORNADA", "INICIO HORA DESCANSO", 
-            "FIN HORA DESCANSO", "COSTO POR SALIDA", "COSTO POR KILOMETRO", 
-            "COSTO POR HORA", "COSTO FIJO", "MAXIMA CANTIDAD DE ENTREGAS POR RECORRIDO", 
-            "MAXIMO TIEMPO DE MANEJO [HORAS]", "MAXIMA CANTIDAD DE RECORRIDOS", 
-            "DISTANCIA MAXIMA POR RECORRIDO [KILOMETROS]", "VELOCIDAD VEHICULO", 
-            "PERIODO DE RECARGA [HORAS]", "MAXIMO DE DINERO", "NO CONSIDERAR RETORNO AL CD",
-            "PERIODO DE RECARGA [HORAS]", "MAXIMO DE DINERO", "NO CONSIDERAR RETORNO AL CD"
+        job, filename = self._build_vehicles(vehicle_groups)
+        backend = get_backend()
+        output = self._render_workbook(backend, [("Flota Generada", self._fleet_sheet(job, backend))])
+        registry.add_output("vehicles", job.count, output.size)
+        return output, filename
+
+    def stream_vehicles_excel(self, vehicle_groups):
+        """
+        Streaming variant of generate_vehicles_excel (see stream_excel).
+        """
+        chunks, filename, _ = self.render_vehicles(vehicle_groups)
+        return chunks, filename
+
+    def stream_vehicles_delimited(self, vehicle_groups, fmt, bom=False):
+        """
+        Fleet as CSV/TSV (see stream_delimited).
+        """
+        chunks, filename, _ = self.render_vehicles(vehicle_groups, fmt, bom)
+        return chunks, filename
+
+    def render_vehicles(self, vehicle_groups, fmt=None, bom=False, progress=None):
+        """
+        (chunks, filename, mimetype) for a fleet request (see render_orders).
+        """
+        job, filename = self._build_vehicles(vehicle_groups)
+        chunks = self._fleet_chunks(job, fmt, bom, progress)
+        if fmt is not None:
+            return chunks, _with_extension(filename, fmt.extension), fmt.mimetype
+        return chunks, filename, XLSX_MIMETYPE
+
+    def _fleet_sheet(self, job, backend, progress=None):
+        """
+        Sheet body for a FleetJob: rendered in the pool when it is large
+        (see _order_sheet), else plain rows.
+        """
+        if backend.shardable and self._offloaded(job):
+            future = submit(render_job_rows, job.portable())
+            fragments = _pending_fragments(encode_rows([job.plan.headers], 1), future)
+            return EncodedSheet(_finished(fragments, progress, job.count))
+        return itertools.chain([job.plan.headers], _tracked(job.rows(), progress, job.count))
+
+    def _fleet_chunks(self, job, fmt=None, bom=False, progress=None):
+        if fmt is not None:
+            if self._offloaded(job):
+                future = submit(render_job_file, job.portable(), None, fmt, bom)
+                chunks = _finished(_pending_fragments(future), progress, job.count)
+            else:
+                rows = itertools.chain([job.plan.headers], _tracked(job.rows(), progress, job.count))
+                chunks = iter_delimited(rows, fmt.delimiter, bom)
+            return timed_chunks(chunks, "vehicles", job.count)
+        backend = self._streaming_backend()
+        chunks = backend.iter_bytes([("Flota Generada", self._fleet_sheet(job, backend, progress))])
+        return timed_chunks(chunks, "vehicles", job.count)
+
+    def render_scenario(self, orders_params, vehicle_groups, bundle="zip", fmt=None, bom=False):
+        """
+        Orders and fleet from one request: a single workbook with both sheets
+        (bundle="workbook") or a zip with both files plus manifest.json.
+        Returns (chunks, filename, mimetype).
+
+        Large fleets are rendered in the process pool while the orders
+        stream, so the total time tracks the slower of the two.
+        """
+        if bundle not in ("zip", "workbook"):
+            raise ValueError(f"Unknown bundle: {bundle}")
+        if bundle == "workbook" and fmt is not None:
+            raise ValueError("CSV/TSV scenarios need bundle=zip")
+        order_job, order_file = self._build_orders(orders_params)
+        fleet_job, fleet_file = self._build_vehicles(vehicle_groups)
+        workers = self._resolve_workers(orders_params)
+        offload = fleet_job.count >= Config.SCENARIO_OFFLOAD_MIN_ROWS
+        name = f"escenario_{order_job.count}"
+
+        if bundle == "workbook":
+            backend = self._streaming_backend()
+            if offload and backend.shardable:
+                fleet_sheet = EncodedSheet(_pending_fragments(
+                    encode_rows([fleet_job.plan.headers], 1), submit(render_job_rows, fleet_job)))
+            else:
+                fleet_sheet = itertools.chain([fleet_job.plan.headers], fleet_job.rows())
+            sheets = [
+                ("Ordenes Generadas", self._order_sheet(order_job, backend, workers)),
+                ("Flota Generada", fleet_sheet),
+            ]
+            rows = order_job.row_count + fleet_job.row_count
+            return timed_chunks(backend.iter_bytes(sheets), "scenario", rows), name + ".xlsx", XLSX_MIMETYPE
+
+        extension = fmt.extension if fmt is not None else "xlsx"
+        if offload:
+            future = submit(render_job_file, fleet_job, "Flota Generada", fmt, bom)
+            fleet_chunks = timed_chunks(_pending_fragments(future), "vehicles", fleet_job.count)
+        else:
+            fleet_chunks = self._fleet_chunks(fleet_job, fmt, bom)
+        files = [
+            ("orders", _with_extension(order_file, extension), order_job,
+             Measured(self._order_chunks(order_job, fmt, bom, workers))),
+            ("vehicles", _with_extension(fleet_file, extension), fleet_job, Measured(fleet_chunks)),
         ]
-        
-        # APPEND DYNAMIC HEADERS (VEHICLES)
+
+        def entries():
+            for _, filename, _, chunks in files:
+                yield filename, chunks
+            manifest = {"format": extension}
+            for kind, filename, job, chunks in files:
+                manifest[kind] = {
+                    "file": filename,
+                    "seed": job.seed,
+                    "rows": job.row_count,
+                    "bytes": chunks.size,
+                    "sha256": chunks.sha256,
+                }
+            yield "manifest.json", [json.dumps(manifest, indent=2, default=str).encode('utf-8')]
+
+        return iter_zip(entries()), name + ".zip", BUNDLE_MIMETYPE
+
+    def render_batch(self, kind, param_sets, fmt=None, bom=False):
+        """
+        One file per parameter set, rendered in the process pool and added
+        to a streamed zip as each one finishes (manifest.json last). Only
+        the files in flight are held in memory.
+        """
+        if kind == 'orders':
+            build, title = self._build_orders, "Ordenes Generadas"
+        elif kind == 'vehicles':
+            build, title = self._build_vehicles, "Flota Generada"
+        else:
+            raise ValueError(f"Unknown batch type: {kind}")
+        extension = fmt.extension if fmt is not None else "xlsx"
+
+        # Every set is validated before the first byte goes out
+        jobs = []
+        for index, params in enumerate(param_sets, 1):
+            job, filename = build(params)
+            jobs.append((_batch_filename(index, params, filename, extension), job, params))
+
+        def entries():
+            manifest = []
+            tasks = ((job.portable(), title, fmt, bom) for _, job, _ in jobs)
+            for index, data in map_unordered(render_job_file, tasks, _batch_window()):
+                name, job, params = jobs[index]
+                registry.add_output(kind, job.row_count, len(data))
+                manifest.append({
+                    "index": index + 1,
+                    "file": name,
+                    "params": params,
+                    "seed": job.seed,
+                    "rows": job.row_count,
+                    "bytes": len(data),
+                    "sha256": hashlib.sha256(data).hexdigest(),
+                })
+                yield name, [data]
+            manifest.sort(key=lambda entry: entry["index"])
+            yield "manifest.json", [json.dumps({"type": kind, "format": extension, "files": manifest},
+                                               indent=2, default=str).encode('utf-8')]
+
+        return iter_zip(entries()), f"lote_{kind}_{len(jobs)}.zip", BUNDLE_MIMETYPE
+
+    def _build_vehicles(self, vehicle_groups):
+        """
+        Resolves a fleet request, returns (FleetJob, filename).
+        """
+        # DYNAMIC TAGS (VEHICLES)
         # Note: input is a list of groups. Should we take tags from the first group? 
         # Or should tags be a top-level param? 
         # The frontend usually sends structure: { groups: [...] }. 
@@ -297,89 +603,47 @@ class GenerationService:
         
         vehicle_tags = []
         groups_list = []
+        seed = None
         
         if isinstance(vehicle_groups, dict):
              groups_list = vehicle_groups.get('groups', [])
              vehicle_tags = vehicle_groups.get('tags', [])
+             seed = vehicle_groups.get('seed')
         else:
              groups_list = vehicle_groups
+        if seed is None or seed == "":
+            seed = new_seed()
              
-        tag_headers = [t['header'] for t in vehicle_tags]
-        HEADERS.extend(tag_headers)
-        HEADERS.append("")
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Flota Generada"
-        ws.append(HEADERS)
-        
-        prefix_map = { "Moto": "MOTO", "Auto": "AUTO", "Camion": "CAMI", "Bici": "BICI", "Otro": "OTRO" }
-        counters = {k: 0 for k in prefix_map.values()}
-        
-        for group in groups_list:
-            v_type = group.get('type', 'Otro')
-            count = int(group.get('count', 0))
-            cap1 = group.get('capacity1', '')
-            cap2 = group.get('capacity2', '')
-            origin = group.get('origin', '')
-            start_time = group.get('start_time', '')
-            end_time = group.get('end_time', '')
-            
-            prefix = prefix_map.get(v_type, "OTRO")
-            if v_type not in prefix_map: 
-                prefix = v_type[:4].upper()
-                if prefix not in counters: counters[prefix] = 0
-
-            for _ in range(count):
-                counters[prefix] += 1
-                sequence = counters[prefix]
-                plate = f"{prefix}{str(sequence).zfill(2)}"
-                
-                row_map = {
-                    "PLACA": plate,
-                    "ORIGEN": origin,
-                    "DESTINO": "",
-                    "CAPACIDAD UNO": str(cap1) if cap1 else "",
-                    "CAPACIDAD DOS": str(cap2) if cap2 else "",
-                    "HORA INICIO JORNADA": start_time,
-                    "HORA FIN JORNADA": end_time,
-                    "INICIO HORA DESCANSO": "",
-                    "FIN HORA DESCANSO": "",
-                    "COSTO POR SALIDA": "1000",
-                    "COSTO POR KILOMETRO": "333",
-                    "COSTO POR HORA": "11",
-                    "COSTO FIJO": "666",
-                    "MAXIMA CANTIDAD DE ENTREGAS POR RECORRIDO": "111",
-                    "MAXIMO TIEMPO DE MANEJO [HORAS]": "20",
-                    "MAXIMA CANTIDAD DE RECORRIDOS": "4",
-                    "DISTANCIA MAXIMA POR RECORRIDO [KILOMETROS]": "500",
-                    "VELOCIDAD VEHICULO": "Normal",
-                    "PERIODO DE RECARGA [HORAS]": "0.25",
-                    "MAXIMO DE DINERO": "5500000",
-                    "NO CONSIDERAR RETORNO AL CD": "1",
-                    "NO CONSIDERAR RETORNO AL CD": "1"
-                }
-                
-                # DYNAMIC TAG VALUES (VEHICLES)
-                for t in vehicle_tags:
-                    header = t['header']
-                    values = t['values']
-                    if values:
-                        row_map[header] = random.choice(values)
-                    else:
-                        row_map[header] = ""
-                        
-                row_map[""] = ""
-                row_values = [row_map.get(h, "") for h in HEADERS]
-                ws.append(row_values)
-
-        # FORCE TEXT FORMAT
-        for row in ws.iter_rows():
-            for cell in row:
-                cell.number_format = '@'
-
-
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        return output, "flota_vehiculos.xlsx"
+        # Resolve groups up front so bad input fails before any row is written
+        resolved = _fleet_groups(groups_list)
+
+        # COLUMN PLAN (Strict header order, some headers repeat on purpose)
+        plan = ColumnPlan()
+        plan.per_row("PLACA", "plate")
+        plan.per_group("ORIGEN", "origin")
+        plan.constant("DESTINO", "")
+        plan.per_group("CAPACIDAD UNO", "cap1")
+        plan.per_group("CAPACIDAD DOS", "cap2")
+        plan.per_group("HORA INICIO JORNADA", "start_time")
+        plan.per_group("HORA FIN JORNADA", "end_time")
+        plan.constant("INICIO HORA DESCANSO", "")
+        plan.constant("FIN HORA DESCANSO", "")
+        plan.constant("COSTO POR SALIDA", "1000")
+        plan.constant("COSTO POR KILOMETRO", "333")
+        plan.constant("COSTO POR HORA", "11")
+        plan.constant("COSTO FIJO", "666")
+        plan.constant("MAXIMA CANTIDAD DE ENTREGAS POR RECORRIDO", "111")
+        plan.constant("MAXIMO TIEMPO DE MANEJO [HORAS]", "20")
+        plan.constant("MAXIMA CANTIDAD DE RECORRIDOS", "4")
+        plan.constant("DISTANCIA MAXIMA POR RECORRIDO [KILOMETROS]", "500")
+        plan.constant("VELOCIDAD VEHICULO", "Normal")
+        for _ in range(2):
+            plan.constant("PERIODO DE RECARGA [HORAS]", "0.25")
+            plan.constant("MAXIMO DE DINERO", "5500000")
+            plan.constant("NO CONSIDERAR RETORNO AL CD", "1")
+        # DYNAMIC TAG COLUMNS (VEHICLES)
+        plan.tags(vehicle_tags)
+        plan.constant("", "")
+
+        return FleetJob(plan, seed, resolved), "flota_vehiculos.xlsx"
+
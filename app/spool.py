@@ -0,0 +1,81 @@
+import io
+import os
+import tempfile
+import weakref
+
+from .config import Config
+
+# Buffered (not streamed) output files. Small ones stay in memory; past
+# OUTPUT_SPOOL_BYTES the bytes move to a named temp file, so a big workbook
+# is not held in RAM a second time next to the writer that produced it, and
+# the route can hand send_file a real path (sendfile(2) under gunicorn).
+# close() deletes the file; so does garbage collection if close is missed.
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class SpooledOutput:
+    """
+    Seekable binary file: io.BytesIO until more than `threshold` bytes are
+    written, then a temp file in `directory` (`path` is set from then on).
+    Everything else (read, seek, tell, flush...) goes to the current file.
+    """
+    def __init__(self, threshold=None, directory=None, suffix=""):
+        self.threshold = Config.OUTPUT_SPOOL_BYTES if threshold is None else threshold
+        self.directory = directory or Config.OUTPUT_SPOOL_DIR
+        self.suffix = suffix
+        self.path = None
+        self._file = io.BytesIO()
+        self._cleanup = None
+
+    def __getattr__(self, name):
+        if name == "_file":
+            raise AttributeError(name)
+        return getattr(self._file, name)
+
+    def write(self, data):
+        written = self._file.write(data)
+        if self.path is None and self._file.tell() > self.threshold:
+            self._rollover()
+        return written
+
+    def _rollover(self):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix="plannerpro-", suffix=self.suffix, dir=self.directory)
+        file = os.fdopen(fd, "w+b")
+        position = self._file.tell()
+        file.write(self._file.getbuffer())
+        file.seek(position)
+        self._file, self.path = file, path
+        self._cleanup = weakref.finalize(self, _remove, path)
+
+    @property
+    def size(self):
+        position = self._file.tell()
+        end = self._file.seek(0, io.SEEK_END)
+        self._file.seek(position)
+        return end
+
+    def getvalue(self):
+        """All bytes written, whatever the position (like BytesIO.getvalue)."""
+        if self.path is None:
+            return self._file.getvalue()
+        self._file.flush()
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def close(self):
+        self._file.close()
+        if self._cleanup is not None:
+            self._cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
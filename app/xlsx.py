@@ -0,0 +1,366 @@
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+# Workbook writer backends.
+#
+# - "native": minimal SpreadsheetML writer that serializes rows incrementally
+#   into a zip stream. Every cell gets the single shared TEXT (@) style, which
+#   is all PlannerPro needs. No per-cell objects are kept around.
+# - "native-sst": same, plus a shared string table kept in memory and
+#   written last (smaller files).
+# - "openpyxl": the reference implementation, a regular (not write-only)
+#   openpyxl Workbook held in memory until it is saved.
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Style index 1 in styles.xml below is numFmtId 49 ("@" / Text)
+TEXT_STYLE = 1
+
+# Rows encoded per write into the zip stream
+ROWS_PER_WRITE = 500
+# Bytes accumulated in the sink before a chunk is handed to the caller
+CHUNK_SIZE = 64 * 1024
+
+# Fixed entry timestamp so the same rows always give the same bytes
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+_ILLEGAL_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+)
+_CONTENT_TYPES_SST = (
+    '<Override PartName="/xl/sharedStrings.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+)
+_CONTENT_TYPES_SHEET = (
+    '<Override PartName="/xl/worksheets/sheet%d.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/><family val="2"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="49" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def column_letter(idx):
+    """0-based column index -> Excel column letters (0 -> A, 26 -> AA)."""
+    letters = ""
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _text(value):
+    value = _ILLEGAL_CHARS.sub('', value)
+    if value[:1].isspace() or value[-1:].isspace():
+        return '<t xml:space="preserve">%s</t>' % escape(value)
+    return '<t>%s</t>' % escape(value)
+
+
+def _row_xml(r, row, letters, shared=None):
+    """
+    One <row> element. With `shared` (a str -> index dict) cells reference the
+    shared strings table instead of carrying inline strings.
+    """
+    cells = []
+    for col, value in enumerate(row):
+        if col >= len(letters):
+            letters.append(column_letter(col))
+        if value is None or value == "":
+            # Same as openpyxl: styled but valueless cell
+            cells.append('<c r="%s%d" s="%d"/>' % (letters[col], r, TEXT_STYLE))
+            continue
+        value = str(value)
+        if shared is None:
+            cells.append('<c r="%s%d" s="%d" t="inlineStr"><is>%s</is></c>'
+                         % (letters[col], r, TEXT_STYLE, _text(value)))
+        else:
+            idx = shared.get(value)
+            if idx is None:
+                idx = shared[value] = len(shared)
+            cells.append('<c r="%s%d" s="%d" t="s"><v>%d</v></c>'
+                         % (letters[col], r, TEXT_STYLE, idx))
+    return '<row r="%d">%s</row>' % (r, ''.join(cells))
+
+
+def _shared_strings_xml(shared):
+    # dicts keep insertion order, which is the index order
+    yield ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+           '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+           'count="%d" uniqueCount="%d">' % (len(shared), len(shared)))
+    for value in shared:
+        yield '<si>%s</si>' % _text(value)
+    yield '</sst>'
+
+
+def _workbook_parts(titles, shared_strings=False):
+    sheets = ''.join(
+        '<sheet name="%s" sheetId="%d" r:id="rId%d"/>' % (escape(t, {'"': '&quot;'}), i, i)
+        for i, t in enumerate(titles, 1)
+    )
+    workbook = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets>%s</sheets></workbook>' % sheets
+    )
+    rels = ''.join(
+        '<Relationship Id="rId%d" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet%d.xml"/>' % (i, i)
+        for i in range(1, len(titles) + 1)
+    )
+    n = len(titles) + 1
+    rels += (
+        '<Relationship Id="rId%d" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>' % n
+    )
+    if shared_strings:
+        rels += (
+            '<Relationship Id="rId%d" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" '
+            'Target="sharedStrings.xml"/>' % (n + 1)
+        )
+    workbook_rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '%s</Relationships>' % rels
+    )
+    content_types = (
+        _CONTENT_TYPES_HEAD
+        + (_CONTENT_TYPES_SST if shared_strings else '')
+        + ''.join(_CONTENT_TYPES_SHEET % i for i in range(1, len(titles) + 1))
+        + '</Types>'
+    )
+    return content_types, workbook, workbook_rels
+
+
+def encode_rows(rows, first_row):
+    """
+    <row> XML (utf-8) for rows numbered from `first_row`. Used by shard
+    workers so the parent only has to copy bytes into the zip.
+    """
+    letters = []
+    return ''.join(
+        _row_xml(r, row, letters) for r, row in enumerate(rows, first_row)
+    ).encode('utf-8')
+
+
+class EncodedSheet:
+    """
+    Sheet body that is already encoded: an iterable of <row> XML byte
+    fragments, in order (see encode_rows). Only valid with inline strings.
+    """
+    def __init__(self, fragments):
+        self.fragments = fragments
+
+
+def _zinfo(name, compress_type=zipfile.ZIP_DEFLATED):
+    info = zipfile.ZipInfo(name, date_time=_ZIP_DATE_TIME)
+    info.compress_type = compress_type
+    return info
+
+
+class _ChunkSink:
+    """
+    Write-only, non-seekable file object for zipfile. Bytes pile up here
+    until the generator drains them to the client.
+    """
+    def __init__(self):
+        self._parts = []
+        self.size = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        self.size = 0
+        return data
+
+
+def _iter_row_batches(rows, shared):
+    # Rows are encoded in small batches before hitting the zip stream
+    letters = []
+    batch = []
+    for r, row in enumerate(rows, 1):
+        batch.append(_row_xml(r, row, letters, shared))
+        if len(batch) >= ROWS_PER_WRITE:
+            yield ''.join(batch).encode('utf-8')
+            batch = []
+    if batch:
+        yield ''.join(batch).encode('utf-8')
+
+
+def iter_xlsx(sheets, shared_strings=False):
+    """
+    Generator of .xlsx bytes chunks.
+
+    `sheets` is a list of (title, rows) where rows is any iterable of row
+    sequences (header included). Rows are consumed lazily, so memory stays
+    flat regardless of the row count. `shared_strings` trades that for a
+    smaller file: the string table is kept in memory and written last.
+    """
+    titles = [title for title, _ in sheets]
+    content_types, workbook, workbook_rels = _workbook_parts(titles, shared_strings)
+    shared = {} if shared_strings else None
+
+    sink = _ChunkSink()
+    zf = zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED)
+    zf.writestr(_zinfo('[Content_Types].xml'), content_types)
+    zf.writestr(_zinfo('_rels/.rels'), _ROOT_RELS)
+    zf.writestr(_zinfo('xl/workbook.xml'), workbook)
+    zf.writestr(_zinfo('xl/_rels/workbook.xml.rels'), workbook_rels)
+    zf.writestr(_zinfo('xl/styles.xml'), _STYLES)
+
+    for idx, (_, rows) in enumerate(sheets, 1):
+        if isinstance(rows, EncodedSheet) and shared is not None:
+            raise ValueError("Encoded sheets require inline strings")
+        with zf.open(_zinfo('xl/worksheets/sheet%d.xml' % idx), 'w', force_zip64=True) as part:
+            part.write(_SHEET_HEAD.encode('utf-8'))
+            if isinstance(rows, EncodedSheet):
+                fragments = rows.fragments
+            else:
+                fragments = _iter_row_batches(rows, shared)
+            for fragment in fragments:
+                part.write(fragment)
+                if sink.size >= CHUNK_SIZE:
+                    yield sink.drain()
+            part.write(_SHEET_TAIL.encode('utf-8'))
+        if sink.size:
+            yield sink.drain()
+
+    if shared is not None:
+        with zf.open(_zinfo('xl/sharedStrings.xml'), 'w', force_zip64=True) as part:
+            for piece in _shared_strings_xml(shared):
+                part.write(piece.encode('utf-8'))
+                if sink.size >= CHUNK_SIZE:
+                    yield sink.drain()
+
+    zf.close()
+    tail = sink.drain()
+    if tail:
+        yield tail
+
+
+class NativeBackend:
+    """
+    Streams SpreadsheetML parts straight into the zip (see iter_xlsx).
+    """
+    streaming = True
+
+    def __init__(self, shared_strings=False):
+        self.name = "native-sst" if shared_strings else "native"
+        self.shared_strings = shared_strings
+        # Shard workers pre-encode rows; shared string indices are global
+        self.shardable = not shared_strings
+
+    def iter_bytes(self, sheets):
+        return iter_xlsx(sheets, shared_strings=self.shared_strings)
+
+    def write(self, fileobj, sheets):
+        for chunk in self.iter_bytes(sheets):
+            fileobj.write(chunk)
+
+
+class OpenpyxlBackend:
+    """
+    Reference backend: full openpyxl Workbook.
+
+    Cells are created with the TEXT (@) style already attached, so there is
+    no second pass over every cell to set number_format.
+    """
+    name = "openpyxl"
+    streaming = False
+    shardable = False
+
+    def write(self, fileobj, sheets):
+        from openpyxl import Workbook
+        from openpyxl.cell import Cell
+        from openpyxl.styles.cell_style import StyleArray
+
+        # numFmtId 49 is the builtin "@" format, same as number_format = '@'
+        text_style = StyleArray()
+        text_style.numFmtId = 49
+
+        wb = Workbook()
+        wb.remove(wb.active)
+        for title, rows in sheets:
+            ws = wb.create_sheet(title)
+            for row_values in rows:
+                ws.append([Cell(ws, value=v, style_array=StyleArray(text_style)) for v in row_values])
+
+        wb.save(fileobj)
+
+    def iter_bytes(self, sheets):
+        # openpyxl can only save a finished workbook
+        output = io.BytesIO()
+        self.write(output, sheets)
+        yield output.getvalue()
+
+
+BACKENDS = {
+    "native": NativeBackend,
+    "native-sst": lambda: NativeBackend(shared_strings=True),
+    "openpyxl": OpenpyxlBackend,
+}
+
+
+def get_backend(name=None):
+    """
+    Returns a writer backend by name (defaults to Config.XLSX_BACKEND).
+    """
+    if name is None:
+        from .config import Config
+        name = Config.XLSX_BACKEND
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown XLSX backend: {name}")
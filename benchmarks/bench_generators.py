@@ -0,0 +1,242 @@
+"""
+Generator benchmark: generate_excel / generate_vehicles_excel over a grid.
+
+Every case runs in a fresh process, offline: the sheet URL is disabled and
+customers come from CUSTOMERS_FILE (or a synthetic file when it is missing).
+Generation stays in that process (no offload to the pool, no sharding), so
+its peak RSS (RUSAGE_SELF) is the memory of the work being measured.
+Results (wall time, rows/sec, peak RSS, output size) can be saved as a JSON
+baseline and later runs compared against it; the run fails when a case gets
+slower or bigger than the threshold allows.
+
+    python -m benchmarks.bench_generators --grid quick --save benchmarks/baseline.json
+    python -m benchmarks.bench_generators --grid quick --baseline benchmarks/baseline.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import traceback
+from queue import Empty
+
+# One dimension varies at a time around a base case; the full cross product
+# of 1M orders x 20 items x 20 tags is not something anyone waits for.
+GRIDS = {
+    "quick": {
+        "orders": [(10, 1, 0), (1000, 1, 0), (20000, 1, 0),
+                   (2000, 5, 0), (2000, 20, 0), (2000, 1, 5), (2000, 1, 20)],
+        "fleet": [(10, 0), (1000, 0), (20000, 0), (1000, 20)],
+    },
+    "full": {
+        "orders": [(10, 1, 0), (1000, 1, 0), (100000, 1, 0), (1000000, 1, 0),
+                   (50000, 5, 0), (50000, 20, 0), (50000, 1, 5), (50000, 1, 20)],
+        "fleet": [(10, 0), (1000, 0), (100000, 0), (100000, 20)],
+    },
+}
+
+# Fraction a case may get worse (rows/sec down, RSS up) before it fails
+DEFAULT_THRESHOLD = 0.20
+# Cases faster than this are mostly timer noise; their speed is not compared
+MIN_SECONDS = 0.05
+
+SEED = 20250115
+
+# A case that has not reported by then is killed and recorded as failed
+CASE_TIMEOUT_SECONDS = 1800
+
+
+def _tags(n):
+    return [{"header": f"TAG {t}", "values": [f"V{t}-{v}" for v in range(5)]} for t in range(n)]
+
+
+def synthetic_customers(path, n=2000):
+    """Deterministic customer file shaped like the sheet data."""
+    rng = random.Random(SEED)
+    cities = [("Chile", "Santiago"), ("Chile", "Valparaíso"), ("Argentina", "Mendoza"), ("Perú", "Lima")]
+    customers = []
+    for i in range(n):
+        country, city = cities[i % len(cities)]
+        customers.append({
+            "address": f"Calle {rng.randint(1, 9999)}, {city}",
+            "country": country,
+            "city": city,
+            "lat": f"{rng.uniform(-40, -10):.6f}",
+            "long": f"{rng.uniform(-75, -60):.6f}",
+            "name": f"Cliente {i}",
+            "id": f"B-{i:05d}",
+        })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(customers, f)
+
+
+def _run(case, customers_file, queue):
+    # Failures are reported too, so run_case never waits on a dead process
+    try:
+        queue.put(_measure(case, customers_file))
+    except Exception:
+        queue.put(dict(case, error=traceback.format_exc()))
+
+
+def _measure(case, customers_file):
+    # Offline: env must be set before app.config is imported
+    os.environ["ADDRESSES_SHEET_URL"] = ""
+    os.environ["CUSTOMERS_FILE"] = customers_file
+    os.environ["RESULT_CACHE_MAX_BYTES"] = "0"
+    # Pool children would do the work out of RUSAGE_SELF's sight
+    os.environ["OFFLOAD_GENERATION"] = "false"
+    os.environ["SHARD_MIN_ORDERS"] = str(case.get("orders", 0) + 1)
+    from app.services import GenerationService
+
+    service = GenerationService()
+    service._load_customers()
+
+    start = time.perf_counter()
+    if case["kind"] == "orders":
+        output, _ = service.generate_excel({
+            "cantidad_ordenes": case["orders"],
+            "items_por_orden": case["items"],
+            "tags": _tags(case["tags"]),
+            "ct_origen": "CD Bench",
+            "fecha_entrega": "2025-01-15",
+            "seed": SEED,
+        })
+        rows = case["orders"] * case["items"]
+    else:
+        output, _ = service.generate_vehicles_excel({
+            "groups": [{"type": "Camion", "count": case["vehicles"], "capacity1": 1000,
+                        "origin": "CD Bench", "start_time": "08:00", "end_time": "18:00"}],
+            "tags": _tags(case["tags"]),
+            "seed": SEED,
+        })
+        rows = case["vehicles"]
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss //= 1024
+    # Big workbooks are spilled to a temp file (see app/spool.py)
+    size = output.size
+    output.close()
+    return dict(case, **{
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed) if elapsed else None,
+        "peak_rss_mb": round(rss / 1024, 1),
+        "bytes": size,
+    })
+
+
+def cases(grid):
+    for orders, items, tags in GRIDS[grid]["orders"]:
+        yield {"name": f"orders-{orders}-items{items}-tags{tags}",
+               "kind": "orders", "orders": orders, "items": items, "tags": tags}
+    for vehicles, tags in GRIDS[grid]["fleet"]:
+        yield {"name": f"fleet-{vehicles}-tags{tags}",
+               "kind": "fleet", "vehicles": vehicles, "tags": tags}
+
+
+def run_case(case, customers_file, timeout=CASE_TIMEOUT_SECONDS):
+    """
+    Result dict for `case`, run in a fresh process. Failed cases (exception,
+    crash, timeout) come back with an "error" key instead of measurements.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run, args=(case, customers_file, queue))
+    proc.start()
+    deadline = time.monotonic() + timeout
+    result = None
+    while result is None:
+        exited = proc.exitcode is not None
+        try:
+            result = queue.get(timeout=1)
+        except Empty:
+            if exited:
+                # Checked before the last get: anything it sent is in by now
+                result = dict(case, error=f"process exited with code {proc.exitcode}")
+            elif time.monotonic() > deadline:
+                proc.terminate()
+                result = dict(case, error=f"timed out after {timeout}s")
+    proc.join()
+    return result
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Regressions of `results` against `baseline` (both lists of result dicts),
+    as human-readable strings. Cases missing from either side are skipped.
+    """
+    previous = {r["name"]: r for r in baseline}
+    regressions = []
+    for r in results:
+        base = previous.get(r["name"])
+        if base is None:
+            continue
+        timed = base["seconds"] >= MIN_SECONDS and base["rows_per_sec"]
+        if timed and r["rows_per_sec"] < base["rows_per_sec"] * (1 - threshold):
+            regressions.append(f"{r['name']}: {r['rows_per_sec']} rows/s "
+                               f"(baseline {base['rows_per_sec']})")
+        if r["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold):
+            regressions.append(f"{r['name']}: {r['peak_rss_mb']} MB peak "
+                               f"(baseline {base['peak_rss_mb']})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grid", choices=sorted(GRIDS), default="quick")
+    parser.add_argument("--only", help="comma-separated case names to run")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--baseline", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    customers_file = os.environ.get("CUSTOMERS_FILE")
+    tmp_dir = None
+    if not customers_file or not os.path.exists(customers_file):
+        tmp_dir = tempfile.TemporaryDirectory()
+        customers_file = os.path.join(tmp_dir.name, "clientes_bench.json")
+        synthetic_customers(customers_file)
+
+    selected = list(cases(args.grid))
+    if args.only:
+        names = set(args.only.split(","))
+        selected = [c for c in selected if c["name"] in names]
+
+    results = []
+    failed = []
+    for case in selected:
+        r = run_case(case, customers_file)
+        if "error" in r:
+            failed.append(r)
+            print(f"{r['name']:<32} FAILED\n{r['error']}")
+            continue
+        results.append(r)
+        print(f"{r['name']:<32} {r['seconds']:>8}s {r['rows_per_sec']:>10} rows/s  "
+              f"{r['peak_rss_mb']:>8} MB peak  {r['bytes']:>12} bytes")
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"grid": args.grid, "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
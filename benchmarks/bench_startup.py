@@ -0,0 +1,95 @@
+"""
+Startup benchmark: package import time and cold start to ready.
+
+Each sample is a fresh interpreter, offline (customers from CUSTOMERS_FILE
+or a synthetic file). Reports the median of --runs samples for:
+  - import_s:  `import app`
+  - create_s:  create_app() (routes, services, boot warm-up started)
+  - ready_s:   from process start until /readyz answers 200
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.bench_generators import synthetic_customers
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A sample not ready by then fails (e.g. /readyz stuck on 503 "degraded")
+READY_TIMEOUT_SECONDS = 60
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+flask_app = app.create_app()
+t2 = time.perf_counter()
+client = flask_app.test_client()
+deadline = time.monotonic() + float(sys.argv[1])
+while True:
+    resp = client.get('/readyz')
+    if resp.status_code == 200:
+        break
+    if time.monotonic() > deadline:
+        sys.exit("not ready: " + resp.get_data(as_text=True))
+    time.sleep(0.001)
+t3 = time.perf_counter()
+print("RESULT " + json.dumps({"import_s": t1 - t0, "create_s": t2 - t1, "ready_s": t3 - t0}))
+"""
+
+
+def sample(customers_file, timeout=READY_TIMEOUT_SECONDS):
+    """
+    One cold start. Raises RuntimeError when it fails or is not ready within
+    `timeout` seconds (the process is killed a bit after that).
+    """
+    env = dict(os.environ, ADDRESSES_SHEET_URL="", CUSTOMERS_FILE=customers_file,
+               LOG_LEVEL="WARNING", PYTHONPATH=ROOT)
+    try:
+        result = subprocess.run([sys.executable, "-c", _PROBE, str(timeout)], env=env, cwd=ROOT,
+                                capture_output=True, text=True, timeout=timeout + 30)
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"startup sample killed after {timeout + 30}s")
+    if result.returncode != 0:
+        raise RuntimeError(f"startup sample failed:\n{result.stderr}")
+    line = next(l for l in result.stdout.splitlines() if l.startswith("RESULT "))
+    return json.loads(line[len("RESULT "):])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--customers", type=int, default=2000)
+    parser.add_argument("--save", help="write the medians as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        customers_file = os.environ.get("CUSTOMERS_FILE")
+        if not customers_file or not os.path.exists(customers_file):
+            customers_file = os.path.join(tmp, "clientes_bench.json")
+            synthetic_customers(customers_file, args.customers)
+        try:
+            samples = [sample(customers_file) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"FAILED {e}")
+            return 1
+
+    result = {key: round(statistics.median(s[key] for s in samples), 4)
+              for key in ("import_s", "create_s", "ready_s")}
+    result["runs"] = args.runs
+    print(json.dumps(result, indent=2))
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Writer backend benchmark: rows/sec and peak RSS per XLSX backend.
+
+Each backend runs in a fresh process so peak RSS is not polluted by the
+previous run.
+
+    python -m benchmarks.bench_writers --rows 100000 --cols 24
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+import traceback
+from queue import Empty
+
+# A backend that has not reported by then is killed and recorded as failed
+CASE_TIMEOUT_SECONDS = 1800
+
+
+def _rows(n_rows, n_cols):
+    # Text-only rows shaped like the order sheet
+    header = [f"COL {c}" for c in range(n_cols)]
+    yield header
+    for r in range(n_rows):
+        yield [f"ORD-{r:06d}", "-33.4489", "-70.6693", "Calle Falsa 123"] + \
+              [f"{(r * c) % 97:.4f}" for c in range(4, n_cols)]
+
+
+def _run(backend_name, n_rows, n_cols, queue):
+    # Failures are reported too, so run_case never waits on a dead process
+    try:
+        queue.put(_measure(backend_name, n_rows, n_cols))
+    except Exception:
+        queue.put({"backend": backend_name, "error": traceback.format_exc()})
+
+
+def _measure(backend_name, n_rows, n_cols):
+    from app.xlsx import get_backend
+
+    backend = get_backend(backend_name)
+    # Same sink for every backend, or the RSS comparison counts a BytesIO
+    output = _CountingSink()
+    start = time.perf_counter()
+    backend.write(output, [("Bench", _rows(n_rows, n_cols))])
+    elapsed = time.perf_counter() - start
+    size = output.tell()
+
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss //= 1024
+    return {
+        "backend": backend_name,
+        "rows": n_rows,
+        "cols": n_cols,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(n_rows / elapsed) if elapsed else None,
+        "peak_rss_mb": round(rss / 1024, 1),
+        "bytes": size,
+    }
+
+
+class _CountingSink:
+    """
+    Discards output, so no backend is measured with the file in a buffer.
+    Not seekable: zipfile (openpyxl) then writes straight through too.
+    """
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.size
+
+    def flush(self):
+        pass
+
+
+def run_case(backend_name, n_rows, n_cols, timeout=CASE_TIMEOUT_SECONDS):
+    """
+    Result dict for one backend, run in a fresh process. Failures (exception,
+    crash, timeout) come back with an "error" key instead of measurements.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run, args=(backend_name, n_rows, n_cols, queue))
+    proc.start()
+    deadline = time.monotonic() + timeout
+    result = None
+    while result is None:
+        alive = proc.is_alive()
+        try:
+            result = queue.get(timeout=1)
+        except Empty:
+            if not alive:
+                # Checked before the last get: anything it sent is in by now
+                result = {"backend": backend_name, "error": f"process exited with code {proc.exitcode}"}
+            elif time.monotonic() > deadline:
+                proc.terminate()
+                result = {"backend": backend_name, "error": f"timed out after {timeout}s"}
+    proc.join()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--cols", type=int, default=24)
+    parser.add_argument("--backends", default="native,native-sst,openpyxl")
+    args = parser.parse_args(argv)
+
+    results = [run_case(name, args.rows, args.cols) for name in args.backends.split(",")]
+    for r in results:
+        if "error" in r:
+            print(f"{r['backend']:<12} FAILED\n{r['error']}")
+            continue
+        print(f"{r['backend']:<12} {r['rows_per_sec']:>10} rows/s  "
+              f"{r['peak_rss_mb']:>8} MB peak  {r['bytes']:>12} bytes")
+    print(json.dumps(results, indent=2))
+    return 1 if any("error" in r for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
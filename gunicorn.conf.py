@@ -0,0 +1,44 @@
+import gc
+import os
+
+# Gunicorn settings (read automatically from the working directory:
+# `gunicorn app:app`). Command line flags still override anything here.
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '3000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 0))
+
+# PRELOAD: the app and the customer snapshot file (if one exists) are mapped
+# once in the master, then inherited by every forked worker, which share its
+# pages instead of each holding a copy; memory stays about flat as workers
+# are added. On by default only with several workers: a single one gains
+# nothing. The master never fetches the sheet; workers without a snapshot
+# warm up in the background like a plain `flask run` (see /readyz).
+preload_app = os.environ.get('GUNICORN_PRELOAD', str(workers > 1)).lower() == 'true'
+
+if preload_app:
+    # No warm-up thread in the master: threads do not survive fork, and a
+    # lock held by one at fork time would stay held in the workers
+    os.environ.setdefault('WARM_CUSTOMERS_ON_BOOT', 'false')
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from app.routes import service
+    snapshot = service.customer_cache.preload_snapshot_file()
+    if snapshot is None:
+        server.log.info("No customer snapshot file yet, workers warm up on their own")
+    else:
+        server.log.info(f"Preloaded {len(snapshot)} customers ({snapshot.source}) before forking workers")
+    # Everything allocated so far goes to the permanent generation: the
+    # workers' collector never touches (and so never copies) those pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from app.routes import service
+    service.customer_cache.after_fork()
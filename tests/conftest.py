@@ -0,0 +1,6 @@
+import os
+
+# Tests never reach the real addresses sheet (Config reads this at import)
+os.environ['ADDRESSES_SHEET_URL'] = ''
+# ...nor write the customer snapshot file into data/
+os.environ['CUSTOMERS_SNAPSHOT_FILE'] = ''
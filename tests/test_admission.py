@@ -0,0 +1,137 @@
+import threading
+import time
+
+import pytest
+
+from app import create_app
+from app import routes
+from app.admission import AdmissionControl, Overloaded, RequestTooLarge
+from app.config import Config
+from app.services import GenerationService
+
+CUSTOMERS = [{"address": "Calle 1", "country": "Chile", "city": "Santiago", "id": "1"}]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(routes, 'admission', AdmissionControl(budget=1000, max_cost=5000, max_queue=0))
+    routes.service.customers = list(CUSTOMERS)
+    return create_app().test_client()
+
+
+def test_estimate_matches_the_built_files():
+    service = GenerationService()
+    service.customers = list(CUSTOMERS)
+    tags = [{"header": "ZONA", "values": ["N", "S"]}, {"header": "VACIO", "values": []}]
+    orders = {"cantidad_ordenes": 7, "items_por_orden": 3, "ct_origen": "CD", "tags": tags}
+    job, _ = service._build_orders(orders)
+    assert service.estimate_cost('orders', orders) == job.row_count * len(job.plan.headers)
+    fleet = {"groups": [{"type": "Moto", "count": 4}, {"type": "Auto", "count": 2}], "tags": tags}
+    job, _ = service._build_vehicles(fleet)
+    assert service.estimate_cost('vehicles', fleet) == job.row_count * len(job.plan.headers)
+
+
+def test_negative_groups_cannot_hide_rows():
+    service = GenerationService()
+    fleet = {"groups": [{"type": "Moto", "count": 300}, {"type": "Moto", "count": -300}]}
+    job, _ = service._build_vehicles(fleet)
+    assert job.row_count == 300
+    assert service.estimate_cost('vehicles', fleet) == job.row_count * len(job.plan.headers)
+
+
+def test_batches_are_priced_by_the_files_in_flight(client, monkeypatch):
+    monkeypatch.setattr(Config, "GENERATION_MAX_WORKERS", 1)
+    sets = [{"cantidad_ordenes": n, "ct_origen": "CD"} for n in (1, 5, 2, 3)]
+    # Two files at a time: the two largest
+    assert routes.service.estimate_batch_cost('orders', sets) == (5 + 3) * 24
+
+    # 10 x 1000 cells in all, but no more than 2000 at once (ceiling 5000)
+    batch = {"type": "vehicles", "base": {"groups": [{"type": "Moto", "count": 40}]},
+             "scenarios": [{"seed": seed} for seed in range(10)]}
+    response = client.post('/api/batch', json=batch)
+    assert response.status_code == 200
+    response.get_data()
+
+
+def test_budget_queues_in_order_then_rejects():
+    gate = AdmissionControl(budget=10, max_cost=100, max_queue=1, wait=5, retry_after=7)
+    first = gate.admit(8)
+    with pytest.raises(RequestTooLarge):
+        gate.admit(101)
+
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(gate.admit(5)))
+    waiter.start()
+    time.sleep(0.05)
+    assert gate.stats()["queued"] == 1 and gate.stats()["queued_cells"] == 5
+    with pytest.raises(Overloaded) as e:
+        gate.admit(1)
+    assert e.value.retry_after == 7
+
+    # Releasing twice gives the budget back once
+    first.release()
+    first.release()
+    waiter.join()
+    assert gate.stats()["in_flight_cells"] == 5
+    admitted[0].release()
+    # Over the budget but under the ceiling: runs when nothing else does
+    with gate.admit(50):
+        assert gate.stats()["in_flight"] == 1
+    assert gate.stats() == {"in_flight": 0, "in_flight_cells": 0, "queued": 0, "queued_cells": 0,
+                            "budget_cells": 10, "admitted": 3, "rejected": 1, "too_large": 1}
+
+
+def test_queued_requests_give_up_after_the_wait():
+    gate = AdmissionControl(budget=10, max_cost=0, max_queue=4, wait=0.05)
+    ticket = gate.admit(10)
+    with pytest.raises(Overloaded):
+        gate.admit(1)
+    assert gate.stats()["queued"] == 0
+    ticket.release()
+
+
+def test_routes_answer_413_and_429(client):
+    huge = {"cantidad_ordenes": 10_000_000, "items_por_orden": 50, "ct_origen": "CD"}
+    response = client.post('/api/generate', json=huge)
+    assert response.status_code == 413
+    assert response.get_json()["limit"] == 5000
+    response = client.post('/api/jobs', json={"type": "orders", "params": huge})
+    assert response.status_code == 413
+
+    ticket = routes.admission.admit(1000)
+    try:
+        response = client.post('/api/generate-vehicles', json={"groups": [{"type": "Moto", "count": 2}]})
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == str(routes.admission.retry_after)
+    finally:
+        ticket.release()
+    assert client.post('/api/generate-vehicles', json={"groups": [{"type": "Moto", "count": 2}]}).status_code == 200
+    # Buffered workbooks give their budget back once generated
+    assert routes.admission.stats()["in_flight"] == 0
+
+
+def test_streamed_responses_hold_their_ticket_until_closed(client):
+    payload = {"cantidad_ordenes": 10, "ct_origen": "CD", "format": "csv"}
+    response = client.post('/api/generate', json=payload, buffered=False)
+    # 10 x 24 cells, weighed as streamed
+    assert routes.admission.stats()["in_flight_cells"] == 24
+    response.get_data()
+    response.close()
+    assert routes.admission.stats()["in_flight"] == 0
+
+
+def test_streamed_output_weighs_less(client):
+    # 300 x 24 cells: over the 5000 ceiling as a workbook, not as a CSV
+    payload = {"cantidad_ordenes": 300, "ct_origen": "CD"}
+    assert client.post('/api/generate', json=payload).status_code == 413
+    for url, body in (('/api/generate', dict(payload, format="csv")), ('/api/generate?stream=1', payload)):
+        response = client.post(url, json=body)
+        assert response.status_code == 200
+        response.close()
+    assert routes.admission.weigh(7200, streamed=True) == 720
+
+
+def test_metrics_expose_queue_and_cost(client):
+    body = client.get('/metrics').get_data(as_text=True)
+    assert "plannerpro_admission_queue_depth 0" in body
+    assert "plannerpro_admission_in_flight_cells 0" in body
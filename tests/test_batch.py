@@ -0,0 +1,67 @@
+import io
+import json
+import zipfile
+import pytest
+from app import create_app
+from app import routes
+from app.config import Config
+from app.services import GenerationService, expand_batch
+
+CUSTOMERS = [{
+    "address": "Calle Falsa 123",
+    "country": "Chile",
+    "city": "Santiago",
+    "lat": "-33.4489",
+    "long": "-70.6693",
+    "name": "Test Client",
+    "id": "123"
+}]
+
+def test_expand_batch_matrix_and_list(monkeypatch):
+    sets = expand_batch({"cantidad_ordenes": 5}, matrix={"fecha_entrega": ["2025-01-01", "2025-01-02"], "ct_origen": ["A", "B", "C"]})
+    assert len(sets) == 6
+    assert sets[0] == {"cantidad_ordenes": 5, "fecha_entrega": "2025-01-01", "ct_origen": "A"}
+
+    sets = expand_batch({"ct_origen": "A"}, scenarios=[{"seed": 1}, {"ct_origen": "B"}])
+    assert sets == [{"ct_origen": "A", "seed": 1}, {"ct_origen": "B"}]
+
+    with pytest.raises(ValueError):
+        expand_batch({"ct_origen": "A"})
+    monkeypatch.setattr(Config, 'BATCH_MAX_SCENARIOS', 2)
+    with pytest.raises(ValueError):
+        expand_batch(matrix={"ct_origen": ["A", "B", "C"]})
+
+def test_batch_zip_matches_single_requests():
+    service = GenerationService()
+    service.customers = list(CUSTOMERS)
+    sets = expand_batch({"cantidad_ordenes": 3, "seed": 5, "fecha_entrega": "2025-01-15"},
+                        matrix={"ct_origen": ["CD Norte", "CD Sur"]})
+    chunks, filename, _ = service.render_batch("orders", sets)
+    assert filename == "lote_orders_2.zip"
+
+    zf = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    manifest = json.loads(zf.read("manifest.json"))
+    assert [f["file"] for f in manifest["files"]] == [
+        "001_CD-Norte_2025-01-15_ordenes_3.xlsx",
+        "002_CD-Sur_2025-01-15_ordenes_3.xlsx",
+    ]
+    assert set(zf.namelist()) == {f["file"] for f in manifest["files"]} | {"manifest.json"}
+
+    single, _ = service.stream_excel(sets[1])
+    assert zf.read("002_CD-Sur_2025-01-15_ordenes_3.xlsx") == b"".join(single)
+
+def test_batch_route_validates_every_set_first():
+    routes.service.customers = list(CUSTOMERS)
+    client = create_app().test_client()
+
+    resp = client.post('/api/batch', json={"base": {"cantidad_ordenes": 2}, "scenarios": [{"ct_origen": "A"}, {}]})
+    assert resp.status_code == 400
+    assert "CT Origen" in resp.get_json()["error"]
+
+    resp = client.post('/api/batch', json={
+        "type": "vehicles", "format": "csv",
+        "scenarios": [{"groups": [{"type": "Moto", "count": 1}]}, {"groups": [{"type": "Auto", "count": 2}]}],
+    })
+    assert resp.status_code == 200
+    zf = zipfile.ZipFile(io.BytesIO(resp.get_data()))
+    assert zf.read("002_flota_vehiculos.csv").decode('utf-8').count("AUTO") == 2
@@ -0,0 +1,27 @@
+from benchmarks.bench_generators import GRIDS, cases, compare, run_case
+
+def _result(name, seconds, rows_per_sec, rss):
+    return {"name": name, "seconds": seconds, "rows_per_sec": rows_per_sec, "peak_rss_mb": rss}
+
+def test_compare_flags_slowdowns_and_memory_growth():
+    baseline = [_result("a", 1.0, 1000, 50.0), _result("b", 1.0, 1000, 50.0), _result("tiny", 0.001, 1000, 50.0)]
+    results = [
+        _result("a", 1.1, 900, 55.0),     # within 20%
+        _result("b", 2.0, 500, 70.0),     # slower and bigger
+        _result("tiny", 0.002, 500, 50.0),  # too short to compare speed
+        _result("new", 1.0, 1, 999.0),    # not in the baseline
+    ]
+    regressions = compare(results, baseline, threshold=0.2)
+    assert len(regressions) == 2
+    assert all(line.startswith("b:") for line in regressions)
+
+def test_grid_case_names_are_unique():
+    for grid in GRIDS:
+        names = [c["name"] for c in cases(grid)]
+        assert len(names) == len(set(names))
+
+def test_failing_case_is_reported_not_awaited(tmp_path):
+    # No customers: generation raises in the child process
+    case = {"name": "broken", "kind": "orders", "orders": 10, "items": 1, "tags": 0}
+    result = run_case(case, str(tmp_path / "missing.json"), timeout=120)
+    assert "No customer data" in result["error"]
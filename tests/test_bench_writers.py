@@ -0,0 +1,14 @@
+from benchmarks.bench_writers import _CountingSink, _rows, run_case
+from app.xlsx import get_backend
+
+def test_every_backend_writes_to_the_same_sink():
+    sizes = {}
+    for name in ("native", "openpyxl"):
+        sink = _CountingSink()
+        get_backend(name).write(sink, [("Bench", _rows(50, 6))])
+        sizes[name] = sink.size
+    assert all(size > 1000 for size in sizes.values())
+
+def test_failing_backend_is_reported_not_awaited():
+    result = run_case("nope", 10, 2, timeout=120)
+    assert "nope" in result["error"]
@@ -0,0 +1,42 @@
+import random
+from app.columns import ColumnPlan
+from app.sampling import uniform_strs
+
+def test_plan_fills_reused_row_by_position():
+    plan = ColumnPlan()
+    plan.per_group("ORDER", "order")
+    plan.constant("FIXED", "1")
+    plan.per_row("ITEM", "item")
+    plan.tags([{"header": "TAG", "values": ["x"]}, {"header": "EMPTY", "values": []}])
+    plan.constant("", "")
+
+    assert plan.headers == ["ORDER", "FIXED", "ITEM", "TAG", "EMPTY", ""]
+    assert plan.tag_columns == [("tag:0", ["x"])]
+
+    chunk = ([2, 1], {"order": ["A", "B"], "item": ["A-1", "A-2", "B-3"], "tag:0": ["x", "x", "x"]})
+    seen = []
+    first = None
+    for row in plan.iter_rows([chunk]):
+        first = first or row
+        assert row is first  # same list every time
+        seen.append(list(row))
+
+    assert seen == [
+        ["A", "1", "A-1", "x", "", ""],
+        ["A", "1", "A-2", "x", "", ""],
+        ["B", "1", "B-3", "x", "", ""],
+    ]
+
+def test_duplicate_headers_keep_their_own_slot():
+    plan = ColumnPlan()
+    plan.constant("MAXIMO DE DINERO", "5500000")
+    plan.constant("MAXIMO DE DINERO", "5500000")
+    assert plan.blank_row() == ["5500000", "5500000"]
+
+def test_uniform_strs_keep_four_decimals():
+    values = uniform_strs(random.Random(1), 0.001, 0.005, 500)
+    for v in values:
+        assert "," not in v
+        whole, dec = v.split(".")
+        assert len(dec) == 4
+        assert 0.001 <= float(v) <= 0.005
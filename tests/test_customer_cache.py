@@ -0,0 +1,96 @@
+import io
+import time
+from unittest.mock import MagicMock, patch
+from app.customers import CustomerCache, parse_sheet_rows
+
+SHEET_CSV = "Direccion,Pais,Ciudad\nCalle 1,Chile,Santiago\nCalle 2,Chile,Valparaiso\n"
+
+def _response(status=200, text=SHEET_CSV, headers=None):
+    resp = MagicMock()
+    resp.status_code = status
+    resp.raw = io.BytesIO(text.encode('utf-8'))
+    resp.headers = headers or {}
+    resp.raise_for_status = MagicMock()
+    return resp
+
+def _wait_refresh(cache):
+    for _ in range(100):
+        if not cache._refreshing:
+            return
+        time.sleep(0.01)
+
+@patch('requests.get')
+def test_cold_load_parses_sheet(mock_get):
+    mock_get.return_value = _response(headers={'ETag': '"v1"'})
+    cache = CustomerCache(sheet_url="http://sheet", local_file="/nonexistent.json", ttl=60)
+
+    snapshot = cache.get()
+    assert [c["address"] for c in snapshot.records] == ["Calle 1", "Calle 2"]
+    assert snapshot.etag == '"v1"'
+
+    # Fresh: no new request
+    cache.get()
+    assert mock_get.call_count == 1
+
+@patch('requests.get')
+def test_stale_snapshot_is_served_while_revalidating(mock_get):
+    mock_get.return_value = _response(headers={'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2025 00:00:00 GMT'})
+    cache = CustomerCache(sheet_url="http://sheet", local_file="/nonexistent.json", ttl=0)
+    first = cache.get()
+
+    mock_get.return_value = _response(status=304, text="")
+    served = cache.get()
+    assert served is first
+    _wait_refresh(cache)
+
+    headers = mock_get.call_args.kwargs['headers']
+    assert headers['If-None-Match'] == '"v1"'
+    assert headers['If-Modified-Since'] == 'Mon, 01 Jan 2025 00:00:00 GMT'
+
+    refreshed = cache.peek()
+    assert refreshed.records == first.records
+    assert refreshed.loaded_at >= first.loaded_at
+
+@patch('requests.get')
+def test_failed_refresh_keeps_stale_data(mock_get):
+    mock_get.return_value = _response()
+    cache = CustomerCache(sheet_url="http://sheet", local_file="/nonexistent.json", ttl=0)
+    first = cache.get()
+
+    mock_get.side_effect = Exception("network down")
+    cache.get()
+    _wait_refresh(cache)
+    assert cache.peek() is first
+
+def test_static_records_never_refresh():
+    cache = CustomerCache(sheet_url="http://sheet", local_file="/nonexistent.json", ttl=0)
+    cache.set_static([{"address": "X", "country": "Chile"}])
+    with patch('requests.get') as mock_get:
+        assert len(cache.get()) == 1
+        assert mock_get.call_count == 0
+
+@patch('requests.get')
+def test_sheet_is_streamed(mock_get):
+    mock_get.return_value = _response(text='Direccion,Pais,Ciudad\r\n"Calle 1,\nDepto 2",Chile,Santiago\r\n')
+    cache = CustomerCache(sheet_url="http://sheet", local_file="/nonexistent.json", ttl=60)
+    snapshot = cache.get()
+    assert mock_get.call_args.kwargs['stream'] is True
+    assert mock_get.return_value.close.called
+    # Quoted newlines survive the incremental decode
+    assert [c["address"] for c in snapshot.records] == ["Calle 1,\nDepto 2"]
+
+def test_sheet_row_limit():
+    rows = [["Direccion", "Pais", "Ciudad"]] + [[f"Calle {i}", "Chile", "Santiago"] for i in range(100)]
+    store = parse_sheet_rows(iter(rows), max_rows=10, sample_rows=0)
+    assert [c["address"] for c in store] == [f"Calle {i}" for i in range(10)]
+
+def test_sheet_reservoir_sample():
+    rows = [[f"Calle {i}", "Chile", "Santiago"] for i in range(1000)]
+    store = parse_sheet_rows(iter(rows), max_rows=0, sample_rows=50)
+    picked = [int(c["address"].split()[1]) for c in store]
+    assert len(picked) == 50
+    # Sheet order, spread over the whole sheet, same sample every time
+    assert picked == sorted(picked)
+    assert picked[-1] > 500
+    again = parse_sheet_rows(iter(rows), max_rows=0, sample_rows=50)
+    assert [c["address"] for c in again] == [c["address"] for c in store]
@@ -0,0 +1,34 @@
+from app.customers import CustomerSnapshot, fold
+
+CUSTOMERS = [
+    {"address": "SCL1", "country": "Chile", "city": "Santiago"},
+    {"address": "VAL1", "country": " chile", "city": "Valparaíso"},
+    {"address": "ARG1", "country": "Argentina", "city": "Mendoza"},
+    {"address": "SCL2", "country": "Chile", "city": "Santiago Centro"},
+]
+
+def _addresses(snapshot, country, city):
+    return sorted(c["address"] for c in snapshot.select(country, city))
+
+def test_fold_removes_case_and_accents():
+    assert fold(" Valparaíso ") == "valparaiso"
+    assert fold("MÉXICO") == "mexico"
+
+def test_select_matches_linear_filter_semantics():
+    snapshot = CustomerSnapshot(CUSTOMERS, "static")
+    # Substring match on city, accent/case-insensitive on both sides
+    assert _addresses(snapshot, "Chile", "Santiago") == ["SCL1", "SCL2"]
+    assert _addresses(snapshot, "CHILE", "valparaiso") == ["VAL1"]
+    assert _addresses(snapshot, "chi", "") == ["SCL1", "SCL2", "VAL1"]
+    # "Otro" means any city
+    assert _addresses(snapshot, "Chile", "Otro") == ["SCL1", "SCL2", "VAL1"]
+    assert _addresses(snapshot, "", "Mendoza") == ["ARG1"]
+
+def test_select_falls_back_to_everything():
+    snapshot = CustomerSnapshot(CUSTOMERS, "static")
+    assert len(snapshot.select("Peru", "Lima")) == len(CUSTOMERS)
+    assert len(snapshot.select(None, None)) == len(CUSTOMERS)
+
+def test_revalidated_snapshot_reuses_index():
+    snapshot = CustomerSnapshot(CUSTOMERS, "sheet", etag='"v1"')
+    assert snapshot.revalidated().index is snapshot.index
@@ -0,0 +1,99 @@
+import io
+import time
+from unittest.mock import MagicMock, patch
+
+from app.customers import CustomerCache, _RefreshLease
+
+SHEET_CSV = b"Calle 1,Chile,Santiago\nCalle 2,Chile,Temuco\n"
+
+
+def _response():
+    resp = MagicMock(status_code=200, headers={'ETag': '"v1"'})
+    resp.raw = io.BytesIO(SHEET_CSV)
+    return resp
+
+
+def _cache(tmp_path, ttl=60):
+    # Each instance stands for one server process sharing the data directory
+    return CustomerCache(sheet_url="http://sheet", local_file="/nonexistent.json", ttl=ttl,
+                         snapshot_file=str(tmp_path / "clientes.snapshot"), watch_interval=0)
+
+
+@patch('requests.get')
+def test_second_process_reads_the_file_instead_of_the_sheet(mock_get, tmp_path):
+    mock_get.side_effect = lambda *a, **kw: _response()
+    first = _cache(tmp_path).get()
+    second = _cache(tmp_path).get()
+    assert mock_get.call_count == 1
+    assert second.version == first.version
+    # Both serve the mapped file, not a private copy
+    assert isinstance(second.records.address_blob, memoryview)
+
+
+@patch('requests.get')
+def test_refresh_skips_the_sheet_while_another_process_holds_the_lease(mock_get, tmp_path):
+    mock_get.side_effect = lambda *a, **kw: _response()
+    cache = _cache(tmp_path)
+    before = cache.get()
+    mock_get.reset_mock()
+
+    lease = _RefreshLease(cache.snapshot_file)
+    assert lease.acquire()
+    try:
+        cache.refresh()
+    finally:
+        lease.release()
+    assert mock_get.call_count == 0
+    assert cache.peek().version == before.version
+    assert cache.peek().loaded_at >= before.loaded_at
+
+
+@patch('requests.get')
+def test_refresh_uses_a_file_validated_by_another_process(mock_get, tmp_path):
+    mock_get.side_effect = lambda *a, **kw: _response()
+    leader, follower = _cache(tmp_path), _cache(tmp_path)
+    leader.get()
+    follower.get()
+    mock_get.reset_mock()
+
+    # The leader revalidates (304 touches the file); the follower then
+    # refreshes from the file without its own request
+    time.sleep(0.01)
+    mock_get.side_effect = None
+    mock_get.return_value = MagicMock(status_code=304, headers={})
+    leader.refresh()
+    assert mock_get.call_count == 1
+    follower.refresh()
+    assert mock_get.call_count == 1
+
+
+def test_preload_then_after_fork(tmp_path):
+    cache = _cache(tmp_path)
+    with patch('requests.get', side_effect=lambda *a, **kw: _response()):
+        snapshot = cache.preload()
+    assert len(snapshot) == 2 and not cache._watching
+    cache.watch_interval = 3600
+    cache.after_fork()
+    assert cache._watching
+    assert cache.get() is snapshot
+
+
+def test_master_only_maps_an_existing_snapshot_file(tmp_path):
+    master = _cache(tmp_path)
+    with patch('requests.get') as mock_get:
+        assert master.preload_snapshot_file() is None
+        assert mock_get.call_count == 0
+
+    # A forked worker with nothing inherited warms up in the background
+    with patch('requests.get', side_effect=lambda *a, **kw: _response()):
+        master.after_fork()
+        for _ in range(200):
+            if master.peek() is not None:
+                break
+            time.sleep(0.01)
+    assert len(master.peek()) == 2
+
+    # The next master boot maps the file the worker saved
+    with patch('requests.get') as mock_get:
+        assert len(_cache(tmp_path).preload_snapshot_file()) == 2
+        assert mock_get.call_count == 0
@@ -0,0 +1,96 @@
+import io
+import json
+import os
+import pickle
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.customer_store import open_store
+from app.customers import CustomerCache, CustomerSnapshot, load_snapshot_file, save_snapshot_file
+
+CUSTOMERS = [
+    {"address": "Calle 1", "country": "Chile", "city": "Santiago", "lat": "-33.4489", "long": "-70.6693", "id": "A"},
+    {"address": "Calle Ñ 2", "country": "Perú", "city": "Lima", "id": "B"},
+]
+
+
+def _cache(tmp_path, sheet_url="http://sheet", watch_interval=0):
+    return CustomerCache(sheet_url=sheet_url, local_file=str(tmp_path / "clientes.json"), ttl=60,
+                         snapshot_file=str(tmp_path / "clientes.snapshot"), watch_interval=watch_interval)
+
+
+def test_snapshot_file_round_trip(tmp_path):
+    path = str(tmp_path / "clientes.snapshot")
+    original = CustomerSnapshot(CUSTOMERS, "sheet", etag='"v7"', last_modified="Mon, 01 Jan 2025 00:00:00 GMT")
+    save_snapshot_file(original, path)
+
+    loaded = load_snapshot_file(path)
+    assert [c.to_dict() for c in loaded.records] == CUSTOMERS
+    assert loaded.version == original.version
+    assert (loaded.source, loaded.etag, loaded.last_modified) == ("sheet", '"v7"', original.last_modified)
+    assert loaded.loaded_at >= original.loaded_at
+    # Columns are views over the mapping, and still pickle for the pool
+    assert isinstance(loaded.records.address_blob, memoryview)
+    assert pickle.loads(pickle.dumps(loaded.records)).digest() == original.records.digest()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+
+
+def test_rejects_truncated_and_foreign_files(tmp_path):
+    path = tmp_path / "clientes.snapshot"
+    save_snapshot_file(CustomerSnapshot(CUSTOMERS, "sheet"), str(path))
+    path.write_bytes(path.read_bytes()[:-8])
+    with pytest.raises(ValueError):
+        open_store(str(path))
+    path.write_bytes(b"not a snapshot")
+    with pytest.raises(ValueError):
+        open_store(str(path))
+
+
+@patch('requests.get')
+def test_sheet_load_is_persisted_and_used_offline(mock_get, tmp_path):
+    resp = MagicMock(status_code=200, headers={'ETag': '"v1"'})
+    resp.raw = io.BytesIO(b"Calle 1,Chile,Santiago\nCalle 2,Chile,Temuco\n")
+    mock_get.return_value = resp
+    first = _cache(tmp_path).get()
+    assert os.path.exists(tmp_path / "clientes.snapshot")
+
+    # Next cold start: served from the file without touching the sheet
+    mock_get.reset_mock()
+    mock_get.side_effect = Exception("offline")
+    cache = _cache(tmp_path)
+    snapshot = cache.get()
+    assert mock_get.call_count == 0
+    assert [c["address"] for c in snapshot.records] == ["Calle 1", "Calle 2"]
+    assert snapshot.version == first.version and snapshot.etag == '"v1"'
+
+
+def test_unreadable_snapshot_falls_back(tmp_path):
+    (tmp_path / "clientes.snapshot").write_bytes(b"garbage")
+    (tmp_path / "clientes.json").write_text(json.dumps(CUSTOMERS), encoding="utf-8")
+    with patch('requests.get', side_effect=Exception("offline")):
+        snapshot = _cache(tmp_path).get()
+    assert snapshot.source == "file" and len(snapshot) == 2
+
+
+def test_changed_files_are_hot_swapped(tmp_path):
+    json_path = tmp_path / "clientes.json"
+    json_path.write_text(json.dumps(CUSTOMERS[:1]), encoding="utf-8")
+    cache = _cache(tmp_path, sheet_url="", watch_interval=3600)
+    before = cache.get()
+    assert len(before) == 1
+
+    json_path.write_text(json.dumps(CUSTOMERS), encoding="utf-8")
+    os.utime(json_path, ns=(1, 1))
+    cache.check_files()
+    assert len(cache.peek()) == 2
+    assert len(before) == 1
+
+    # A snapshot written by another process replaces whatever is loaded
+    save_snapshot_file(CustomerSnapshot(CUSTOMERS[1:], "sheet"), str(tmp_path / "clientes.snapshot"))
+    cache.check_files()
+    assert [c["id"] for c in cache.peek().records] == ["B"]
+    # Unchanged files are left alone
+    current = cache.peek()
+    cache.check_files()
+    assert cache.peek() is current
@@ -0,0 +1,95 @@
+import pickle
+import tracemalloc
+
+from app.customer_store import CustomerStore, CustomerStoreBuilder, open_store, write_store
+from app.customers import CustomerSnapshot, parse_sheet_rows
+
+CUSTOMERS = [
+    {"address": "Av. Providencia 1234", "country": "Chile", "city": "Santiago",
+     "lat": "-33.4489", "long": "-70.6693", "name": "Cliente 1", "id": "C-1"},
+    {"address": "Calle Ñandú 5", "country": "Chile", "city": "Valparaíso",
+     "lat": -33.0472, "long": -71.6127, "name": "Cliente 2", "id": "C-2"},
+    {"address": "Sin coordenadas", "country": "Perú", "id": "C-3"},
+]
+
+
+def _many(n):
+    return [{"address": f"Calle {i}, Santiago", "country": "Chile", "city": "Santiago",
+             "lat": "", "long": "", "name": "Cliente Sheet", "id": f"S-{i}"} for i in range(n)]
+
+
+def test_record_views_read_like_the_source_dicts():
+    store = CustomerStore.from_records(CUSTOMERS)
+    assert len(store) == 3
+    assert store[0].to_dict() == CUSTOMERS[0]
+    assert store[1]["address"] == "Calle Ñandú 5"
+    assert store[1]["lat"] == "-33.0472"
+    # Missing keys stay missing
+    assert "city" not in store[2]
+    assert store[2].get("city", "x") == "x"
+    assert store[2].get("lat", "") == ""
+    assert store[-1]["id"] == "C-3"
+
+
+def test_batch_columns():
+    store = CustomerStore.from_records(CUSTOMERS)
+    rows = [2, 0, 0]
+    assert store.addresses(rows) == ["Sin coordenadas", "Av. Providencia 1234", "Av. Providencia 1234"]
+    assert store.customer_ids(rows) == ["C-3", "C-1", "C-1"]
+    assert store.coords("long", rows) == ["", "-70.6693", "-70.6693"]
+    assert store.countries(rows) == ["Perú", "Chile", "Chile"]
+
+
+def test_coordinates_are_optional():
+    store = parse_sheet_rows([["Calle 1", "Chile", "Santiago"], ["Calle 2", "Chile", "Temuco"]])
+    assert store.lat_blob is None and store.long_blob is None
+    assert store.coords("lat", [0, 1]) == ["", ""]
+
+
+def test_coordinates_are_kept_as_given(tmp_path):
+    records = [dict(CUSTOMERS[0], lat=-35.562404, long="-71,841528"), dict(CUSTOMERS[1], lat="n/a", long=0)]
+    write_store(str(tmp_path / "c.snapshot"), CustomerStore.from_records(records))
+    store, _ = open_store(str(tmp_path / "c.snapshot"))
+    assert store.coords("lat", [0, 1]) == ["-35.562404", "n/a"]
+    assert store.coords("long", [0, 1]) == ["-71,841528", "0"]
+    assert store.take([1]).coords("lat", [0]) == ["n/a"]
+
+
+def test_builder_flushes_in_batches():
+    builder = CustomerStoreBuilder()
+    builder.FLUSH_ROWS = 7
+    for record in _many(30):
+        builder.add(record)
+    assert len(builder) == 30
+    store = builder.build()
+    assert [c["id"] for c in store] == [f"S-{i}" for i in range(30)]
+
+
+def test_store_pickles_and_keeps_its_digest():
+    store = CustomerStore.from_records(_many(100) + CUSTOMERS)
+    copy = pickle.loads(pickle.dumps(store))
+    assert copy.digest() == store.digest()
+    assert [c.to_dict() for c in copy] == [c.to_dict() for c in store]
+
+
+def test_snapshot_version_tracks_content():
+    a = CustomerSnapshot(CUSTOMERS, "static")
+    b = CustomerSnapshot([dict(c) for c in CUSTOMERS], "static")
+    changed = [dict(c) for c in CUSTOMERS]
+    changed[0]["address"] = "Otra 1"
+    assert a.version == b.version
+    assert CustomerSnapshot(changed, "static").version != a.version
+
+
+def test_memory_is_a_fraction_of_dicts():
+    tracemalloc.start()
+    records = _many(20000)
+    as_dicts = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    store = CustomerStore.from_records(records)
+    as_store = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert store.nbytes < as_store
+    assert as_store * 5 < as_dicts
@@ -0,0 +1,76 @@
+import csv
+import io
+import pytest
+from app import create_app
+from app import routes
+from app.delimited import UTF8_BOM, get_format, iter_delimited
+from app.services import GenerationService
+
+CUSTOMERS = [{
+    "address": "Calle Falsa 123, Depto \"B\"",
+    "country": "Chile",
+    "city": "Santiago",
+    "lat": "-33.4489",
+    "long": "-70.6693",
+    "name": "Test Client",
+    "id": "123"
+}]
+
+def _parse(data, delimiter=","):
+    return list(csv.reader(io.StringIO(data.decode('utf-8')), delimiter=delimiter))
+
+def test_iter_delimited_quotes_and_reused_rows():
+    row = ["a", "b"]
+    def rows():
+        yield ["x,y", 'say "hi"']
+        for i in range(5000):
+            row[0] = str(i)
+            yield row
+    chunks = list(iter_delimited(rows()))
+    assert len(chunks) > 1
+    data = b"".join(chunks)
+    assert data.startswith(b'"x,y","say ""hi"""\r\n')
+    parsed = _parse(data)
+    assert len(parsed) == 5001
+    assert parsed[-1] == ["4999", "b"]
+
+def test_bom_and_unknown_format():
+    assert b"".join(iter_delimited([["ñ"]], bom=True)).startswith(UTF8_BOM)
+    assert get_format("TSV").delimiter == "\t"
+    with pytest.raises(ValueError):
+        get_format("xls")
+
+def test_orders_csv_matches_xlsx_columns():
+    service = GenerationService()
+    service.customers = list(CUSTOMERS)
+    params = {"cantidad_ordenes": 3, "items_por_orden": 2, "ct_origen": "CD", "seed": 1}
+    chunks, filename = service.stream_delimited(params, get_format("csv"))
+    assert filename == "ordenes_3.csv"
+
+    rows = _parse(b"".join(chunks))
+    headers = rows[0]
+    assert headers[0] == "N° DOCUMENTO"
+    assert len(rows) == 7
+    assert rows[1][headers.index("DIRECCION")] == CUSTOMERS[0]["address"]
+    assert rows[6][headers.index("N° DOCUMENTO")] == "ORD-000003"
+
+def test_routes_serve_csv_and_tsv():
+    routes.service.customers = list(CUSTOMERS)
+    client = create_app().test_client()
+
+    resp = client.post('/api/generate?format=csv&bom=1', json={"cantidad_ordenes": 2, "ct_origen": "CD"})
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/csv'
+    assert 'ordenes_2.csv' in resp.headers['Content-Disposition']
+    assert resp.get_data().startswith(UTF8_BOM)
+
+    resp = client.post('/api/generate-vehicles', json={
+        "format": "tsv", "groups": [{"type": "Moto", "count": 2, "capacity1": 50}]
+    })
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/tab-separated-values'
+    rows = _parse(resp.get_data(), "\t")
+    assert [r[0] for r in rows[1:]] == ["MOTO01", "MOTO02"]
+
+    resp = client.post('/api/generate?format=pdf', json={"cantidad_ordenes": 2, "ct_origen": "CD"})
+    assert resp.status_code == 400
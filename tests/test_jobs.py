@@ -0,0 +1,122 @@
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import openpyxl
+import pytest
+from app import create_app
+from app import routes
+from app.jobs import DONE, JobManager, JobQueueFull
+
+CUSTOMERS = [{
+    "address": "Calle Falsa 123",
+    "country": "Chile",
+    "city": "Santiago",
+    "lat": "-33.4489",
+    "long": "-70.6693",
+    "name": "Test Client",
+    "id": "123"
+}]
+
+def _wait(client, url):
+    for _ in range(200):
+        body = client.get(url).get_json()
+        if body['status'] not in ('queued', 'running'):
+            return body
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(routes, 'jobs', JobManager(directory=str(tmp_path), workers=1))
+    routes.service.customers = list(CUSTOMERS)
+    yield create_app().test_client()
+    routes.jobs.shutdown()
+
+def test_order_job_reports_progress_and_serves_file(client):
+    resp = client.post('/api/jobs', json={
+        "type": "orders",
+        "params": {"cantidad_ordenes": 1500, "items_por_orden": 2, "ct_origen": "CD", "seed": 3}
+    })
+    assert resp.status_code == 202
+    url = resp.headers['Location']
+
+    body = _wait(client, url)
+    assert body['status'] == DONE
+    assert body['rows_written'] == body['rows_total'] == 3000
+    assert body['progress'] == 1.0
+
+    file_resp = client.get(url + '/file')
+    assert file_resp.status_code == 200
+    assert 'ordenes_1500.xlsx' in file_resp.headers['Content-Disposition']
+    ws = openpyxl.load_workbook(io.BytesIO(file_resp.get_data()), read_only=True).active
+    assert sum(1 for _ in ws.iter_rows()) == 3001
+
+def test_vehicle_job_csv(client):
+    resp = client.post('/api/jobs', json={
+        "type": "vehicles",
+        "params": {"format": "csv", "groups": [{"type": "Auto", "count": 3}]}
+    })
+    url = resp.headers['Location']
+    assert _wait(client, url)['rows_written'] == 3
+
+    rows = list(csv.reader(io.StringIO(client.get(url + '/file').get_data(as_text=True))))
+    assert [r[0] for r in rows[1:]] == ["AUTO01", "AUTO02", "AUTO03"]
+
+def test_invalid_jobs(client):
+    assert client.post('/api/jobs', json={"type": "orders", "params": {"cantidad_ordenes": 1}}).status_code == 400
+    assert client.post('/api/jobs', json={"type": "pdf"}).status_code == 400
+    assert client.get('/api/jobs/nope').status_code == 404
+
+def test_manager_bounds_pending_and_expires(tmp_path):
+    manager = JobManager(directory=str(tmp_path), workers=1, ttl=0, max_pending=1)
+    release = []
+    def slow_chunks():
+        while not release:
+            time.sleep(0.01)
+        yield b"data"
+
+    job = manager.submit("orders", lambda progress: (slow_chunks(), "f.csv", "text/csv"))
+    with pytest.raises(JobQueueFull):
+        manager.submit("orders", lambda progress: (iter([b""]), "g.csv", "text/csv"))
+
+    release.append(True)
+    manager.shutdown()
+    assert job.status == DONE
+    with open(job.path, 'rb') as f:
+        assert f.read() == b"data"
+
+    # ttl=0: gone (with its file) as soon as it is looked up again
+    time.sleep(0.01)
+    assert manager.get(job.id) is None
+    assert not (tmp_path / job.id).exists()
+
+def test_other_workers_answer_from_the_sidecar(tmp_path):
+    # Two managers over one directory stand for two gunicorn workers
+    owner, other = JobManager(directory=str(tmp_path), workers=1), JobManager(directory=str(tmp_path), workers=1)
+    job = owner.submit("orders", lambda progress: (iter([b"a", b"b"]), "f.csv", "text/csv"))
+    owner.shutdown()
+    seen = other.get(job.id)
+    assert seen.to_dict() == job.to_dict()
+    assert (seen.path, seen.mimetype) == (job.path, "text/csv")
+    assert other.get("nope") is None and other.get("../x") is None
+
+def test_jobs_of_dead_processes_fail_and_are_swept(tmp_path):
+    dead = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                          capture_output=True, text=True).stdout.strip()
+    state = {"id": "abc", "type": "orders", "status": "running", "rows_written": 5, "rows_total": 10,
+             "progress": 0.5, "filename": "f.csv", "error": None, "created_at": 1, "finished_at": None,
+             "path": None, "mimetype": "text/csv", "pid": int(dead)}
+    (tmp_path / "abc.json").write_text(json.dumps(state))
+    (tmp_path / "abc.part").write_bytes(b"half")
+    (tmp_path / "fresh").write_bytes(b"done")
+    assert JobManager(directory=str(tmp_path)).get("abc").status == "failed"
+
+    # A new process sweeps what is past the TTL
+    for name in ("abc.json", "abc.part"):
+        os.utime(tmp_path / name, (0, 0))
+    JobManager(directory=str(tmp_path), ttl=60)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["fresh"]
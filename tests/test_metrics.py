@@ -0,0 +1,67 @@
+from app import create_app
+from app import routes
+from app.metrics import Registry, phase, start_request
+
+CUSTOMERS = [{"address": "Calle 1", "country": "Chile", "city": "Santiago", "lat": "1", "long": "2", "id": "1"}]
+
+def test_phase_feeds_histogram_and_request_timer():
+    timer = start_request()
+    with phase("unit_test_phase"):
+        pass
+    with phase("unit_test_phase"):
+        pass
+    assert list(timer.phases) == ["unit_test_phase"]
+    header = timer.server_timing()
+    assert header.startswith("unit_test_phase;dur=")
+    assert "total;dur=" in header
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    registry.observe_phase("write", 0.02)
+    registry.observe_phase("write", 3.0)
+    registry.add_output("orders", 10, 2048)
+    text = registry.render(gauges={"plannerpro_age": ("Age", 1.5), "plannerpro_missing": ("Unset", None)})
+
+    assert 'plannerpro_phase_seconds_bucket{phase="write",le="0.025"} 1' in text
+    assert 'plannerpro_phase_seconds_bucket{phase="write",le="5"} 2' in text
+    assert 'plannerpro_phase_seconds_bucket{phase="write",le="+Inf"} 2' in text
+    assert 'plannerpro_phase_seconds_count{phase="write"} 2' in text
+    assert 'plannerpro_rows_generated_total{kind="orders"} 10' in text
+    assert 'plannerpro_bytes_written_total{kind="orders"} 2048' in text
+    assert "# TYPE plannerpro_age gauge" in text and "plannerpro_age 1.5" in text
+    assert "plannerpro_missing" not in text
+
+def test_generate_sends_server_timing_and_metrics():
+    routes.service.customers = list(CUSTOMERS)
+    client = create_app().test_client()
+
+    resp = client.post('/api/generate', json={"cantidad_ordenes": 3, "ct_origen": "CD"})
+    timing = resp.headers['Server-Timing']
+    for name in ("customers", "filter", "write", "total"):
+        assert f"{name};dur=" in timing
+
+    resp = client.post('/api/generate-vehicles?format=csv', json={"groups": [{"type": "Moto", "count": 2}]})
+    resp.get_data()
+
+    metrics = client.get('/metrics')
+    assert metrics.status_code == 200
+    text = metrics.get_data(as_text=True)
+    assert 'plannerpro_phase_seconds_count{phase="write"}' in text
+    assert 'plannerpro_rows_generated_total{kind="vehicles"}' in text
+    assert "plannerpro_customer_cache_age_seconds" in text
+
+def test_seeded_requests_load_customers_once(tmp_path, monkeypatch):
+    from app.result_cache import ResultCache
+    monkeypatch.setattr(routes, 'result_cache', ResultCache(directory=str(tmp_path)))
+    routes.service.customers = list(CUSTOMERS)
+    cache = routes.service.customer_cache
+    loads = []
+    original = cache.get
+    monkeypatch.setattr(cache, 'get', lambda: loads.append(1) or original())
+    client = create_app().test_client()
+
+    # Once for the result key and the generation behind it
+    resp = client.post('/api/generate', json={"cantidad_ordenes": 3, "ct_origen": "CD", "seed": 1})
+    assert resp.headers['X-Cache'] == 'MISS'
+    assert len(loads) == 1
+    assert resp.headers['Server-Timing'].count("customers;dur=") == 1
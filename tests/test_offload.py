@@ -0,0 +1,108 @@
+import os
+import pickle
+import signal
+import time
+
+import pytest
+
+from app.config import Config, _cgroup_cpu_limit
+from app import executor
+from app.delimited import get_format
+from app.sampling import CHUNK_ROWS
+from app.services import GenerationService
+
+CUSTOMERS = [
+    {"address": f"Calle {i}", "country": "Chile", "city": "Santiago", "lat": "-33.4", "long": "-70.6",
+     "name": f"Cliente {i}", "id": str(i)}
+    for i in range(20000)
+]
+ORDERS = {"cantidad_ordenes": CHUNK_ROWS * 2 + 100, "items_por_orden": 1, "ct_origen": "CD",
+          "workers": 1, "seed": 11, "fecha_entrega": "2025-01-15"}
+FLEET = {"groups": [{"type": "Moto", "count": 300}], "seed": 5}
+
+
+@pytest.fixture
+def service():
+    service = GenerationService()
+    service.customers = CUSTOMERS
+    return service
+
+
+def _both(monkeypatch, render):
+    # Same request rendered inline, then in the process pool
+    monkeypatch.setattr(Config, "OFFLOAD_GENERATION", False)
+    inline = render()
+    monkeypatch.setattr(Config, "OFFLOAD_GENERATION", True)
+    monkeypatch.setattr(Config, "OFFLOAD_MIN_ROWS", 1)
+    return inline, render()
+
+
+@pytest.mark.parametrize("fmt", [None, "csv"])
+def test_offloaded_orders_are_identical(service, monkeypatch, fmt):
+    fmt = fmt and get_format(fmt)
+    inline, pooled = _both(monkeypatch, lambda: b''.join(service.render_orders(ORDERS, fmt, bom=True)[0]))
+    assert inline == pooled
+
+
+@pytest.mark.parametrize("fmt", [None, "tsv"])
+def test_offloaded_vehicles_are_identical(service, monkeypatch, fmt):
+    fmt = fmt and get_format(fmt)
+    inline, pooled = _both(monkeypatch, lambda: b''.join(service.render_vehicles(FLEET, fmt)[0]))
+    assert inline == pooled
+
+
+def test_buffered_endpoints_use_the_pool_too(service, monkeypatch):
+    inline, pooled = _both(monkeypatch, lambda: service.generate_excel(ORDERS)[0].getvalue())
+    assert inline == pooled
+    inline, pooled = _both(monkeypatch, lambda: service.generate_vehicles_excel(FLEET)[0].getvalue())
+    assert inline == pooled
+
+
+def test_shards_carry_only_their_customers(service):
+    job, _ = service._build_orders(ORDERS)
+    shard = job.portable(1, 2)
+    assert len(shard.customers.store) == CHUNK_ROWS
+    assert len(pickle.dumps(shard)) * 3 < len(pickle.dumps(job))
+    # Rows are one reused list (see ColumnPlan): copy each before comparing
+    assert [list(row) for row in shard.rows(1, 2)] == [list(row) for row in job.rows(1, 2)]
+
+
+@pytest.mark.parametrize("files, cores", [
+    ({"cpu.max": "250000 100000\n"}, 3),
+    ({"cpu.max": "max 100000\n"}, None),
+    ({"cpu/cpu.cfs_quota_us": "50000\n", "cpu/cpu.cfs_period_us": "100000\n"}, 1),
+    ({"cpu/cpu.cfs_quota_us": "-1\n", "cpu/cpu.cfs_period_us": "100000\n"}, None),
+    ({}, None),
+])
+def test_cgroup_quota_caps_the_cores(tmp_path, files, cores):
+    for name, content in files.items():
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_text(content)
+    assert _cgroup_cpu_limit(str(tmp_path)) == cores
+
+
+def _exit_once(marker, value):
+    # Pool task whose worker dies the first time it runs
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return value
+
+
+def test_a_dead_pool_worker_is_replaced(service, monkeypatch, tmp_path):
+    inline, pooled = _both(monkeypatch, lambda: b''.join(service.render_orders(ORDERS, get_format("csv"))[0]))
+    pool = executor.get_process_pool()
+    os.kill(next(iter(pool._processes)), signal.SIGKILL)
+    for _ in range(100):
+        if pool._broken:
+            break
+        time.sleep(0.05)
+    assert pool._broken
+    assert b''.join(service.render_orders(ORDERS, get_format("csv"))[0]) == inline
+    assert executor.get_process_pool() is not pool
+
+    # A task lost mid-flight runs again in the new pool, once
+    tasks = [(str(tmp_path / "marker"), i) for i in range(3)]
+    assert list(executor.map_ordered(_exit_once, tasks, window=2)) == [0, 1, 2]
+    (tmp_path / "marker").unlink()
+    assert sorted(executor.map_unordered(_exit_once, tasks, window=2)) == [(0, 0), (1, 1), (2, 2)]
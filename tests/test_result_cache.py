@@ -0,0 +1,127 @@
+import os
+
+import pytest
+from app import create_app
+from app import routes
+from app.result_cache import ResultCache
+
+CUSTOMERS = [{
+    "address": "Calle Falsa 123",
+    "country": "Chile",
+    "city": "Santiago",
+    "lat": "-33.4489",
+    "long": "-70.6693",
+    "name": "Test Client",
+    "id": "123"
+}]
+
+ORDER = {"cantidad_ordenes": 5, "ct_origen": "CD", "fecha_entrega": "2025-01-15", "seed": 42}
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(routes, 'result_cache', ResultCache(directory=str(tmp_path)))
+    routes.service.customers = list(CUSTOMERS)
+    return create_app().test_client()
+
+def test_seeded_request_is_served_from_cache(client):
+    first = client.post('/api/generate', json=ORDER)
+    assert first.status_code == 200
+    assert first.headers['X-Cache'] == 'MISS'
+    assert 'ordenes_5.xlsx' in first.headers['Content-Disposition']
+
+    # Same payload, keys in another order and a transport-only flag
+    second = client.post('/api/generate?stream=1', json=dict(reversed(list(ORDER.items()))))
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_data() == first.get_data()
+    assert second.headers['ETag'] == first.headers['ETag']
+
+    not_modified = client.post('/api/generate', json=ORDER, headers={'If-None-Match': first.headers['ETag']})
+    assert not_modified.status_code == 304
+
+    stats = client.get('/api/cache/stats').get_json()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 1)
+
+def test_cache_key_changes_with_output(client):
+    base = routes.service.result_key('orders', ORDER)
+    assert routes.service.result_key('orders', dict(ORDER, seed=43)) != base
+    assert routes.service.result_key('orders', dict(ORDER, stream=True, workers=4)) == base
+    assert routes.service.result_key('orders', {k: v for k, v in ORDER.items() if k != 'seed'}) is None
+
+    # New customer data, new key
+    routes.service.customers = CUSTOMERS + [dict(CUSTOMERS[0], id="456")]
+    assert routes.service.result_key('orders', ORDER) != base
+
+def test_unseeded_requests_bypass_cache(client):
+    resp = client.post('/api/generate-vehicles', json={"groups": [{"type": "Moto", "count": 1}]})
+    assert resp.status_code == 200
+    assert 'X-Cache' not in resp.headers
+    assert client.get('/api/cache/stats').get_json()['misses'] == 0
+
+def test_lru_eviction_by_size(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), max_bytes=10)
+    cache.put("a", [b"12345"], "a.csv", "text/csv")
+    cache.put("b", [b"12345"], "b.csv", "text/csv")
+    assert cache.get("a") is not None  # "b" is now the least recently used
+    cache.put("c", [b"12345"], "c.csv", "text/csv")
+
+    assert cache.get("b") is None
+    assert not (tmp_path / "b").exists()
+    assert cache.get("a").filename == "a.csv"
+    assert cache.stats()['evictions'] == 1
+
+    # A new process finds the surviving entries on disk
+    reopened = ResultCache(directory=str(tmp_path), max_bytes=10)
+    assert reopened.get("c").mimetype == "text/csv"
+    assert reopened.stats()['bytes'] == 10
+
+def test_open_files_survive_eviction(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), max_bytes=10)
+    entry = cache.put("a", [b"12345"], "a.csv", "text/csv")
+    with cache.open(entry) as f:
+        cache.put("b", [b"1234567890"], "b.csv", "text/csv")
+        assert not (tmp_path / "a").exists()
+        assert f.read() == b"12345"
+    # Evicted before it was opened: the caller generates it again
+    assert cache.open(entry) is None
+
+def test_streamed_miss_fills_cache_as_it_is_sent(client):
+    payload = dict(ORDER, format="csv")
+    response = client.post('/api/generate', json=payload, buffered=False)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert 'Content-Length' not in response.headers
+    assert routes.result_cache.stats()['entries'] == 0
+    body = response.get_data()
+    response.close()
+
+    hit = client.post('/api/generate', json=payload)
+    assert hit.headers['X-Cache'] == 'HIT'
+    assert hit.get_data() == body
+    assert hit.headers['ETag'] == response.headers['ETag']
+    assert hit.headers['Content-Length'] == str(len(body))
+
+def test_abandoned_stream_leaves_nothing(client, tmp_path):
+    response = client.post('/api/generate', json=dict(ORDER, seed=5), query_string={"stream": 1}, buffered=False)
+    next(iter(response.response))
+    response.close()
+    assert routes.result_cache.stats()['entries'] == 0
+    assert list(tmp_path.iterdir()) == []
+
+def test_workers_share_one_bound(tmp_path):
+    # Two instances over one directory stand for two gunicorn workers
+    a, b = ResultCache(directory=str(tmp_path), max_bytes=10), ResultCache(directory=str(tmp_path), max_bytes=10)
+    a.put("x", [b"12345"], "x.csv", "text/csv")
+    b.put("y", [b"12345"], "y.csv", "text/csv")
+    os.utime(tmp_path / "x", (1, 1))
+    os.utime(tmp_path / "y", (2, 2))
+    a.put("z", [b"12345"], "z.csv", "text/csv")
+    # x was the least recently used of all, whoever wrote it
+    assert not (tmp_path / "x").exists()
+    assert b.get("x") is None
+    assert a.stats()["bytes"] == 10
+
+    # A hit in one worker counts as a use for the other's eviction
+    os.utime(tmp_path / "z", (3, 3))
+    assert a.get("y").filename == "y.csv"
+    b.put("w", [b"12345"], "w.csv", "text/csv")
+    assert sorted(p.name for p in tmp_path.iterdir() if not p.name.startswith(".")) == \
+        ["w", "w.meta", "y", "y.meta"]
@@ -0,0 +1,75 @@
+import csv
+import hashlib
+import io
+import json
+import zipfile
+import openpyxl
+from app import create_app
+from app import routes
+from app.config import Config
+from app.services import GenerationService
+
+CUSTOMERS = [{
+    "address": "Calle Falsa 123",
+    "country": "Chile",
+    "city": "Santiago",
+    "lat": "-33.4489",
+    "long": "-70.6693",
+    "name": "Test Client",
+    "id": "123"
+}]
+
+ORDERS = {"cantidad_ordenes": 4, "items_por_orden": 2, "ct_origen": "CD", "seed": 9}
+VEHICLES = {"groups": [{"type": "Moto", "count": 3, "capacity1": 50}], "seed": 9}
+
+def _service():
+    service = GenerationService()
+    service.customers = list(CUSTOMERS)
+    return service
+
+def test_zip_bundle_has_both_files_and_manifest():
+    chunks, filename, mimetype = _service().render_scenario(ORDERS, VEHICLES)
+    assert filename == "escenario_4.zip"
+    assert mimetype == "application/zip"
+
+    zf = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert zf.namelist() == ["ordenes_4.xlsx", "flota_vehiculos.xlsx", "manifest.json"]
+    manifest = json.loads(zf.read("manifest.json"))
+    assert manifest["orders"]["rows"] == 8
+    assert manifest["vehicles"]["rows"] == 3
+    assert manifest["orders"]["seed"] == 9
+
+    # Same bytes as the single-file endpoints
+    service = _service()
+    orders, _ = service.stream_excel(ORDERS)
+    orders = b"".join(orders)
+    assert zf.read("ordenes_4.xlsx") == orders
+    assert manifest["orders"]["sha256"] == hashlib.sha256(orders).hexdigest()
+    fleet, _ = service.stream_vehicles_excel(VEHICLES)
+    assert zf.read("flota_vehiculos.xlsx") == b"".join(fleet)
+
+def test_workbook_bundle_with_offloaded_fleet(monkeypatch):
+    monkeypatch.setattr(Config, 'SCENARIO_OFFLOAD_MIN_ROWS', 0)
+    chunks, filename, _ = _service().render_scenario(ORDERS, VEHICLES, bundle="workbook")
+    assert filename == "escenario_4.xlsx"
+
+    wb = openpyxl.load_workbook(io.BytesIO(b"".join(chunks)))
+    assert wb.sheetnames == ["Ordenes Generadas", "Flota Generada"]
+    assert wb["Ordenes Generadas"].max_row == 9
+    fleet = wb["Flota Generada"]
+    assert [fleet.cell(row=r, column=1).value for r in range(2, 5)] == ["MOTO01", "MOTO02", "MOTO03"]
+    assert fleet["A2"].number_format == '@'
+
+def test_scenario_route_csv_zip():
+    routes.service.customers = list(CUSTOMERS)
+    client = create_app().test_client()
+
+    resp = client.post('/api/scenario', json={"orders": ORDERS, "vehicles": VEHICLES, "format": "csv"})
+    assert resp.status_code == 200
+    zf = zipfile.ZipFile(io.BytesIO(resp.get_data()))
+    rows = list(csv.reader(io.StringIO(zf.read("flota_vehiculos.csv").decode('utf-8'))))
+    assert [r[0] for r in rows[1:]] == ["MOTO01", "MOTO02", "MOTO03"]
+
+    assert client.post('/api/scenario', json={"orders": ORDERS}).status_code == 400
+    resp = client.post('/api/scenario', json={"orders": ORDERS, "vehicles": VEHICLES, "bundle": "workbook", "format": "csv"})
+    assert resp.status_code == 400
@@ -0,0 +1,80 @@
+import io
+import openpyxl
+from app.config import Config
+from app.services import GenerationService
+from app.sampling import CHUNK_ROWS
+
+CUSTOMERS = [
+    {"address": f"Calle {i}", "country": "Chile", "city": "Santiago", "lat": "-33.4", "long": "-70.6", "id": str(i)}
+    for i in range(25)
+]
+
+class TestSeededGeneration:
+    def setup_method(self):
+        self.service = GenerationService()
+        self.service.customers = list(CUSTOMERS)
+
+    def _bytes(self, **extra):
+        params = {"cantidad_ordenes": 50, "items_por_orden": 2, "ct_origen": "CD", "workers": 1,
+                  "fecha_entrega": "2025-01-15",
+                  "tags": [{"header": "ZONA", "values": ["Norte", "Sur"]}]}
+        params.update(extra)
+        output, _ = self.service.generate_excel(params)
+        return output.getvalue()
+
+    def test_same_seed_same_bytes(self):
+        assert self._bytes(seed=42) == self._bytes(seed=42)
+        assert self._bytes(seed=42) != self._bytes(seed=43)
+
+    def test_shared_customer_list_is_not_reordered(self):
+        before = [c["address"] for c in self.service.customers]
+        self._bytes(seed=1)
+        assert [c["address"] for c in self.service.customers] == before
+
+    def test_workers_do_not_change_output(self, monkeypatch):
+        monkeypatch.setattr(Config, "SHARD_MIN_ORDERS", 0)
+        monkeypatch.setattr(Config, "GENERATION_MAX_WORKERS", 2)
+        count = CHUNK_ROWS * 2 + 100
+        single = self._bytes(seed=7, cantidad_ordenes=count, items_por_orden=1, workers=1)
+        sharded = self._bytes(seed=7, cantidad_ordenes=count, items_por_orden=1, workers=2)
+        assert single == sharded
+
+        ws = openpyxl.load_workbook(io.BytesIO(sharded), read_only=True).active
+        rows = list(ws.iter_rows(values_only=True))
+        headers = rows[0]
+        last = rows[-1]
+        assert len(rows) == count + 1
+        assert last[headers.index("N° DOCUMENTO")] == f"ORD-{count:06d}"
+        assert last[headers.index("CODIGO ITEM")] == f"SKU-{count}"
+
+    def test_chunks_are_bounded_by_rows(self, monkeypatch):
+        # Many items per order: fewer orders per chunk, same rows per chunk
+        job, _ = self.service._build_orders({"cantidad_ordenes": 50, "items_por_orden": 400, "ct_origen": "CD"})
+        assert job.chunk_orders * 400 <= CHUNK_ROWS
+        assert job.first_row(1) == job.chunk_orders * 400 + 2
+
+        monkeypatch.setattr(Config, "SHARD_MIN_ORDERS", 0)
+        monkeypatch.setattr(Config, "GENERATION_MAX_WORKERS", 2)
+        count = CHUNK_ROWS // 3 * 2 + 7
+        single = self._bytes(seed=9, cantidad_ordenes=count, items_por_orden=3, workers=1)
+        assert single == self._bytes(seed=9, cantidad_ordenes=count, items_por_orden=3, workers=2)
+
+    def test_vehicle_seed(self):
+        payload = {"groups": [{"type": "Moto", "count": 5}], "seed": 3,
+                   "tags": [{"header": "P", "values": ["A", "B", "C"]}]}
+        a, _ = self.service.generate_vehicles_excel(payload)
+        b, _ = self.service.generate_vehicles_excel(payload)
+        assert a.getvalue() == b.getvalue()
+
+def test_customer_walk_visits_each_selected_customer_once():
+    from array import array
+    from app.customer_store import CustomerStore
+    from app.sampling import CustomerWalk, stream_rng
+    store = CustomerStore.from_records({"address": f"A{i}"} for i in range(50))
+    ids = array('I', range(10, 40))
+    walk = CustomerWalk(store, ids, stream_rng(7, "customers"))
+    first = store.addresses(walk.batch(0, 30))
+    assert sorted(first) == sorted(f"A{i}" for i in ids)
+    # Continues cyclically, and any range matches the full walk
+    assert walk.batch(30, 60) == walk.batch(0, 30)
+    assert walk.batch(5, 9) == walk.batch(0, 30)[5:9]
@@ -0,0 +1,84 @@
+import threading
+import time
+import pytest
+from app import create_app
+from app import routes
+from app.result_cache import ResultCache
+from app.singleflight import SingleFlight, SingleFlightTimeout
+
+def _run_concurrently(n, target):
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+def test_concurrent_callers_share_one_run():
+    flight = SingleFlight()
+    calls = []
+    results = []
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return "bytes"
+    _run_concurrently(8, lambda: results.append(flight.do("k", slow)))
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert all(result == "bytes" for result, _ in results)
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 7, "timeouts": 0}
+
+    # Finished keys run again
+    assert flight.do("k", lambda: "again") == ("again", False)
+
+def test_errors_reach_every_waiter_and_waits_time_out():
+    flight = SingleFlight()
+    started = threading.Event()
+    errors = []
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("bad payload")
+    def call():
+        try:
+            flight.do("k", failing)
+        except ValueError as e:
+            errors.append(str(e))
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    call()
+    leader.join()
+    assert errors == ["bad payload", "bad payload"]
+
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: flight.do("slow", release.wait))
+    leader.start()
+    time.sleep(0.05)
+    with pytest.raises(SingleFlightTimeout):
+        flight.do("slow", lambda: None, timeout=0.01)
+    release.set()
+    leader.join()
+    assert flight.stats()["timeouts"] == 1
+
+def test_identical_requests_generate_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(routes, 'result_cache', ResultCache(directory=str(tmp_path)))
+    monkeypatch.setattr(routes, 'inflight', SingleFlight())
+    routes.service.customers = [{"address": "Calle 1", "country": "Chile", "city": "Santiago"}]
+
+    renders = []
+    original = routes.service.render_orders
+    def slow_render(*args, **kwargs):
+        renders.append(1)
+        time.sleep(0.2)
+        return original(*args, **kwargs)
+    monkeypatch.setattr(routes.service, 'render_orders', slow_render)
+
+    app = create_app()
+    bodies = []
+    payload = {"cantidad_ordenes": 10, "ct_origen": "CD", "fecha_entrega": "2025-01-15", "seed": 7}
+    _run_concurrently(5, lambda: bodies.append(app.test_client().post('/api/generate', json=payload).get_data()))
+
+    assert len(renders) == 1
+    assert len(set(bodies)) == 1
+    assert routes.inflight.stats()["coalesced"] == 4
@@ -0,0 +1,81 @@
+import gc
+import io
+import os
+
+import openpyxl
+import pytest
+
+from app import create_app
+from app import routes
+from app.config import Config
+from app.result_cache import ResultCache
+from app.spool import SpooledOutput
+from app.xlsx import get_backend
+
+CUSTOMERS = [{"address": f"Calle {i}", "country": "Chile", "city": "Santiago", "id": str(i)} for i in range(20)]
+ORDERS = {"cantidad_ordenes": 300, "ct_origen": "CD", "fecha_entrega": "2025-01-15", "seed": 3}
+
+
+def test_stays_in_memory_until_the_threshold(tmp_path):
+    output = SpooledOutput(threshold=10, directory=str(tmp_path))
+    output.write(b"0123456789")
+    assert output.path is None
+    output.write(b"abc")
+    assert output.path is not None and os.path.dirname(output.path) == str(tmp_path)
+    # Position and contents carry over to the file
+    output.seek(2)
+    output.write(b"X")
+    assert output.getvalue() == b"01X3456789abc"
+    assert output.size == 13
+    output.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_unclosed_files_are_removed_when_collected(tmp_path):
+    output = SpooledOutput(threshold=0, directory=str(tmp_path))
+    output.write(b"data")
+    assert len(os.listdir(tmp_path)) == 1
+    del output
+    gc.collect()
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("backend", ["native", "openpyxl"])
+def test_workbooks_spill_and_read_back(tmp_path, backend):
+    # openpyxl seeks back while saving: the zip must survive the rollover
+    with SpooledOutput(threshold=512, directory=str(tmp_path)) as output:
+        get_backend(backend).write(output, [("Hoja", [["A", "B"]] + [[str(i), "x" * 20] for i in range(200)])])
+        assert output.path is not None
+        output.seek(0)
+        rows = list(openpyxl.load_workbook(output).active.iter_rows(values_only=True))
+    assert len(rows) == 201
+    assert os.listdir(tmp_path) == []
+
+
+def test_route_sends_the_temp_file_and_removes_it(tmp_path, monkeypatch):
+    routes.service.customers = list(CUSTOMERS)
+    client = create_app().test_client()
+    monkeypatch.setattr(routes, 'result_cache', ResultCache(directory=str(tmp_path / "cache"), max_bytes=0))
+    in_memory = client.post('/api/generate', json=ORDERS).get_data()
+
+    monkeypatch.setattr(Config, "OUTPUT_SPOOL_BYTES", 1024)
+    monkeypatch.setattr(Config, "OUTPUT_SPOOL_DIR", str(tmp_path / "spool"))
+    spool = tmp_path / "spool"
+    response = client.post('/api/generate', json=ORDERS, buffered=False)
+    # Unlinked as soon as it is handed over; the open file still serves it
+    assert os.listdir(spool) == []
+    assert response.headers["Content-Length"] == str(len(in_memory))
+    assert response.get_data() == in_memory
+    response.close()
+
+    # What the server gets is the file itself, which it can sendfile
+    output, filename = routes.service.generate_excel(ORDERS)
+    with client.application.test_request_context():
+        response = routes._send_output(output, filename)
+    assert response.direct_passthrough
+    assert os.path.dirname(response.response.file.name) == str(spool)
+    response.close()
+
+    response = client.post('/api/generate-vehicles', json={"groups": [{"type": "Moto", "count": 200}]})
+    assert openpyxl.load_workbook(io.BytesIO(response.get_data())).active.max_row == 201
+    assert os.listdir(spool) == []
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+import pytest
+from app import create_app
+from app import routes
+from app.customers import CustomerCache, CustomerSnapshot
+from benchmarks.bench_startup import sample
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _python(code):
+    env = dict(os.environ, ADDRESSES_SHEET_URL="", WARM_CUSTOMERS_ON_BOOT="false", PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, "-c", code], env=env, cwd=ROOT,
+                          capture_output=True, text=True, timeout=60)
+
+def test_package_import_is_lazy():
+    result = _python(
+        "import sys, app\n"
+        "assert 'app.routes' not in sys.modules, 'routes imported'\n"
+        "assert 'requests' not in sys.modules, 'requests imported'\n"
+        "assert 'openpyxl' not in sys.modules, 'openpyxl imported'\n"
+        "from app import app as flask_app\n"
+        "print(type(flask_app).__name__)\n"
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "Flask"
+
+def test_readyz_waits_for_the_boot_warm_up(monkeypatch):
+    release = threading.Event()
+    cache = CustomerCache(sheet_url="", local_file="/nonexistent.json")
+    def slow_load(previous):
+        release.wait(5)
+        return CustomerSnapshot([{"address": "X", "country": "Chile", "city": "Santiago"}], "file")
+    monkeypatch.setattr(cache, '_load', slow_load)
+    monkeypatch.setattr(routes.service, 'customer_cache', cache)
+
+    client = create_app().test_client()
+    resp = client.get('/readyz')
+    assert resp.status_code == 503
+    assert resp.get_json()["status"] == "warming"
+
+    release.set()
+    for _ in range(100):
+        resp = client.get('/readyz')
+        if resp.status_code == 200:
+            break
+        time.sleep(0.01)
+    assert resp.get_json() == {"status": "ready", "version": "2.5.1", "customers": 1, "source": "file"}
+
+def test_readyz_is_degraded_without_customers(monkeypatch):
+    cache = CustomerCache(sheet_url="", local_file="/nonexistent.json", watch_interval=0)
+    monkeypatch.setattr(routes.service, 'customer_cache', cache)
+    cache.preload()
+    client = create_app().test_client()
+    resp = client.get('/readyz')
+    assert resp.status_code == 503
+    assert resp.get_json()["status"] == "degraded"
+    assert resp.get_json()["source"] == "empty"
+
+    # The probe itself triggers the retry
+    monkeypatch.setattr(cache, '_load', lambda previous: CustomerSnapshot(
+        [{"address": "X", "country": "Chile", "city": "Santiago"}], "file"))
+    cache._next_check = 0
+    for _ in range(100):
+        resp = client.get('/readyz')
+        if resp.status_code == 200:
+            break
+        time.sleep(0.01)
+    assert resp.get_json()["status"] == "ready"
+
+def test_startup_benchmark_fails_when_never_ready(tmp_path):
+    with pytest.raises(RuntimeError, match="degraded"):
+        sample(str(tmp_path / "missing.json"), timeout=1)
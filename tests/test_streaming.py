@@ -0,0 +1,76 @@
+import io
+import openpyxl
+from app import create_app
+from app import routes
+from app.services import GenerationService
+
+CUSTOMERS = [{
+    "address": "Calle Falsa 123",
+    "country": "Chile",
+    "city": "Santiago",
+    "lat": "-33.4489",
+    "long": "-70.6693",
+    "name": "Test Client",
+    "id": "123"
+}]
+
+class TestStreaming:
+    def setup_method(self):
+        self.service = GenerationService()
+        self.service.customers = list(CUSTOMERS)
+
+    def test_stream_excel_matches_workbook(self):
+        params = {
+            "cantidad_ordenes": 3,
+            "items_por_orden": 2,
+            "ct_origen": "CD Test",
+            "tags": [{"header": "ZONA", "values": ["Norte"]}]
+        }
+        chunks, filename = self.service.stream_excel(params)
+        assert filename == "ordenes_3.xlsx"
+
+        wb = openpyxl.load_workbook(io.BytesIO(b"".join(chunks)))
+        ws = wb.active
+        assert ws.title == "Ordenes Generadas"
+
+        headers = [c.value for c in ws[1]]
+        assert headers[0] == "N° DOCUMENTO"
+        assert "ZONA" in headers
+
+        rows = list(ws.iter_rows(min_row=2))
+        assert len(rows) == 6
+        for row in rows:
+            for cell in row:
+                assert cell.number_format == '@'
+        assert rows[0][headers.index("CODIGO ITEM")].value == "SKU-1"
+        assert rows[5][headers.index("N° DOCUMENTO")].value == "ORD-000003"
+
+    def test_stream_validation_happens_before_first_chunk(self):
+        try:
+            self.service.stream_excel({"cantidad_ordenes": 1})
+            assert False, "Expected ValueError"
+        except ValueError:
+            pass
+
+    def test_stream_vehicles(self):
+        chunks, filename = self.service.stream_vehicles_excel(
+            [{"type": "Moto", "count": 2, "capacity1": 50}]
+        )
+        wb = openpyxl.load_workbook(io.BytesIO(b"".join(chunks)))
+        ws = wb.active
+        assert ws['A2'].value == "MOTO01"
+        assert ws['D2'].value == "50"
+        assert ws['D2'].number_format == '@'
+
+def test_generate_route_streams_chunked():
+    routes.service.customers = list(CUSTOMERS)
+    client = create_app().test_client()
+
+    resp = client.post('/api/generate?stream=1', json={"cantidad_ordenes": 2, "ct_origen": "CD"})
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.headers.get('Content-Length') is None
+    assert 'ordenes_2.xlsx' in resp.headers['Content-Disposition']
+
+    ws = openpyxl.load_workbook(io.BytesIO(resp.get_data())).active
+    assert ws.max_row == 3
@@ -0,0 +1,45 @@
+import io
+import zipfile
+import pytest
+import openpyxl
+from app.xlsx import get_backend, column_letter
+
+ROWS = [
+    ["N° DOCUMENTO", "DIRECCION", "CAPACIDAD UNO", ""],
+    ["ORD-000001", "Calle <1> & \"2\"", "1.5000", ""],
+    ["ORD-000002", " Sur ", "0.0010", ""],
+]
+
+def _load(backend_name):
+    out = io.BytesIO()
+    get_backend(backend_name).write(out, [("Ordenes Generadas", ROWS)])
+    out.seek(0)
+    return out
+
+@pytest.mark.parametrize("backend_name", ["native", "native-sst"])
+def test_native_matches_reference(backend_name):
+    ref = openpyxl.load_workbook(_load("openpyxl")).active
+    ws = openpyxl.load_workbook(_load(backend_name)).active
+
+    assert ws.title == ref.title
+    assert [[c.value for c in r] for r in ws.iter_rows()] == \
+           [[c.value for c in r] for r in ref.iter_rows()]
+    for row in ws.iter_rows():
+        for cell in row:
+            assert cell.number_format == '@'
+
+def test_shared_strings_part_only_when_enabled():
+    with zipfile.ZipFile(_load("native")) as zf:
+        assert "xl/sharedStrings.xml" not in zf.namelist()
+    with zipfile.ZipFile(_load("native-sst")) as zf:
+        assert "xl/sharedStrings.xml" in zf.namelist()
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        get_backend("xlsxwriter")
+
+def test_column_letter():
+    assert column_letter(0) == "A"
+    assert column_letter(25) == "Z"
+    assert column_letter(26) == "AA"
+    assert column_letter(701) == "ZZ"
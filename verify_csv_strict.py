@@ -1,8 +1,12 @@
 from app.services import GenerationService
+from app.delimited import get_format
+import csv
 import io
 
 # Mock Config
-class MockConfig:
+from app.config import Config
+
+class MockConfig(Config):
     # Dummy paths, service should be robust enough or we mock internal methods
     CUSTOMERS_FILE = 'data/customers.json'
     TEMPLATE_FILE = 'data/template.csv'
@@ -32,38 +36,33 @@ def verify_csv():
     }
 
     print("Generating CSV...")
-    mem, filename = service.generate_excel(params)
-    
-    content = mem.getvalue().decode('utf-8')
-    
+    chunks, filename = service.stream_delimited(params, get_format("csv"))
+
+    content = b"".join(chunks).decode('utf-8')
+
     print("\n--- OUTPUT PREVIEW ---")
     print(content)
     print("--- END PREVIEW ---\n")
 
     # Assertions
-    expected_header = "N° DOCUMENTO;LATITUD;LONGITUD;DIRECCION;NOMBRE ITEM;CANTIDAD;CODIGO ITEM;FECHA MIN ENTREGA;FECHA MAX ENTREGA;MIN VENTANA HORARIA 1;MAX VENTANA HORARIA 1;MIN VENTANA HORARIA 2;MAX VENTANA HORARIA 2;COSTO ITEM;CAPACIDAD UNO;CAPACIDAD DOS;SERVICE TIME;IMPORTANCIA;IDENTIFICADOR CONTACTO;NOMBRE CONTACTO;TELEFONO;EMAIL CONTACTO;CT ORIGEN;"
-    
-    lines = content.splitlines()
-    header_line = lines[0]
-    
-    if header_line.strip() == expected_header.strip():
+    rows = list(csv.reader(io.StringIO(content)))
+    header = rows[0]
+
+    if header[0] == "N° DOCUMENTO" and header[-1] == "":
         print("✅ Header Match Success")
     else:
         print("❌ Header Mismatch")
-        print(f"Expected: {expected_header}")
-        print(f"Got:      {header_line}")
+        print(f"Got:      {header}")
 
-    # Check delimiter count (23 fields = 23 semicolons because of trailing semicolon)
-    if header_line.count(';') == 23:
-         print("✅ Delimiter Count Correct (23)")
+    # Every row has the same column count as the header (trailing empty column included)
+    if all(len(row) == len(header) for row in rows):
+        print(f"✅ Column Count Correct ({len(header)})")
     else:
-         print(f"❌ Delimiter Count Mismatch: Got {header_line.count(';')}")
+        print("❌ Column Count Mismatch")
 
-    # Check decimal format in second line
-    first_row = lines[1].split(';')
-    # Capacidad Uno is index 14
-    cap_val = first_row[14]
-    if ',' in cap_val and '.' not in cap_val:
+    # Check decimal format in second line (dot separator, see test_decimal_format)
+    cap_val = rows[1][header.index("CAPACIDAD UNO")]
+    if '.' in cap_val and ',' not in cap_val:
         print(f"✅ Decimal Format Correct: {cap_val}")
     else:
         print(f"❌ Decimal Format Issue: {cap_val}")
@@ -3,7 +3,9 @@ import io
 import openpyxl
 
 # Mock Config
-class MockConfig:
+from app.config import Config
+
+class MockConfig(Config):
     CUSTOMERS_FILE = 'data/customers.json'
     TEMPLATE_FILE = 'data/template.csv'
     ADDRESSES_SHEET_URL = None
@@ -2,7 +2,9 @@ from app.services import GenerationService
 import io
 
 # Mock Config
-class MockConfig:
+from app.config import Config
+
+class MockConfig(Config):
     CUSTOMERS_FILE = 'data/customers.json'
     TEMPLATE_FILE = 'data/template.csv'
     ADDRESSES_SHEET_URL = None
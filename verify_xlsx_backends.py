@@ -0,0 +1,94 @@
+from app.services import GenerationService
+from app.xlsx import get_backend
+import io
+import zipfile
+import openpyxl
+import xml.etree.ElementTree as ET
+
+# Mock Config
+from app.config import Config
+
+class MockConfig(Config):
+    CUSTOMERS_FILE = 'data/customers.json'
+    TEMPLATE_FILE = 'data/template.csv'
+    ADDRESSES_SHEET_URL = None
+
+import app.services
+app.services.Config = MockConfig
+
+REQUIRED_PARTS = [
+    "[Content_Types].xml", "_rels/.rels", "xl/workbook.xml",
+    "xl/_rels/workbook.xml.rels", "xl/styles.xml", "xl/worksheets/sheet1.xml"
+]
+NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+def _write(backend_name, headers, rows):
+    out = io.BytesIO()
+    get_backend(backend_name).write(out, [("Ordenes Generadas", [headers] + rows)])
+    out.seek(0)
+    return out
+
+def verify_backends():
+    service = GenerationService()
+    service.customers = [
+        {"address": "Test St <&> \"1\"", "country": "Chile", "city": "Santiago", "lat": -33.1, "long": -70.1, "id": "123"}
+    ]
+    params = {
+        "cantidad_ordenes": 20,
+        "items_por_orden": 2,
+        "ct_origen": "CD TEST",
+        "capacidad_min": 0.0010,
+        "capacidad_max": 0.0050,
+        "tags": [{"header": "ZONA", "values": ["Norte", " Sur "]}]
+    }
+    job, _ = service._build_orders(params)
+    headers = job.plan.headers
+    rows = [list(r) for r in job.rows()]
+
+    reference = openpyxl.load_workbook(_write("openpyxl", headers, rows)).active
+    ref_values = [[c.value for c in row] for row in reference.iter_rows()]
+
+    for name in ("native", "native-sst"):
+        print(f"\nChecking backend '{name}'...")
+        mem = _write(name, headers, rows)
+
+        # 1. Package structure (byte level)
+        with zipfile.ZipFile(mem) as zf:
+            missing = [p for p in REQUIRED_PARTS if p not in zf.namelist()]
+            if missing:
+                print(f"❌ Missing parts: {missing}")
+            else:
+                print("✅ SpreadsheetML parts present")
+            for part in zf.namelist():
+                ET.fromstring(zf.read(part))
+            print("✅ All parts are well-formed XML")
+
+            styles = ET.fromstring(zf.read("xl/styles.xml"))
+            xfs = styles.find(f"{NS}cellXfs")
+            if xfs[1].get("numFmtId") == "49":
+                print("✅ Shared TEXT (@) style")
+            else:
+                print(f"❌ Unexpected text style: {xfs[1].attrib}")
+
+            sheet = ET.fromstring(zf.read("xl/worksheets/sheet1.xml"))
+            unstyled = [c.get("r") for c in sheet.iter(f"{NS}c") if c.get("s") != "1"]
+            if unstyled:
+                print(f"❌ Cells without text style: {unstyled[:5]}")
+            else:
+                print("✅ Every cell uses the text style")
+
+        # 2. Same cells as the reference backend
+        mem.seek(0)
+        ws = openpyxl.load_workbook(mem).active
+        values = [[c.value for c in row] for row in ws.iter_rows()]
+        if values == ref_values:
+            print("✅ Cell values match openpyxl backend")
+        else:
+            print("❌ Cell values differ from openpyxl backend")
+        if all(c.number_format == '@' for row in ws.iter_rows() for c in row):
+            print("✅ Cell Format is TEXT (@)")
+        else:
+            print("❌ Cell Format Invalid")
+
+if __name__ == "__main__":
+    verify_backends()